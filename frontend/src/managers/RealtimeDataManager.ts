@@ -178,8 +178,11 @@ export class RealtimeDataManager {
       if (data.subagents) this.emit('subagents', data.subagents)
       if (data.collaboration) this.emit('collaboration', data.collaboration)
       // 统一为 { tasks: array }，与 HTTP 轮询和组件 handleTasksUpdate 约定一致，避免形态不一致导致不更新或误覆盖
-      const tasksArray = Array.isArray(data.tasks) ? data.tasks : []
-      this.emit('tasks', { tasks: tasksArray })
+      // 文件变更只推送受影响的分区：不含 tasks 时保留现有任务
+      if ('tasks' in data) {
+        const tasksArray = Array.isArray(data.tasks) ? data.tasks : []
+        this.emit('tasks', { tasks: tasksArray })
+      }
       if (data.performance) this.emit('performance', data.performance)
       return
     }
@@ -11,8 +11,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 from api.input_safety import require_safe_run_or_chain_id
 from core.error_handler import record_error
 from core.safe_api_error import safe_api_error_detail
+from api.pagination import decode_page_cursor, encode_cursor, in_time_range, page_items
 from data.chain_reader import (
     build_task_chains,
+    chain_sort_key,
     get_task_chain,
     get_active_chain,
     get_chains_summary
@@ -60,6 +62,7 @@ class TaskChain(BaseModel):
 class TaskChainListResponse(BaseModel):
     chains: List[TaskChain]
     activeChain: Optional[TaskChain] = None
+    nextCursor: Optional[str] = None
 
 
 class ChainSummaryResponse(BaseModel):
@@ -72,7 +75,12 @@ class ChainSummaryResponse(BaseModel):
 
 @router.get("/chains", response_model=TaskChainListResponse)
 async def list_chains(
-    limit: int = Query(20, ge=1, le=100, description="返回链路数量")
+    limit: int = Query(20, ge=1, le=100, description="返回链路数量"),
+    status: Optional[str] = Query(None, description="链路状态：running / completed / error"),
+    agent: Optional[str] = Query(None, description="包含该 Agent 节点的链路"),
+    since: Optional[int] = Query(None, description="startedAt 下限（ms，含）"),
+    until: Optional[int] = Query(None, description="startedAt 上限（ms，不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor"),
 ):
     """
     获取所有任务链路列表
@@ -82,16 +90,24 @@ async def list_chains(
     - 节点间的派发关系
     - 各节点的状态和进度
     """
+    before = decode_page_cursor(cursor)
     try:
-        chains = build_task_chains(limit=limit)
+        chains = [
+            c for c in build_task_chains(limit=None)
+            if (not status or c.get('status') == status)
+            and (not agent or any(n.get('agentId') == agent for n in c.get('nodes', [])))
+            and in_time_range(int(c.get('startedAt') or 0), since, until)
+        ]
+        page, next_cursor = page_items(chains, chain_sort_key, before, limit)
         active = get_active_chain()
     except Exception as e:
         record_error("unknown", str(e), "api:chains:list", exc=e)
         raise HTTPException(status_code=500, detail=safe_api_error_detail(e)) from e
 
     return {
-        "chains": chains,
-        "activeChain": active
+        "chains": page,
+        "activeChain": active,
+        "nextCursor": encode_cursor(list(next_cursor)) if next_cursor else None,
     }
 
 
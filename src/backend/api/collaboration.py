@@ -3,11 +3,13 @@
 符合 PRD: 展示老 K 与所有子 Agents 之间的连接关系，任务从老 K 流向子 Agents
 扩展: Agent 模型配置、模型节点、最近调用（光球展示）
 """
+import copy
 import re
 import logging
-from fastapi import APIRouter
+import threading
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
@@ -18,6 +20,7 @@ TZ_DISPLAY = ZoneInfo('Asia/Shanghai')
 sys.path.append(str(Path(__file__).parent.parent))
 
 from core.error_handler import record_error
+from core.http_cache import conditional_json, content_digest, make_etag, stamp_version
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -493,12 +496,11 @@ def _get_recent_model_calls(minutes: int = 30) -> List[Dict]:
         - timestamp 统一处理为 UTC timezone-aware
         - model 字段规范化为 provider/model 格式
     """
-    from api.performance import parse_session_file_with_details
+    from data.usage_store import sync_usage_store
 
     records = []
     from data.config_reader import get_openclaw_root
-    openclaw_path = get_openclaw_root()
-    agents_path = openclaw_path / 'agents'
+    agents_path = get_openclaw_root() / 'agents'
     if not agents_path.exists():
         return []
 
@@ -506,47 +508,133 @@ def _get_recent_model_calls(minutes: int = 30) -> List[Dict]:
     now = datetime.now(timezone.utc)
     since = now - timedelta(minutes=minutes)
 
-    for agent_dir in agents_path.iterdir():
-        if not agent_dir.is_dir():
-            continue
-        agent_id = agent_dir.name
-        sessions_path = agent_dir / 'sessions'
-        if not sessions_path.exists():
-            continue
-        for session_file in sessions_path.glob('*.jsonl'):
-            if 'lock' in session_file.name or 'deleted' in session_file.name:
-                continue
-            for r in parse_session_file_with_details(session_file, agent_id):
-                ts = r['timestamp']
-                # 确保 timestamp 是 timezone-aware
-                if ts.tzinfo is None:
-                    ts = ts.replace(tzinfo=timezone.utc)
-
-                if ts >= since:
-                    ts_local = ts.astimezone(TZ_DISPLAY)
-                    # 规范化 model 字段
-                    normalized_model = _normalize_model_id(r.get('model', ''))
-
-                    records.append({
-                        'agentId': agent_id,
-                        'model': normalized_model,  # 使用规范化后的值
-                        'sessionId': r['sessionId'],
-                        'trigger': r.get('trigger', ''),
-                        'tokens': r.get('tokens', 0),
-                        'timestamp': int(ts.timestamp() * 1000),
-                        'time': ts_local.strftime('%H:%M:%S')
-                    })
-
-    records.sort(key=lambda x: x['timestamp'])
-    return records[-100:]  # 最多 100 条
+    since_ms = int(since.timestamp() * 1000)
+    # 有界缓冲已按时间保留最新 100 条，这里只做规范化与格式化
+    for r in sync_usage_store(since_ms).recent_calls(since_ms):
+        ts_local = datetime.fromtimestamp(r['timestampMs'] / 1000, tz=timezone.utc).astimezone(TZ_DISPLAY)
+        records.append({
+            'agentId': r['agentId'],
+            'model': _normalize_model_id(r['model']),  # 使用规范化后的值
+            'sessionId': r['sessionId'],
+            'trigger': r['trigger'],
+            'tokens': r['tokens'],
+            'timestamp': r['timestampMs'],
+            'time': ts_local.strftime('%H:%M:%S')
+        })
 
+    return records  # 最多 100 条
 
-@router.get("/collaboration", response_model=CollaborationFlow)
-async def get_collaboration():
-    """获取协作流程数据 - 主 Agent 与子 Agents 的拓扑关系，含模型配置与最近调用"""
+
+# ============================================================================
+# 静态拓扑缓存：Agent/模型节点与配置边只随 openclaw.json 变化
+# ============================================================================
+
+_static_cache: Optional[Tuple[Any, Dict[str, Any]]] = None
+_static_lock = threading.Lock()
+
+
+def _build_static_topology() -> Dict[str, Any]:
     from data.config_reader import (
         get_agents_list, get_agent_models, get_models_configured_by_agents,
-        get_model_display_name, get_main_agent_id,
+        get_model_display_name, get_main_agent_id, agent_ids_equal,
+    )
+
+    main_agent_id = get_main_agent_id()
+    agents_list = get_agents_list()
+    main_agent_config = next(
+        (a for a in agents_list if agent_ids_equal(a.get('id'), main_agent_id)), None
+    )
+    sub_agents_config = [a for a in agents_list if not agent_ids_equal(a.get('id'), main_agent_id)]
+    all_agents = [a for a in agents_list if a.get('id')]
+
+    agent_models: Dict[str, Dict[str, Any]] = {}
+    for agent in all_agents:
+        aid = agent.get('id', '')
+        agent_models[aid] = get_agent_models(aid)
+    models_list = get_models_configured_by_agents()
+
+    model_nodes = [
+        CollaborationNode(
+            id=f"model-{model_id.replace('/', '-')}",
+            type="model",
+            name=get_model_display_name(model_id),
+            status="idle",
+            timestamp=None,
+            metadata={"modelId": model_id}
+        )
+        for model_id in models_list
+    ]
+
+    # Agent -> Model 边（配置了该模型的 Agent）
+    model_edges: List[CollaborationEdge] = []
+    for agent in all_agents:
+        aid = agent.get('id', '')
+        cfg = agent_models.get(aid, {})
+        primary = cfg.get('primary', '')
+        fallbacks = cfg.get('fallbacks', [])
+        for mid in [primary] + [f for f in fallbacks if f != primary]:
+            if mid and mid in models_list:
+                mid_safe = mid.replace('/', '-')
+                model_edges.append(CollaborationEdge(
+                    id=f"edge-{aid}-model-{mid_safe}",
+                    source=aid,
+                    target=f"model-{mid_safe}",
+                    type="model",
+                    label=mid
+                ))
+
+    return {
+        'main_agent_id': main_agent_id,
+        'main_agent_config': main_agent_config,
+        'sub_agents_config': sub_agents_config,
+        'agent_models': agent_models,
+        'models_list': models_list,
+        'model_nodes': model_nodes,
+        'model_edges': model_edges,
+    }
+
+
+def _get_static_topology() -> Dict[str, Any]:
+    """按配置 epoch 缓存的静态拓扑；配置变化时重建并清除模型映射缓存"""
+    global _static_cache
+    from data.config_reader import get_config_epoch
+
+    epoch = get_config_epoch()
+    with _static_lock:
+        if _static_cache is not None and _static_cache[0] == epoch:
+            return _static_cache[1]
+    topology = _build_static_topology()
+    with _static_lock:
+        if _static_cache is not None and _static_cache[0] != epoch:
+            _clear_model_mapping_cache()
+        _static_cache = (epoch, topology)
+    return topology
+
+
+def reset_collaboration_cache_for_tests() -> None:
+    global _static_cache
+    with _static_lock:
+        _static_cache = None
+    _clear_model_mapping_cache()
+
+
+def _pin_version(key: str, model: BaseModel, main_node: Optional[CollaborationNode] = None) -> str:
+    """
+    以内容摘要生成强 ETag；lastUpdate（及主 Agent 节点 timestamp）固定为内容最近变化时刻，
+    内容不变时响应完全一致。
+    """
+    digest = content_digest(model.model_dump(mode="json"))
+    stamp = stamp_version(key, digest)
+    model.lastUpdate = stamp
+    if main_node is not None:
+        main_node.timestamp = stamp
+    return make_etag(digest)
+
+
+def _build_collaboration_flow() -> Tuple[CollaborationFlow, str]:
+    """构建协作流程数据：静态拓扑取自缓存，叠加状态/任务/最近调用等动态数据。返回 (flow, etag)"""
+    from data.config_reader import (
+        get_main_agent_id,
         agent_ids_equal, normalize_openclaw_agent_id, canonical_agent_id_from_config,
     )
     from data.subagent_reader import get_active_runs
@@ -561,22 +649,16 @@ async def get_collaboration():
     active_runs: List[Dict[str, Any]] = []
 
     main_agent_id = 'main'
+    main_agent: Optional[CollaborationNode] = None
     try:
-        main_agent_id = get_main_agent_id()
-        agents_list = get_agents_list()
+        topology = _get_static_topology()
+        main_agent_id = topology['main_agent_id']
+        main_agent_config = topology['main_agent_config']
+        sub_agents_config = topology['sub_agents_config']
+        # 缓存对象由各请求共享：用到时复制，避免后续修改污染缓存
+        agent_models = copy.deepcopy(topology['agent_models'])
+        models_list = list(topology['models_list'])
         active_runs = get_active_runs()
-
-        main_agent_id = get_main_agent_id()
-        main_agent_config = next(
-            (a for a in agents_list if agent_ids_equal(a.get('id'), main_agent_id)), None
-        )
-        sub_agents_config = [a for a in agents_list if not agent_ids_equal(a.get('id'), main_agent_id)]
-
-        all_agents = [a for a in agents_list if a.get('id')]
-        for agent in all_agents:
-            aid = agent.get('id', '')
-            agent_models[aid] = get_agent_models(aid)
-        models_list = get_models_configured_by_agents()
         recent_calls = _get_recent_model_calls(30)
 
         main_display_name = (main_agent_config.get('name') if main_agent_config else None) or "主 Agent"
@@ -611,7 +693,7 @@ async def get_collaboration():
             type="agent",
             name=main_display_name,
             status=main_status,
-            timestamp=int(__import__('time').time() * 1000),
+            timestamp=None,
             metadata=agent_models.get(main_agent_id),
             currentTask=main_ct,
             error=main_error,
@@ -668,35 +750,9 @@ async def get_collaboration():
                 label="委托"
             ))
 
-        # 3. 模型节点（右侧）
-        for i, model_id in enumerate(models_list):
-            model_node = CollaborationNode(
-                id=f"model-{model_id.replace('/', '-')}",
-                type="model",
-                name=get_model_display_name(model_id),
-                status="idle",
-                timestamp=None,
-                metadata={"modelId": model_id}
-            )
-            nodes.append(model_node)
-
-        # 4. Agent -> Model 边（配置了该模型的 Agent）
-        for agent in all_agents:
-            aid = agent.get('id', '')
-            cfg = agent_models.get(aid, {})
-            primary = cfg.get('primary', '')
-            fallbacks = cfg.get('fallbacks', [])
-            all_models = [primary] + [f for f in fallbacks if f != primary]
-            for mid in all_models:
-                if mid and mid in models_list:
-                    mid_safe = mid.replace('/', '-')
-                    edges.append(CollaborationEdge(
-                        id=f"edge-{aid}-model-{mid_safe}",
-                        source=aid,
-                        target=f"model-{mid_safe}",
-                        type="model",
-                        label=mid
-                    ))
+        # 3. 模型节点（右侧）与 4. Agent -> Model 边：来自静态拓扑缓存
+        nodes.extend(n.model_copy(deep=True) for n in topology['model_nodes'])
+        edges.extend(e.model_copy(deep=True) for e in topology['model_edges'])
 
         # 5. 活跃任务与 spawn 链：requesterSessionKey -> childSessionKey -> task
         for run in active_runs[:20]:
@@ -834,11 +890,11 @@ async def get_collaboration():
         main_agent_id,
     )
 
-    return CollaborationFlow(
+    flow = CollaborationFlow(
         nodes=nodes,
         edges=edges,
-        activePath=list(set(active_path)),
-        lastUpdate=int(__import__('time').time() * 1000),
+        activePath=sorted(set(active_path)),
+        lastUpdate=0,
         mainAgentId=main_agent_id,
         agentModels=agent_models,
         models=models_list,
@@ -847,6 +903,15 @@ async def get_collaboration():
         depths=depths,
         agentActiveTasks=agent_active_tasks
     )
+    etag = _pin_version('collaboration', flow, main_agent)
+    return flow, etag
+
+
+@router.get("/collaboration", response_model=CollaborationFlow)
+async def get_collaboration(request: Request):
+    """获取协作流程数据 - 主 Agent 与子 Agents 的拓扑关系，含模型配置与最近调用（支持 If-None-Match）"""
+    flow, etag = _build_collaboration_flow()
+    return conditional_json(request, flow, etag)
 
 
 class CollaborationDynamic(BaseModel):
@@ -863,9 +928,8 @@ class CollaborationDynamic(BaseModel):
     agentActiveTasks: Optional[Dict[str, List[ActiveTask]]] = None
 
 
-@router.get("/collaboration/dynamic", response_model=CollaborationDynamic)
-async def get_collaboration_dynamic():
-    """轻量接口：仅返回状态、小球、任务等动态数据，用于静默刷新，不触发整体重载"""
+def _build_collaboration_dynamic() -> Tuple[CollaborationDynamic, str]:
+    """仅构建动态数据（只读 Agent 列表，不依赖静态拓扑的构建）。返回 (dynamic, etag)"""
     from data.config_reader import get_agents_list, get_main_agent_id
     from data.subagent_reader import get_active_runs
     from status.status_calculator import calculate_agent_status, get_display_status
@@ -957,14 +1021,23 @@ async def get_collaboration_dynamic():
         main_agent_id,
     )
 
-    return CollaborationDynamic(
-        activePath=list(set(active_path)),
+    dynamic = CollaborationDynamic(
+        activePath=sorted(set(active_path)),
         recentCalls=model_calls,
         agentStatuses=agent_statuses,
         agentDynamicStatuses=agent_dynamic_statuses,
         taskNodes=task_nodes,
         taskEdges=task_edges,
         mainAgentId=main_agent_id,
-        lastUpdate=int(__import__('time').time() * 1000),
+        lastUpdate=0,
         agentActiveTasks=agent_active_tasks
     )
+    etag = _pin_version('collaboration_dynamic', dynamic)
+    return dynamic, etag
+
+
+@router.get("/collaboration/dynamic", response_model=CollaborationDynamic)
+async def get_collaboration_dynamic(request: Request):
+    """轻量接口：仅返回状态、小球、任务等动态数据，用于静默刷新，不触发整体重载（支持 If-None-Match）"""
+    dynamic, etag = _build_collaboration_dynamic()
+    return conditional_json(request, dynamic, etag)
@@ -0,0 +1,49 @@
+"""
+条件 GET 接口登记 - 各只读接口依赖的数据源
+
+validator 只由源文件 stat 生成；If-None-Match 命中时中间件直接返回 304，不进入 handler。
+输出随当前时间变化的接口（状态、运行时长、时间窗统计）额外带时间片。
+"""
+from core.http_cache import register_conditional_route
+from data.source_fingerprint import (
+    config_fingerprint,
+    failure_logs_fingerprint,
+    runs_fingerprint,
+    sessions_fingerprint,
+    task_history_fingerprint,
+)
+
+# 按分钟分桶的统计接口的时间片（秒）
+PERFORMANCE_TICK_SEC = 60.0
+
+
+def register_conditional_routes() -> None:
+    register_conditional_route(
+        r"/api/agents",
+        lambda p: (config_fingerprint(), runs_fingerprint(), sessions_fingerprint(), failure_logs_fingerprint()),
+        tick_sec=0,
+    )
+    register_conditional_route(r"/api/subagents", lambda p: (runs_fingerprint(),), tick_sec=0)
+    register_conditional_route(
+        r"/api/tasks",
+        lambda p: (config_fingerprint(), runs_fingerprint(), task_history_fingerprint(), sessions_fingerprint()),
+        tick_sec=0,
+    )
+    register_conditional_route(
+        r"/api/timeline/(?P<agent_id>[^/]+)",
+        lambda p: (config_fingerprint(), runs_fingerprint(), sessions_fingerprint(p["agent_id"])),
+    )
+    register_conditional_route(r"/api/chains", lambda p: (config_fingerprint(), runs_fingerprint()))
+    register_conditional_route(
+        r"/api/errors",
+        lambda p: (config_fingerprint(), sessions_fingerprint(), failure_logs_fingerprint()),
+    )
+    register_conditional_route(
+        r"/api/errors/clusters(?:/[^/]+/members)?",
+        lambda p: (config_fingerprint(), sessions_fingerprint()),
+    )
+    register_conditional_route(
+        r"/api/performance",
+        lambda p: (sessions_fingerprint(),),
+        tick_sec=PERFORMANCE_TICK_SEC,
+    )
@@ -3,7 +3,8 @@
 """
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Dict, Optional
+from datetime import datetime
 import sys
 from pathlib import Path
 
@@ -13,6 +14,7 @@ from api.input_safety import (
     require_safe_agent_id,
     require_safe_session_file_segment,
 )
+from api.pagination import clamp_limit, decode_page_cursor, encode_cursor
 from core.error_handler import record_error
 from core.safe_api_error import safe_api_error_detail, safe_client_string
 from data.error_analyzer import (
@@ -21,6 +23,7 @@ from data.error_analyzer import (
     get_error_detail,
     classify_error,
     get_error_suggestions,
+    query_error_page,
 )
 
 router = APIRouter()
@@ -69,15 +72,72 @@ def format_error_for_display(error: dict) -> dict:
     }
 
 
+def _filter_analysis(
+    agent: Optional[str],
+    error_type: Optional[str],
+    since: Optional[int],
+    until: Optional[int],
+    before: Optional[tuple],
+    limit: int,
+) -> Dict[str, Any]:
+    """按条件从错误索引分页取错误，按 Agent 重新分组；globalSummary 为全部命中错误的汇总（SQL GROUP BY）"""
+    page, next_cursor, counts = query_error_page(agent, error_type, since, until, before, limit)
+    analyzed_at = int(datetime.now().timestamp() * 1000)
+
+    summary: Dict[str, Any] = {'totalErrors': 0, 'byAgent': {}, 'byType': {}, 'bySeverity': {}}
+    agent_summaries: Dict[str, Dict[str, Any]] = {}
+    for aid, et, es, n in counts:
+        et, es = et or 'unknown', es or 'medium'
+        summary['totalErrors'] += n
+        summary['byAgent'][aid] = summary['byAgent'].get(aid, 0) + n
+        summary['byType'][et] = summary['byType'].get(et, 0) + n
+        summary['bySeverity'][es] = summary['bySeverity'].get(es, 0) + n
+        agent_summary = agent_summaries.setdefault(aid, {'total': 0, 'byType': {}, 'bySeverity': {}})
+        agent_summary['total'] += n
+        agent_summary['byType'][et] = agent_summary['byType'].get(et, 0) + n
+        agent_summary['bySeverity'][es] = agent_summary['bySeverity'].get(es, 0) + n
+
+    by_agent: Dict[str, Dict[str, Any]] = {}
+    for e in page:
+        aid = e.get('agentId', '')
+        group = by_agent.setdefault(aid, {
+            'agentId': aid,
+            'errors': [],
+            'summary': agent_summaries.get(aid, {'total': 0, 'byType': {}, 'bySeverity': {}}),
+            'analyzedAt': analyzed_at,
+        })
+        group['errors'].append(e)
+
+    return {
+        'agents': list(by_agent.values()),
+        'globalSummary': summary,
+        'analyzedAt': analyzed_at,
+        'nextCursor': encode_cursor(list(next_cursor)) if next_cursor else None,
+    }
+
+
 @router.get("/error-analysis")
-async def get_global_error_analysis():
+async def get_global_error_analysis(
+    agent: Optional[str] = Query(None, description="按 Agent ID 筛选"),
+    type: Optional[str] = Query(None, description="按 errorType 筛选"),
+    since: Optional[int] = Query(None, description="时间下限（ms，含）"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页错误条数"),
+):
     """
     获取所有 Agent 的错误分析概览
 
-    返回全局错误统计和每个 Agent 的错误摘要
+    返回全局错误统计和每个 Agent 的错误摘要；
+    带任一筛选 / 分页参数时直接查询错误索引：错误按时间倒序分页，统计为全部命中错误的汇总
     """
+    filtered = any(v is not None for v in (agent, type, since, until, cursor, limit))
+    before = decode_page_cursor(cursor)
     try:
-        result = analyze_all_agents_errors()
+        if filtered:
+            result = _filter_analysis(agent, type, since, until, before, clamp_limit(limit, 100, 500))
+        else:
+            result = analyze_all_agents_errors()
 
         # 格式化错误信息
         for agent_result in result.get('agents', []):
@@ -99,13 +159,13 @@ async def get_global_error_analysis():
 @router.get("/error-analysis/{agent_id}")
 async def get_agent_error_analysis(
     agent_id: str,
-    session_limit: int = Query(5, ge=1, le=50, description="分析的 session 数量上限"),
+    session_limit: Optional[int] = Query(None, ge=1, description="只分析最近的 N 个 session（默认全部）"),
 ):
     """
     获取单个 Agent 的错误分析
 
     - agent_id: Agent ID
-    - session_limit: 分析最近的 N 个 session
+    - session_limit: 分析最近的 N 个 session；不传时分析全部（经错误索引增量维护）
     """
     require_safe_agent_id(agent_id)
     try:
@@ -4,7 +4,7 @@
 """
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import sys
 from pathlib import Path
 import time
@@ -12,8 +12,18 @@ from collections import defaultdict
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+from core.error_classifier import classify_center_error
 from core.error_handler import get_framework_error_stats_for_client, record_error
 from core.safe_api_error import safe_api_error_detail
+from api.pagination import (
+    as_cursor,
+    decode_cursor,
+    decode_page_cursor,
+    encode_cursor,
+    in_time_range,
+    page_items,
+    timestamp_ms,
+)
 
 router = APIRouter()
 
@@ -30,65 +40,46 @@ ERROR_TYPE_MAP = {
 
 def classify_error(err_msg: str) -> str:
     """更精细的错误分类"""
-    err_lower = err_msg.lower()
-
-    if '429' in err_msg or 'rate limit' in err_lower or 'too many requests' in err_lower:
-        return 'rate-limit'
-    elif 'token' in err_lower or 'context' in err_lower or 'length' in err_lower:
-        return 'token-limit'
-    elif 'timeout' in err_lower or '超时' in err_msg or 'timed out' in err_lower:
-        return 'timeout'
-    elif '401' in err_msg or '403' in err_msg or 'auth' in err_lower or 'unauthorized' in err_lower:
-        return 'auth'
-    else:
-        return 'unknown'
-
+    return classify_center_error(err_msg)
 
-def get_session_errors(limit: int = 100, agent_filter: str = None, type_filter: str = None) -> List[Dict]:
-    """获取 Session 错误"""
-    from data.session_reader import get_recent_messages
-    from data.config_reader import get_agents_list
 
-    errors = []
-    agents = get_agents_list()
+def get_session_errors(
+    limit: Optional[int] = 100,
+    agent_filter: str = None,
+    type_filter: str = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    before: Optional[tuple] = None,
+) -> List[Dict]:
+    """获取 Session 错误（来自错误索引，按 (时间, id) 倒序；过滤与游标在 SQL 中完成；limit 为 None 时返回全部）"""
+    from data.error_analyzer import sync_error_index
 
-    for agent in agents:
-        agent_id = agent.get('id', '')
-        if not agent_id:
-            continue
-        if agent_filter and agent_id != agent_filter:
-            continue
+    index, _ = sync_error_index()
+    rows = index.query_errors(
+        agent_filter, type_filter, since, until, before, -1 if limit is None else limit, center_only=True
+    )
 
-        messages = get_recent_messages(agent_id, limit=200)
-        for msg in messages:
-            if msg.get('stopReason') != 'error':
-                continue
-
-            err_msg = msg.get('errorMessage', '') or ''
-            err_type = classify_error(err_msg)
-
-            if type_filter and err_type != type_filter:
-                continue
-
-            errors.append({
-                "id": f"session-{agent_id}-{msg.get('timestamp', 0)}",
-                "source": "session",
-                "agentId": agent_id,
-                "type": err_type,
-                "typeLabel": ERROR_TYPE_MAP.get(err_type, {}).get('label', err_type),
-                "severity": ERROR_TYPE_MAP.get(err_type, {}).get('severity', 'error'),
-                "message": err_msg[:300] if err_msg else "(无详情)",
-                "fullMessage": err_msg,
-                "timestamp": msg.get('timestamp', 0),
-                "datetime": datetime.fromtimestamp(msg.get('timestamp', 0) / 1000).strftime('%Y-%m-%d %H:%M:%S') if msg.get('timestamp') else '-',
-            })
-
-    errors.sort(key=lambda x: x["timestamp"], reverse=True)
-    return errors[:limit]
+    errors = []
+    for uid, _, agent_id, ts, _, error in rows:
+        err_msg = error.get('rawMessage') or ''
+        err_type = classify_error(err_msg)
+        errors.append({
+            "id": uid,
+            "source": "session",
+            "agentId": agent_id,
+            "type": err_type,
+            "typeLabel": ERROR_TYPE_MAP.get(err_type, {}).get('label', err_type),
+            "severity": ERROR_TYPE_MAP.get(err_type, {}).get('severity', 'error'),
+            "message": err_msg[:300] if err_msg else "(无详情)",
+            "fullMessage": err_msg,
+            "timestamp": ts,
+            "datetime": datetime.fromtimestamp(ts / 1000).strftime('%Y-%m-%d %H:%M:%S') if ts else '-',
+        })
+    return errors
 
 
-def get_model_failures(limit: int = 100, model_filter: str = None, type_filter: str = None) -> List[Dict]:
-    """获取 Model Failures"""
+def get_model_failures(limit: Optional[int] = 100, model_filter: str = None, type_filter: str = None) -> List[Dict]:
+    """获取 Model Failures（按时间倒序；limit 为 None 时返回全部）"""
     from status.error_detector import parse_failure_log
 
     errors = []
@@ -105,7 +96,7 @@ def get_model_failures(limit: int = 100, model_filter: str = None, type_filter:
 
         timestamp = f.get("timestamp", 0)
         errors.append({
-            "id": f"model-{timestamp}-{model}",
+            "id": f.get("id") or f"model-{timestamp}-{model}",
             "source": "model",
             "model": model,
             "type": err_type,
@@ -117,46 +108,47 @@ def get_model_failures(limit: int = 100, model_filter: str = None, type_filter:
             "datetime": datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S') if timestamp else '-',
         })
 
-    return errors[:limit]
+    errors.sort(key=_error_cursor_key, reverse=True)
+    return errors if limit is None else errors[:limit]
 
 
 def get_api_status() -> List[Dict]:
     """获取 API 状态（整合自原 api_status 模块）"""
-    from status.error_detector import parse_failure_log
+    from status.error_detector import sync_failure_logs
 
-    failures = parse_failure_log()
+    tail = sync_failure_logs()
     status_map = {}
     now = int(time.time() * 1000)
 
-    for failure in failures:
+    # 累计错误数来自增量维护的按模型汇总；状态只看最近 10 分钟的条目
+    for model, (count, _) in tail.model_summary().items():
+        status_map[model] = {
+            'model': model,
+            'provider': parse_provider(model),
+            'status': 'healthy',
+            'errorCount': count,
+            'lastError': None,
+        }
+
+    for failure in tail.entries():
+        # 条目按时间倒序：超出最近 10 分钟即可停止
+        if failure['timestamp'] <= now - 600000:
+            break
         model = failure.get('model', '')
-        if not model:
-            continue
-
         if model not in status_map:
-            status_map[model] = {
-                'model': model,
-                'provider': parse_provider(model),
-                'status': 'healthy',
-                'errorCount': 0,
-                'lastError': None,
-            }
-
-        status_map[model]['errorCount'] += 1
+            continue
 
-        # 最近 10 分钟内有错误
-        if failure['timestamp'] > now - 600000:
-            if failure['timestamp'] > now - 120000:  # 2分钟内
-                status_map[model]['status'] = 'down'
-            else:
-                status_map[model]['status'] = 'degraded'
+        if failure['timestamp'] > now - 120000:  # 2分钟内
+            status_map[model]['status'] = 'down'
+        else:
+            status_map[model]['status'] = 'degraded'
 
-            if not status_map[model]['lastError']:
-                status_map[model]['lastError'] = {
-                    'type': failure.get('error_type', 'unknown'),
-                    'message': (failure.get('message', '') or '')[:100],
-                    'timestamp': failure['timestamp'],
-                }
+        if not status_map[model]['lastError']:
+            status_map[model]['lastError'] = {
+                'type': failure.get('error_type', 'unknown'),
+                'message': (failure.get('message', '') or '')[:100],
+                'timestamp': failure['timestamp'],
+            }
 
     return list(status_map.values())
 
@@ -177,74 +169,136 @@ def parse_provider(model: str) -> str:
         return 'unknown'
 
 
-def get_error_stats(session_errors: List, model_failures: List) -> Dict:
-    """计算错误统计"""
-    # 按类型统计
-    type_stats = defaultdict(lambda: {'count': 0, 'label': '', 'color': ''})
-    for e in session_errors + model_failures:
-        err_type = e.get('type', 'unknown')
-        type_stats[err_type]['count'] += 1
-        type_stats[err_type]['label'] = ERROR_TYPE_MAP.get(err_type, {}).get('label', err_type)
-        type_stats[err_type]['color'] = ERROR_TYPE_MAP.get(err_type, {}).get('color', '#6b7280')
-
-    # 按 Agent 统计
-    agent_stats = defaultdict(lambda: {'count': 0, 'agentId': ''})
-    for e in session_errors:
-        agent_id = e.get('agentId', 'unknown')
-        agent_stats[agent_id]['count'] += 1
-        agent_stats[agent_id]['agentId'] = agent_id
-
-    # 按小时统计（最近 24 小时）
-    hourly_stats = defaultdict(int)
-    now = datetime.now()
-    for e in session_errors + model_failures:
-        ts = e.get('timestamp', 0)
-        if ts:
-            dt = datetime.fromtimestamp(ts / 1000)
-            if dt > now - timedelta(hours=24):
-                hour_key = dt.strftime('%Y-%m-%d %H:00')
-                hourly_stats[hour_key] += 1
-
-    # 生成完整的小时序列
-    hourly_list = []
-    for i in range(24):
-        hour = (now - timedelta(hours=23-i)).strftime('%Y-%m-%d %H:00')
-        hourly_list.append({
-            'hour': hour,
-            'count': hourly_stats.get(hour, 0)
-        })
+# 时间序列单次查询的最大桶数
+MAX_SERIES_BUCKETS = 5000
+
+
+def _rollup_filters(source=None, agent=None, type=None, model=None) -> Dict[str, Optional[str]]:
+    return {'source': source, 'agent': agent, 'type': type, 'model': model}
+
+
+def _rollup_breakdown(rollups, since, until, by: str, **filters) -> Dict[str, int]:
+    """按维度汇总；provider 由模型名映射"""
+    if by != 'provider':
+        return rollups.breakdown(since, until, by, **filters)
+    out: Dict[str, int] = defaultdict(int)
+    for model, n in rollups.breakdown(since, until, 'model', **filters).items():
+        out[parse_provider(model) if model else 'unknown'] += n
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+
+def get_error_stats() -> Dict:
+    """计算错误统计（来自增量维护的错误时间序列，覆盖保留期内的全部 session 错误与 Model Failures）"""
+    from data.error_rollup_feed import sync_error_rollups
+
+    rollups = sync_error_rollups()
+    by_source = rollups.breakdown(None, None, 'source')
+    session_count = by_source.get('session', 0)
+    model_count = by_source.get('model', 0)
+
+    type_stats = {}
+    for source in ('session', 'model'):
+        for err_type, n in rollups.breakdown(None, None, 'type', source=source).items():
+            row = type_stats.setdefault(err_type, {
+                'count': 0,
+                'label': ERROR_TYPE_MAP.get(err_type, {}).get('label', err_type),
+                'color': ERROR_TYPE_MAP.get(err_type, {}).get('color', '#6b7280'),
+            })
+            row['count'] += n
+
+    agent_stats = {
+        agent_id: {'count': n, 'agentId': agent_id}
+        for agent_id, n in rollups.breakdown(None, None, 'agent', source='session').items()
+    }
+
+    # 最近 24 小时（含当前小时）的小时序列
+    now_ms = int(time.time() * 1000)
+    hour_ms = 3_600_000
+    since = (now_ms // hour_ms - 23) * hour_ms
+    session_rows = rollups.series(since, now_ms + 1, 'hour', source='session')
+    model_rows = rollups.series(since, now_ms + 1, 'hour', source='model')
+    hourly_list = [
+        {
+            'hour': datetime.fromtimestamp(s_row['t'] / 1000).strftime('%Y-%m-%d %H:00'),
+            'count': s_row['count'] + m_row['count'],
+        }
+        for s_row, m_row in zip(session_rows, model_rows)
+    ]
 
     return {
-        'totalCount': len(session_errors) + len(model_failures),
-        'sessionErrorCount': len(session_errors),
-        'modelFailureCount': len(model_failures),
-        'byType': dict(type_stats),
-        'byAgent': dict(agent_stats),
+        'totalCount': session_count + model_count,
+        'sessionErrorCount': session_count,
+        'modelFailureCount': model_count,
+        'byType': type_stats,
+        'byAgent': agent_stats,
         'hourlyTrend': hourly_list,
     }
 
 
+def _error_cursor_key(error: Dict) -> tuple:
+    return (timestamp_ms(error.get("timestamp")), str(error.get("id") or ""))
+
+
+def _decode_errors_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    游标内两个列表各自的位置：{"s": [ts, id] | null, "m": [ts, id] | null}，
+    null 表示该列表已翻完；无游标时两者都从头开始
+    """
+    state = decode_cursor(cursor)
+    if state is None:
+        return None
+    if not isinstance(state, dict) or set(state) != {"s", "m"}:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return {k: as_cursor(v) for k, v in state.items()}
+
+
+def _page_model_failures(state: Optional[Dict[str, Any]], limit: int, model, type, since, until):
+    if state is not None and state["m"] is None:
+        return [], None
+    items = [e for e in get_model_failures(None, model, type) if in_time_range(timestamp_ms(e.get("timestamp")), since, until)]
+    return page_items(items, _error_cursor_key, state["m"] if state else None, limit)
+
+
+def _page_session_errors(state: Optional[Dict[str, Any]], limit: int, agent, type, since, until):
+    if state is not None and state["s"] is None:
+        return [], None
+    rows = get_session_errors(limit + 1, agent, type, since, until, before=state["s"] if state else None)
+    page = rows[:limit]
+    return page, (_error_cursor_key(page[-1]) if len(rows) > limit else None)
+
+
 @router.get("/errors")
 async def get_errors(
     limit: int = Query(50, ge=1, le=500),
     agent: Optional[str] = Query(None, description="按 Agent ID 筛选"),
     type: Optional[str] = Query(None, description="按错误类型筛选"),
     model: Optional[str] = Query(None, description="按模型筛选"),
+    since: Optional[int] = Query(None, description="时间下限（ms，含）"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor"),
 ):
     """
     获取错误中心数据
-    支持按 Agent、类型、模型筛选
+    支持按 Agent、类型、模型、时间范围筛选；两个列表各自最多 limit 条，共用一个游标翻页
     """
+    state = _decode_errors_cursor(cursor)
     try:
-        session_errors = get_session_errors(limit, agent, type)
-        model_failures = get_model_failures(limit, model, type)
+        session_errors, next_s = _page_session_errors(state, limit, agent, type, since, until)
+        model_failures, next_m = _page_model_failures(state, limit, model, type, since, until)
     except Exception as e:
         record_error("unknown", str(e), "api:errors:list", exc=e)
         raise HTTPException(status_code=500, detail=safe_api_error_detail(e)) from e
 
+    next_cursor = None
+    if next_s or next_m:
+        next_cursor = encode_cursor({
+            "s": list(next_s) if next_s else None,
+            "m": list(next_m) if next_m else None,
+        })
     return {
         "sessionErrors": session_errors,
         "modelFailures": model_failures,
+        "nextCursor": next_cursor,
     }
 
 
@@ -255,9 +309,7 @@ async def get_errors_stats():
     包括：总数、按类型分布、按 Agent 分布、时间趋势
     """
     try:
-        session_errors = get_session_errors(200)
-        model_failures = get_model_failures(200)
-        out = get_error_stats(session_errors, model_failures)
+        out = get_error_stats()
         out["framework"] = get_framework_error_stats_for_client()
         return out
     except Exception as e:
@@ -265,6 +317,139 @@ async def get_errors_stats():
         raise HTTPException(status_code=500, detail=safe_api_error_detail(e)) from e
 
 
+@router.get("/errors/timeseries")
+async def get_errors_timeseries(
+    since: Optional[int] = Query(None, description="时间下限（ms，含），默认 24 小时前"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含），默认当前"),
+    step: Optional[str] = Query(None, pattern="^(minute|hour)$", description="桶粒度；默认区间 ≤6h 按分钟"),
+    groupBy: Optional[str] = Query(None, pattern="^(source|agent|type|model|provider)$"),
+    source: Optional[str] = Query(None, pattern="^(session|model|framework)$"),
+    agent: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+):
+    """
+    错误趋势：按分钟 / 小时对齐的计数序列（分钟桶保留 48 小时，小时桶保留 90 天）
+    """
+    from data.error_rollup_feed import sync_error_rollups
+
+    now_ms = int(time.time() * 1000)
+    until = now_ms + 1 if until is None else until
+    since = until - 24 * 3_600_000 if since is None else since
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be earlier than until")
+    step = step or ('minute' if until - since <= 6 * 3_600_000 else 'hour')
+    step_ms = 60_000 if step == 'minute' else 3_600_000
+    if (until - 1) // step_ms - since // step_ms + 1 > MAX_SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail="range too large for step")
+
+    rollups = sync_error_rollups()
+    filters = _rollup_filters(source, agent, type, model)
+    group = 'model' if groupBy == 'provider' else groupBy
+    points = rollups.series(since, until, step, group, **filters)
+    if groupBy == 'provider':
+        for row in points:
+            groups: Dict[str, int] = defaultdict(int)
+            for m, n in row['groups'].items():
+                groups[parse_provider(m) if m else 'unknown'] += n
+            row['groups'] = dict(groups)
+    return {'since': since, 'until': until, 'step': step, 'groupBy': groupBy, 'points': points}
+
+
+@router.get("/errors/breakdown")
+async def get_errors_breakdown(
+    by: str = Query('type', pattern="^(source|agent|type|model|provider)$"),
+    since: Optional[int] = Query(None, description="时间下限（ms，含），默认全部保留期"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含）"),
+    source: Optional[str] = Query(None, pattern="^(session|model|framework)$"),
+    agent: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+):
+    """
+    错误分布：按来源 / Agent / 类型 / 模型 / 服务商汇总（计数倒序）
+    """
+    from data.error_rollup_feed import sync_error_rollups
+
+    rollups = sync_error_rollups()
+    counts = _rollup_breakdown(rollups, since, until, by, **_rollup_filters(source, agent, type, model))
+    return {
+        'by': by,
+        'since': since,
+        'until': until,
+        'total': sum(counts.values()),
+        'items': [{'key': k, 'count': n} for k, n in counts.items()],
+    }
+
+
+def _cluster_cursor_key(cluster: Dict) -> tuple:
+    return (cluster["lastSeen"], cluster["id"])
+
+
+def _member_cursor_key(member: Dict) -> tuple:
+    return (member["timestamp"], member["id"])
+
+
+@router.get("/errors/clusters")
+async def get_error_clusters(
+    agent: Optional[str] = Query(None, description="只看影响该 Agent 的簇"),
+    type: Optional[str] = Query(None, description="按错误类型筛选"),
+    since: Optional[int] = Query(None, description="时间下限（ms，含）"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Session 错误簇：按 (类型, 文案签名) 聚合，含计数、受影响 Agent、首末出现时间与样例；按最近出现时间倒序。
+    带 since / until 时计数与首末时间只统计窗口内的成员
+    """
+    from data.error_clusters import get_error_cluster_table
+    from data.error_index import get_error_index
+    from data.error_rollup_feed import sync_error_rollups
+
+    try:
+        sync_error_rollups()
+        clusters = get_error_cluster_table().clusters(agent, type, since, until, index=get_error_index())
+    except Exception as e:
+        record_error("unknown", str(e), "api:errors:clusters", exc=e)
+        raise HTTPException(status_code=500, detail=safe_api_error_detail(e)) from e
+    page, next_cursor = page_items(clusters, _cluster_cursor_key, decode_page_cursor(cursor), limit)
+    return {
+        "clusters": page,
+        "total": len(clusters),
+        "nextCursor": encode_cursor(list(next_cursor)) if next_cursor else None,
+    }
+
+
+@router.get("/errors/clusters/{cluster_id}/members")
+async def get_error_cluster_members(
+    cluster_id: str,
+    agent: Optional[str] = Query(None, description="按 Agent ID 筛选"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """簇成员（时间倒序，游标分页；成员直接从错误索引按 (时间, id) keyset 查询）"""
+    from data.error_clusters import get_error_cluster_table
+    from data.error_index import get_error_index
+    from data.error_rollup_feed import sync_error_rollups
+
+    before = decode_page_cursor(cursor)
+    sync_error_rollups()
+    table = get_error_cluster_table()
+    summary = table.summary(cluster_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="cluster not found")
+    rows = table.members(cluster_id, get_error_index(), agent, before, limit + 1) or []
+    page = rows[:limit]
+    next_cursor = _member_cursor_key(page[-1]) if len(rows) > limit else None
+    return {
+        "clusterId": cluster_id,
+        "members": page,
+        "total": summary["agents"].get(agent, 0) if agent else summary["count"],
+        "nextCursor": encode_cursor(list(next_cursor)) if next_cursor else None,
+    }
+
+
 @router.get("/errors/api-status")
 async def get_errors_api_status():
     """
@@ -284,7 +469,7 @@ async def get_errors_summary():
         session_errors = get_session_errors(100)
         model_failures = get_model_failures(100)
         api_status = get_api_status()
-        stats = get_error_stats(session_errors, model_failures)
+        stats = get_error_stats()
     except Exception as e:
         record_error("unknown", str(e), "api:errors:summary", exc=e)
         raise HTTPException(status_code=500, detail=safe_api_error_detail(e)) from e
@@ -298,10 +483,25 @@ async def get_errors_summary():
 
 
 @router.get("/errors/reliability")
-async def get_reliability_stats():
+async def get_reliability_stats(
+    scope: Optional[str] = Query(None, description="最近错误按作用域前缀筛选"),
+    type: Optional[str] = Query(None, description="最近错误按类型筛选"),
+    since: Optional[int] = Query(None, description="时间下限（ms，含）"),
+    until: Optional[int] = Query(None, description="时间上限（ms，不含）"),
+    limit: int = Query(50, ge=0, le=1000),
+):
     """
     NFR-R 可靠性指标接口
-    包括：监听成功率(NFR-R-002)、错误恢复时间(NFR-R-003)、优雅降级率(NFR-R-005)
+    包括：监听成功率(NFR-R-002)、错误恢复时间(NFR-R-003)、优雅降级率(NFR-R-005)，
+    以及框架错误环形缓冲中的最近错误（recentErrors，新的在前）
     """
-    from core.error_handler import get_reliability_metrics
-    return get_reliability_metrics()
+    from core.error_handler import get_reliability_metrics, query_framework_errors_for_client
+
+    out = get_reliability_metrics()
+    out["recentErrors"] = (
+        query_framework_errors_for_client(
+            scope=scope, error_type=type, since=since, until=until, limit=limit
+        )
+        if limit > 0 else []
+    )
+    return out
@@ -0,0 +1,110 @@
+"""
+列表接口的游标分页与通用过滤
+
+- 列表按 (timestamp, id) 倒序；游标是最后一条 (timestamp, id) 的不透明编码（base64url JSON）
+- 下一页只取严格小于游标的条目，翻页期间插入的新条目不会造成重复或遗漏
+- 下一页游标统一放在响应体的 nextCursor 字段（没有更多时为 null）
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+Cursor = Tuple[int, str]
+
+
+def encode_cursor(payload: Any) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    """解码游标；空值返回 None，格式错误返回 400"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def as_cursor(value: Any) -> Optional[Cursor]:
+    """校验 [timestamp, id] 形式的游标"""
+    if value is None:
+        return None
+    if (
+        isinstance(value, list) and len(value) == 2
+        and isinstance(value[0], int) and isinstance(value[1], str)
+    ):
+        return value[0], value[1]
+    raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def decode_page_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    return as_cursor(decode_cursor(cursor))
+
+
+def timestamp_ms(value: Any) -> int:
+    """毫秒时间戳：兼容数值（秒/毫秒）与 ISO 字符串，无法解析时为 0"""
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        v = int(value)
+        return v * 1000 if 0 < v < 10_000_000_000 else v
+    if isinstance(value, str) and value:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return 0
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+    return 0
+
+
+def in_time_range(ts: int, since: Optional[int], until: Optional[int]) -> bool:
+    """since 含、until 不含"""
+    if since is not None and ts < since:
+        return False
+    if until is not None and ts >= until:
+        return False
+    return True
+
+
+def clamp_limit(limit: Any, default: int, max_limit: int) -> int:
+    """供可被直接调用（非经路由）的 handler 使用的 limit 规整"""
+    try:
+        value = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, max_limit))
+
+
+def page_items(
+    items: Sequence[T],
+    key: Callable[[T], Cursor],
+    cursor: Optional[Cursor],
+    limit: int,
+) -> Tuple[List[T], Optional[Cursor]]:
+    """
+    items 须已按 key 倒序。返回 (本页, 下一页游标)；没有更多时游标为 None。
+    """
+    start = 0
+    if cursor is not None:
+        while start < len(items) and key(items[start]) >= cursor:
+            start += 1
+    page = list(items[start:start + limit])
+    more = start + limit < len(items)
+    return page, (key(page[-1]) if more and page else None)
+
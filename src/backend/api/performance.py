@@ -4,15 +4,21 @@
 """
 from fastapi import APIRouter
 from typing import List, Dict, Any, Optional
-import json
-import re
+import builtins
+import time
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
+from data.session_manifest import ManifestEntry
 from data.session_reader import normalize_sessions_index, _load_sessions_index_file
+from data.usage_store import (
+    UsageTable,
+    sync_usage_store,
+    _extract_trigger_text,  # noqa: F401  兼容旧导入路径
+    _extract_tool_call_detail,  # noqa: F401
+)
 from core.error_handler import record_error
-from utils.data_repair import parse_session_jsonl_line
 
 # 详情展示使用 Asia/Shanghai 时区
 TZ_DISPLAY = ZoneInfo('Asia/Shanghai')
@@ -20,153 +26,39 @@ TZ_DISPLAY = ZoneInfo('Asia/Shanghai')
 router = APIRouter()
 
 
-def _extract_trigger_text(msg: Dict) -> str:
-    """从消息中提取触发内容（完整展示）"""
-    content = msg.get('content') or []
-    if isinstance(content, str):
-        return content.replace('\n', ' ')
-    if not isinstance(content, list):
-        return ''
-    for item in content:
-        if isinstance(item, dict):
-            if item.get('type') == 'text' and item.get('text'):
-                text = str(item['text'])
-                if '[Subagent Task]' in text:
-                    m = re.search(r'\*\*任务[：:]\s*(.+?)\*\*', text)
-                    if m:
-                        return f"子任务: {m.group(1).strip()}"
-                return text.replace('\n', ' ')
-            if item.get('type') == 'toolCall':
-                return f"工具调用: {item.get('name', '?')}"
-    return ''
-
-
-def _extract_tool_call_detail(msg: Dict, tool_call_id: str) -> str:
-    """从 assistant 消息的 content 中提取 toolCall 的 arguments 详情"""
-    content = msg.get('content') or []
-    if not isinstance(content, list):
-        return ''
-    for item in content:
-        if not isinstance(item, dict):
-            continue
-        if item.get('type') == 'toolCall' and item.get('id') == tool_call_id:
-            name = item.get('name', '')
-            args = item.get('arguments') or {}
-            if isinstance(args, str):
-                try:
-                    args = json.loads(args)
-                except Exception:
-                    args = {}
-            if not isinstance(args, dict):
-                args = {}
-            if name == 'exec' and args:
-                cmd = args.get('command', '')
-                if cmd:
-                    return f"exec: {cmd}"
-            if name == 'read' and args:
-                path = args.get('path', '')
-                if path:
-                    return f"read: {path}"
-            if name == 'write' and args:
-                path = args.get('path', '')
-                if path:
-                    return f"write: {path}"
-            if name == 'process' and args:
-                action = args.get('action', '')
-                sid = args.get('sessionId', '')
-                if action and sid:
-                    return f"process: {action} ({sid})"
-                if action:
-                    return f"process: {action}"
-            if name == 'sessions_spawn' and args:
-                task = (args.get('task') or '').replace(chr(10), ' ')
-                agent = args.get('agentId', '')
-                if task and agent:
-                    return f"sessions_spawn: {agent} - {task}"
-                if agent:
-                    return f"sessions_spawn: {agent}"
-            # 其他工具：显示完整 arguments
-            if args:
-                try:
-                    s = json.dumps(args, ensure_ascii=False)
-                    return f"{name}: {s}"
-                except Exception:
-                    pass
-            return f"工具: {name}"
-    return ''
+def _parse_into_table(session_path: Path, agent_id: str, since_ms: Optional[int] = None) -> UsageTable:
+    """单文件解析到临时 usage 表（与全局表同一解析路径）；mtime 早于时间窗的文件不打开"""
+    table = UsageTable()
+    try:
+        stat = session_path.stat()
+    except OSError as e:
+        record_error("io-error", f"{session_path}: {e}", "performance:parse_session_details", exc=e)
+        return table
+    entry = ManifestEntry(str(session_path), agent_id, stat.st_size, stat.st_mtime)
+    if entry.may_overlap(since_ms):
+        table.sync_file(session_path, agent_id, stat.st_size, stat.st_mtime)
+    return table
+
+
+def _row_datetime(row: Dict) -> datetime:
+    return datetime.fromtimestamp(row['timestampMs'] / 1000, tz=timezone.utc)
 
 
 def parse_session_file_with_details(session_path: Path, agent_id: str) -> List[Dict]:
     """解析 session，返回带详情的 API 调用记录（assistant 消息）"""
     records = []
-    id_to_msg = {}
-    
-    try:
-        with open(session_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data, msg = parse_session_jsonl_line(line)
-                    if not data or data.get('type') != 'message' or not msg:
-                        continue
-
-                    msg_id = data.get('id', '')
-                    id_to_msg[msg_id] = {'data': data, 'msg': msg}
-
-                    if msg.get('role') != 'assistant':
-                        continue
-                    if 'usage' not in msg:
-                        continue
-
-                    ts_raw = data.get('timestamp')
-                    if not ts_raw:
-                        continue
-                    try:
-                        ts = datetime.fromisoformat(str(ts_raw).replace('Z', '+00:00'))
-                    except Exception:
-                        continue
-                    
-                    usage = msg.get('usage', {})
-                    tokens = usage.get('totalTokens', 0) or 0
-                    model = msg.get('model', '')
-                    
-                    trigger = ''
-                    parent_id = data.get('parentId')
-                    if parent_id and parent_id in id_to_msg:
-                        parent = id_to_msg[parent_id]['msg']
-                        parent_role = parent.get('role', '')
-                        if parent_role == 'user':
-                            trigger = _extract_trigger_text(parent)
-                        elif parent_role == 'toolResult':
-                            tool = parent.get('toolName', '') or (parent.get('details') or {}).get('tool', '?')
-                            tool_call_id = parent.get('toolCallId', '')
-                            # 从 toolResult 的 parent（发起调用的 assistant）获取 toolCall 详情
-                            parent_data = id_to_msg.get(parent_id, {})
-                            parent_of_tr = parent_data.get('data', {})
-                            tr_parent_id = parent_of_tr.get('parentId', '')
-                            if tool_call_id and tr_parent_id and tr_parent_id in id_to_msg:
-                                detail = _extract_tool_call_detail(id_to_msg[tr_parent_id]['msg'], tool_call_id)
-                                # 重要：这是 toolResult 触发的消息，即工具执行完成后的回传，不是工具调用本身
-                                # 【完成回传】前缀醒目，因果顺序：派发 → 子Agent执行 → 完成回传
-                                trigger = f"【完成回传】{detail}" if detail else f"【完成回传】工具: {tool}"
-                            else:
-                                trigger = f"【完成回传】工具: {tool}"
-                    
-                    records.append({
-                        'timestamp': ts,
-                        'tokens': tokens,
-                        'agentId': agent_id,
-                        'sessionId': session_path.stem,
-                        'model': model,
-                        'trigger': trigger or '(用户输入)',
-                        'inputTokens': usage.get('input', 0),
-                        'outputTokens': usage.get('output', 0)
-                    })
-                except Exception:
-                    continue
-        return records
-    except Exception as e:
-        record_error("io-error", f"{session_path}: {e}", "performance:parse_session_details", exc=e)
-        return []
+    for r in _parse_into_table(session_path, agent_id).records(requests_only=True):
+        records.append({
+            'timestamp': _row_datetime(r),
+            'tokens': r['tokens'],
+            'agentId': r['agentId'],
+            'sessionId': r['sessionId'],
+            'model': r['model'],
+            'trigger': r['trigger'],
+            'inputTokens': r['inputTokens'],
+            'outputTokens': r['outputTokens']
+        })
+    return records
 
 
 def parse_session_file(session_path: Path, range_hours: int = 1) -> List[Dict]:
@@ -176,50 +68,18 @@ def parse_session_file(session_path: Path, range_hours: int = 1) -> List[Dict]:
         session_path: session 文件路径
         range_hours: 时间范围（小时），0 表示不限制
     """
-    messages = []
-
-    try:
-        with open(session_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    envelope, msg = parse_session_jsonl_line(line)
-                    if (
-                        not envelope
-                        or envelope.get('type') != 'message'
-                        or not msg
-                        or 'usage' not in msg
-                        or not envelope.get('timestamp')
-                    ):
-                        continue
-                    usage = msg['usage']
-                    tokens = usage.get('totalTokens', 0) or 0
-                    is_request = msg.get('role') == 'assistant'
-
-                    try:
-                        timestamp = datetime.fromisoformat(
-                            str(envelope['timestamp']).replace('Z', '+00:00')
-                        )
-
-                        if range_hours > 0:
-                            now = datetime.now(timezone.utc)
-                            time_ago = now - timedelta(hours=range_hours)
-                            if timestamp < time_ago:
-                                continue
-
-                        messages.append({
-                            'timestamp': timestamp,
-                            'tokens': tokens,
-                            'is_request': is_request
-                        })
-                    except Exception:
-                        pass
-                except Exception:
-                    continue
-
-        return messages
-    except Exception as e:
-        record_error("io-error", f"{session_path}: {e}", "performance:parse_session_file", exc=e)
-        return []
+    since_ms = None
+    if range_hours > 0:
+        since_ms = int(time.time() * 1000) - range_hours * 3_600_000
+    table = _parse_into_table(session_path, session_path.parent.parent.name, since_ms)
+    return [
+        {
+            'timestamp': _row_datetime(r),
+            'tokens': r['tokens'],
+            'is_request': r['isRequest']
+        }
+        for r in table.records(since_ms=since_ms, requests_only=False)
+    ]
 
 
 @router.get("/performance")
@@ -276,90 +136,40 @@ async def get_real_stats(range_minutes: int = 20, range_hours: int = 1, granular
     if not agents_path.exists():
         return stats
 
-    # 按时间槽统计（分钟或小时）
-    time_slot_stats = {}
-
-    # 扫描所有 agent 的 sessions
-    for agent_dir in agents_path.iterdir():
-        if not agent_dir.is_dir():
-            continue
-
-        sessions_path = agent_dir / 'sessions'
-        if not sessions_path.exists():
-            continue
-
-        # 扫描所有 .jsonl 文件
-        for session_file in sessions_path.glob('*.jsonl'):
-            # 跳过 lock 和 deleted 文件
-            if 'lock' in session_file.name or 'deleted' in session_file.name:
-                continue
-
-            # 解析 session 文件，获取所有消息
-            messages = parse_session_file(session_file, range_hours)
-
-            # 按时间槽逐条累加
-            for msg in messages:
-                if granularity == "hour":
-                    slot_key = msg['timestamp'].strftime('%Y-%m-%d %H:00')
-                else:
-                    slot_key = msg['timestamp'].strftime('%Y-%m-%d %H:%M')
-
-                if slot_key not in time_slot_stats:
-                    time_slot_stats[slot_key] = {
-                        'tokens': 0,
-                        'requests': 0
-                    }
-
-                time_slot_stats[slot_key]['tokens'] += msg['tokens']
-                if msg['is_request']:
-                    time_slot_stats[slot_key]['requests'] += 1
+    # 按时间槽统计（分钟或小时）：列式 usage 表按 epoch 桶聚合，键为 ts_ms // bucket_ms
+    bucket_ms = 3_600_000 if granularity == "hour" else 60_000
+    now = datetime.now(timezone.utc)
+    since_ms = int(now.timestamp() * 1000) - range_hours * 3_600_000
+    time_slot_stats, _ = sync_usage_store(since_ms).aggregate(since_ms, bucket_ms)
 
     # 填充时间槽数据
     timestamps = []
     tpm_data = []
     rpm_data = []
-    now = datetime.now(timezone.utc)
 
     if granularity == "hour":
         # 24h 模式：24 个小时槽
-        for i in range(24):
-            hour_time = now - timedelta(hours=(23 - i))
-            slot_key = hour_time.strftime('%Y-%m-%d %H:00')
-            timestamps.append(int(hour_time.timestamp() * 1000))
-
-            if slot_key in time_slot_stats:
-                tpm_data.append(time_slot_stats[slot_key]['tokens'])
-                rpm_data.append(time_slot_stats[slot_key]['requests'])
-            else:
-                tpm_data.append(0)
-                rpm_data.append(0)
+        slot_times = [now - timedelta(hours=(23 - i)) for i in range(24)]
     else:
         # 20m / 1h 模式：分钟槽
-        for i in range(range_minutes):
-            minute_time = now - timedelta(minutes=(range_minutes - i - 1))
-            slot_key = minute_time.strftime('%Y-%m-%d %H:%M')
-            timestamps.append(int(minute_time.timestamp() * 1000))
-
-            if slot_key in time_slot_stats:
-                tpm_data.append(time_slot_stats[slot_key]['tokens'])
-                rpm_data.append(time_slot_stats[slot_key]['requests'])
-            else:
-                tpm_data.append(0)
-                rpm_data.append(0)
+        slot_times = [now - timedelta(minutes=(range_minutes - i - 1)) for i in range(range_minutes)]
+
+    for slot_time in slot_times:
+        slot_ms = int(slot_time.timestamp() * 1000)
+        timestamps.append(slot_ms)
+        slot = time_slot_stats.get(slot_ms // bucket_ms)
+        tpm_data.append(slot[0] if slot else 0)
+        rpm_data.append(slot[1] if slot else 0)
 
     stats['history']['tpm'] = tpm_data
     stats['history']['rpm'] = rpm_data
     stats['history']['timestamps'] = timestamps
 
     # 当前时间槽的统计
-    if granularity == "hour":
-        current_slot = now.strftime('%Y-%m-%d %H:00')
-    else:
-        current_slot = now.strftime('%Y-%m-%d %H:%M')
-
-    if current_slot in time_slot_stats:
-        stats['current']['tpm'] = time_slot_stats[current_slot]['tokens']
-        stats['current']['rpm'] = time_slot_stats[current_slot]['requests']
+    current_slot = time_slot_stats.get(int(now.timestamp() * 1000) // bucket_ms)
+    if current_slot:
+        stats['current']['tpm'] = current_slot[0]
+        stats['current']['rpm'] = current_slot[1]
 
     # 时间窗口总计
     stats['current']['windowTotal']['tokens'] = sum(tpm_data)
@@ -418,52 +228,28 @@ async def get_minute_details(
             return {'timeWindow': time_key, 'calls': [], 'totalCalls': 0, 'totalTokens': 0, 'summary': {'avgTokens': 0}, 'agents': []}
 
         all_calls = []
-        agent_set = set()
-
-        for agent_dir in agents_path.iterdir():
-            if not agent_dir.is_dir():
-                continue
-            agent_id = agent_dir.name
-            agent_set.add(agent_id)
-
-            # 如果指定了 agent 筛选，跳过不匹配的
-            if agent and agent_id != agent:
-                continue
-
-            sessions_path = agent_dir / 'sessions'
-            if not sessions_path.exists():
+        agent_set = {d.name for d in agents_path.iterdir() if d.is_dir()}
+
+        start_ms = int(time_start.timestamp() * 1000)
+        end_ms = int(time_end.timestamp() * 1000)
+        store = sync_usage_store(start_ms)
+        for r in store.records(since_ms=start_ms, until_ms=end_ms, agent_id=agent):
+            # 如果指定了搜索关键词，过滤触发内容
+            if search and search.lower() not in r['trigger'].lower():
                 continue
-
-            for session_file in sessions_path.glob('*.jsonl'):
-                if 'lock' in session_file.name or 'deleted' in session_file.name:
-                    continue
-                records = parse_session_file_with_details(session_file, agent_id)
-                for r in records:
-                    if time_start <= r['timestamp'] < time_end:
-                        # 转为 Asia/Shanghai 时区展示
-                        r_ts = r['timestamp']
-                        if r_ts.tzinfo is None:
-                            r_ts = r_ts.replace(tzinfo=timezone.utc)
-                        r_local = r_ts.astimezone(TZ_DISPLAY)
-
-                        call_item = {
-                            'agentId': r['agentId'],
-                            'sessionId': r['sessionId'],
-                            'model': r['model'],
-                            'tokens': r['tokens'],
-                            'trigger': r['trigger'],
-                            'inputTokens': r.get('inputTokens', 0),
-                            'outputTokens': r.get('outputTokens', 0),
-                            'time': r_local.strftime('%H:%M:%S'),
-                            'timestamp': int(r_ts.timestamp() * 1000)
-                        }
-
-                        # 如果指定了搜索关键词，过滤触发内容
-                        if search:
-                            if search.lower() not in call_item['trigger'].lower():
-                                continue
-
-                        all_calls.append(call_item)
+            # 转为 Asia/Shanghai 时区展示
+            r_local = _row_datetime(r).astimezone(TZ_DISPLAY)
+            all_calls.append({
+                'agentId': r['agentId'],
+                'sessionId': r['sessionId'],
+                'model': r['model'],
+                'tokens': r['tokens'],
+                'trigger': r['trigger'],
+                'inputTokens': r['inputTokens'],
+                'outputTokens': r['outputTokens'],
+                'time': r_local.strftime('%H:%M:%S'),
+                'timestamp': r['timestampMs']
+            })
 
         # 排序
         if sort == "tokens_desc":
@@ -598,105 +384,29 @@ async def get_tokens_analysis(range: str = "all"):
             granularity = 'hour'
             num_slots = 24
 
-        # 初始化时间槽数据
-        slot_stats = {}
-        for i in range(num_slots):
-            if granularity == 'hour':
-                slot_time = now - timedelta(hours=(num_slots - i - 1))
-                slot_key = slot_time.strftime('%Y-%m-%d %H:00')
-            else:
-                slot_time = now - timedelta(minutes=(num_slots - i - 1))
-                slot_key = slot_time.strftime('%Y-%m-%d %H:%M')
-            slot_stats[slot_key] = {
-                'timestamp': int(slot_time.timestamp() * 1000),
-                'input': 0,
-                'output': 0,
-                'cacheRead': 0,
-                'cacheWrite': 0
-            }
-
-        agent_totals = {}
-
-        for agent_dir in agents_path.iterdir():
-            if not agent_dir.is_dir():
-                continue
-            agent_id = agent_dir.name
-            sessions_path = agent_dir / 'sessions'
-            if not sessions_path.exists():
-                continue
-
-            agent_totals[agent_id] = {"input": 0, "output": 0, "cacheRead": 0, "cacheWrite": 0}
-
-            for session_file in sessions_path.glob('*.jsonl'):
-                if 'lock' in session_file.name or 'deleted' in session_file.name:
-                    continue
+        bucket_ms = 3_600_000 if granularity == 'hour' else 60_000
+        if granularity == 'hour':
+            slot_times = [now - timedelta(hours=(num_slots - i - 1)) for i in builtins.range(num_slots)]
+        else:
+            # 参数名 range 遮蔽了内置 range()
+            slot_times = [now - timedelta(minutes=(num_slots - i - 1)) for i in builtins.range(num_slots)]
 
-                try:
-                    with open(session_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            try:
-                                envelope, msg = parse_session_jsonl_line(line)
-                                if (
-                                    envelope is None
-                                    or envelope.get('type') != 'message'
-                                    or msg is None
-                                ):
-                                    continue
-                                if msg.get('role') != 'assistant' or 'usage' not in msg:
-                                    continue
-
-                                ts_raw = envelope.get('timestamp') or msg.get('timestamp')
-                                ts = None
-                                if isinstance(ts_raw, (int, float)):
-                                    v = float(ts_raw)
-                                    ts = datetime.fromtimestamp(
-                                        (v / 1000.0) if v > 1e12 else v, tz=timezone.utc
-                                    )
-                                elif isinstance(ts_raw, str):
-                                    try:
-                                        ts = datetime.fromisoformat(
-                                            ts_raw.replace('Z', '+00:00')
-                                        )
-                                        if ts.tzinfo is None:
-                                            ts = ts.replace(tzinfo=timezone.utc)
-                                    except ValueError:
-                                        ts = None
-                                if ts is None or ts < time_ago:
-                                    continue
-
-                                usage = msg['usage']
-                                inp = usage.get('input', 0) or 0
-                                out = usage.get('output', 0) or 0
-                                cr = usage.get('cacheRead', 0) or 0
-                                cw = usage.get('cacheWrite', 0) or 0
-
-                                # 确定时间槽
-                                if granularity == 'hour':
-                                    slot_key = ts.strftime('%Y-%m-%d %H:00')
-                                else:
-                                    slot_key = ts.strftime('%Y-%m-%d %H:%M')
-
-                                if slot_key in slot_stats:
-                                    slot_stats[slot_key]['input'] += inp
-                                    slot_stats[slot_key]['output'] += out
-                                    slot_stats[slot_key]['cacheRead'] += cr
-                                    slot_stats[slot_key]['cacheWrite'] += cw
-
-                                agent_totals[agent_id]["input"] += inp
-                                agent_totals[agent_id]["output"] += out
-                                agent_totals[agent_id]["cacheRead"] += cr
-                                agent_totals[agent_id]["cacheWrite"] += cw
-                            except:
-                                continue
-                except:
-                    continue
+        # 仅统计 assistant usage，按 epoch 桶聚合
+        since_ms = int(time_ago.timestamp() * 1000)
+        buckets, by_agent = sync_usage_store(since_ms).aggregate(since_ms, bucket_ms, requests_only=True)
 
         # 汇总趋势数据
-        sorted_slots = sorted(slot_stats.items())
-        trend_data = {
-            "timestamps": [s[1]['timestamp'] for s in sorted_slots],
-            "input": [s[1]['input'] for s in sorted_slots],
-            "output": [s[1]['output'] for s in sorted_slots]
+        trend_data = {"timestamps": [], "input": [], "output": []}
+        for slot_time in slot_times:
+            slot_ms = int(slot_time.timestamp() * 1000)
+            slot = buckets.get(slot_ms // bucket_ms)
+            trend_data["timestamps"].append(slot_ms)
+            trend_data["input"].append(slot[2] if slot else 0)
+            trend_data["output"].append(slot[3] if slot else 0)
+
+        agent_totals = {
+            agent_id: {"input": v[2], "output": v[3], "cacheRead": v[4], "cacheWrite": v[5]}
+            for agent_id, v in by_agent.items()
         }
 
         # 汇总 agent 数据
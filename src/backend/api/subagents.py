@@ -3,7 +3,7 @@ Subagent API 路由
 """
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import json
 import sys
 from pathlib import Path
@@ -16,7 +16,9 @@ from data.subagent_reader import (
     get_agent_output_for_run,
     get_agent_files_for_run
 )
-from data.task_history import merge_with_history
+from data.task_history import MAX_MERGED_TASKS, merge_with_history, task_sort_key
+from data.session_counters import get_session_counters
+from data.run_session_cache import RunDigest, get_run_session_cache
 from data.session_reader import (
     normalize_sessions_index,
     resolve_session_jsonl_path,
@@ -25,10 +27,21 @@ from data.session_reader import (
 from utils.data_repair import parse_session_jsonl_line
 from core.error_handler import record_error
 from core.safe_api_error import safe_client_string
+from api.pagination import (
+    clamp_limit,
+    decode_page_cursor,
+    encode_cursor,
+    in_time_range,
+    page_items,
+    timestamp_ms,
+)
 import time
 
 router = APIRouter()
 
+# 分页接口单页上限
+MAX_PAGE_LIMIT = 500
+
 
 class SubagentRun(BaseModel):
     runId: str
@@ -82,15 +95,45 @@ def extract_outcome(outcome: Any) -> Optional[str]:
     return None
 
 
+def _run_status(run: Dict[str, Any]) -> Optional[str]:
+    """过滤用状态：未结束为 running，否则为 outcome 状态"""
+    if not run.get('endedAt'):
+        return 'running'
+    return extract_outcome(run.get('outcome'))
+
+
+def _run_cursor_key(run: Dict[str, Any]) -> Tuple[int, str]:
+    return (timestamp_ms(run.get('startedAt')), str(run.get('runId') or ''))
+
+
 @router.get("/subagents")
-async def get_subagents():
-    """获取当前子代理运行（活跃 + 最近完成）"""
+async def get_subagents(
+    agent: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+):
+    """
+    获取当前子代理运行（活跃 + 最近完成）
+
+    支持按 agent / status（running 或 outcome 状态）/ startedAt 时间范围（ms）过滤，
+    游标分页（nextCursor）。
+    """
+    before = decode_page_cursor(cursor)
+    limit = clamp_limit(limit, 20, MAX_PAGE_LIMIT)
     try:
-        all_runs = load_subagent_runs()
+        all_runs = [
+            run for run in load_subagent_runs()
+            if (not agent or parse_agent_id(run.get('childSessionKey', '')) == agent)
+            and (not status or _run_status(run) == status)
+            and in_time_range(timestamp_ms(run.get('startedAt')), since, until)
+        ]
 
-        # 按开始时间倒序，取前20个
-        all_runs.sort(key=lambda x: x.get('startedAt', 0), reverse=True)
-        recent_runs = all_runs[:20]
+        # 按开始时间倒序分页（默认前20个）
+        all_runs.sort(key=_run_cursor_key, reverse=True)
+        recent_runs, next_cursor = page_items(all_runs, _run_cursor_key, before, limit)
 
         result = []
         for run in recent_runs:
@@ -113,10 +156,13 @@ async def get_subagents():
                 'totalTokens': run.get('totalTokens')
             })
 
-        return result
+        return {
+            'subagents': result,
+            'nextCursor': encode_cursor(list(next_cursor)) if next_cursor else None,
+        }
     except Exception as e:
         record_error("unknown", str(e), "api:subagents:get_subagents", exc=e)
-        return []
+        return {'subagents': [], 'nextCursor': None}
 
 
 @router.get("/subagents/active")
@@ -250,51 +296,53 @@ def _format_error_message(raw: str) -> str:
     return raw.strip() or '未知'
 
 
-def _get_session_message_count(child_session_key: str) -> int:
+def _resolve_child_session_path(child_session_key: str) -> Optional[Path]:
     """
-    从子 Agent 的 session 文件中统计消息数量。
-    用于估算任务进度。
+    由 childSessionKey 经 sessions.json 解析子 Agent 的 session jsonl 路径。
 
     Args:
         child_session_key: 格式 agent:<agentId>:subagent:<uuid>
-
-    Returns:
-        消息数量，若无法获取则返回 0
     """
     if not child_session_key or ':' not in child_session_key:
-        return 0
+        return None
     parts = child_session_key.split(':')
     if len(parts) < 2 or parts[0] != 'agent':
-        return 0
+        return None
     agent_id = parts[1]
 
-    try:
-        from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
-        openclaw_path = get_openclaw_root()
-        aid = normalize_openclaw_agent_id(agent_id)
-        sessions_index = openclaw_path / "agents" / aid / "sessions" / "sessions.json"
-        if not sessions_index.exists():
-            return 0
+    from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
+    openclaw_path = get_openclaw_root()
+    aid = normalize_openclaw_agent_id(agent_id)
+    sessions_dir = openclaw_path / "agents" / aid / "sessions"
+    sessions_index = sessions_dir / "sessions.json"
+    if not sessions_index.exists():
+        return None
 
-        index_data = _load_sessions_index_file(sessions_index)
-        if not index_data:
-            return 0
-        index_map = normalize_sessions_index(index_data)
-        entry = index_map.get(child_session_key)
-        if not entry:
-            return 0
-        sessions_dir = openclaw_path / "agents" / aid / "sessions"
-        session_path = resolve_session_jsonl_path(sessions_dir, entry)
+    index_data = _load_sessions_index_file(sessions_index)
+    if not index_data:
+        return None
+    entry = normalize_sessions_index(index_data).get(child_session_key)
+    if not entry:
+        return None
+    return resolve_session_jsonl_path(sessions_dir, entry)
+
+
+def _get_session_message_count(child_session_key: str) -> int:
+    """
+    子 Agent session 文件中的消息数量（增量计数索引，只解析新增行）。
+    用于估算任务进度。
+
+    Args:
+        child_session_key: 格式 agent:<agentId>:subagent:<uuid>
+
+    Returns:
+        消息数量，若无法获取则返回 0
+    """
+    try:
+        session_path = _resolve_child_session_path(child_session_key)
         if not session_path:
             return 0
-
-        count = 0
-        with open(session_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                envelope, msg = parse_session_jsonl_line(line)
-                if envelope and envelope.get('type') == 'message' and msg is not None:
-                    count += 1
-        return count
+        return get_session_counters(session_path).messages
     except Exception as e:
         record_error("io-error", str(e), "api:subagents:session_message_count", exc=e)
         return 0
@@ -340,85 +388,166 @@ def _calculate_progress(run: Dict[str, Any]) -> int:
         return 80
 
 
-def _extract_subtasks_from_session(child_session_key: str) -> List[Dict[str, Any]]:
+# 单个 run 最多保留的子任务 / 时间线事件数
+MAX_RUN_SUBTASKS = 5
+MAX_RUN_TIMELINE_EVENTS = 50
+
+
+def _feed_subtasks(digest: RunDigest, msg: Dict[str, Any]) -> None:
+    """assistant 消息中的 subagent/delegate/spawn 调用 → 子任务（按任务描述去重）"""
+    if len(digest.subtasks) >= MAX_RUN_SUBTASKS or msg.get('role') != 'assistant':
+        return
+    for c in msg.get('content', []):
+        if not isinstance(c, dict) or c.get('type') != 'toolCall':
+            continue
+        name = c.get('name', '')
+        if name not in ('subagent', 'delegate', 'spawn'):
+            continue
+        args = c.get('arguments', {})
+        if isinstance(args, str):
+            try:
+                args = json.loads(args)
+            except json.JSONDecodeError:
+                continue
+        task_desc = args.get('task') or args.get('prompt') or args.get('instruction', '')
+        sub_agent_id = args.get('agentId') or args.get('agent') or args.get('agent_id', '')
+        if task_desc and task_desc not in digest.seen_tasks and len(digest.subtasks) < MAX_RUN_SUBTASKS:
+            digest.seen_tasks.add(task_desc)
+            digest.subtasks.append({
+                'task': task_desc[:200] if len(task_desc) > 200 else task_desc,
+                'agentId': sub_agent_id,
+                'status': 'unknown'
+            })
+
+
+def _timeline_timestamp(envelope: Dict[str, Any]) -> int:
+    ts = envelope.get('timestamp')
+    if isinstance(ts, str):
+        try:
+            from datetime import datetime as _dt
+            if 'T' in ts:
+                dt = _dt.fromisoformat(ts.replace('Z', '+00:00'))
+                return int(dt.timestamp() * 1000)
+            return int(ts)
+        except (ValueError, TypeError):
+            return 0
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    return 0
+
+
+def _feed_timeline(digest: RunDigest, envelope: Dict[str, Any], msg: Dict[str, Any]) -> None:
+    """user 任务输入、工具调用与结果输出 → 时间线事件"""
+    if len(digest.timeline) >= MAX_RUN_TIMELINE_EVENTS:
+        return
+    ts = _timeline_timestamp(envelope)
+    timeline = digest.timeline
+    role = msg.get('role', '')
+    content = msg.get('content', [])
+
+    if role == 'user':
+        for c in content:
+            if isinstance(c, dict) and c.get('type') == 'text':
+                text = c.get('text', '')[:100]
+                timeline.append({
+                    'time': ts,
+                    'type': 'start',
+                    'description': f'收到任务: {text}...' if len(c.get('text', '')) > 100 else f'收到任务: {text}'
+                })
+                break
+
+    elif role == 'assistant':
+        for c in content:
+            if not isinstance(c, dict):
+                continue
+            if c.get('type') == 'toolCall':
+                tool_name = c.get('name', 'unknown')
+                args = c.get('arguments', {})
+                if isinstance(args, str):
+                    try:
+                        args = json.loads(args)
+                    except json.JSONDecodeError:
+                        args = {}
+
+                desc = _describe_tool_call(tool_name, args)
+                timeline.append({
+                    'time': ts,
+                    'type': 'tool',
+                    'tool': tool_name,
+                    'description': desc
+                })
+
+            elif c.get('type') == 'text':
+                text = c.get('text', '')
+                if text.strip() and len(text) > 50:
+                    keywords = ['完成', '成功', 'finished', 'done', 'result', '总结']
+                    if any(kw in text.lower() for kw in keywords):
+                        timeline.append({
+                            'time': ts,
+                            'type': 'response',
+                            'description': f'输出结果 ({len(text)} 字符)'
+                        })
+
+
+def _feed_run_line(digest: RunDigest, line: str) -> None:
+    """run 缓存的逐行解析：同时累积子任务与时间线"""
+    envelope, msg = parse_session_jsonl_line(line)
+    if not envelope or envelope.get('type') != 'message' or not msg:
+        return
+    for feed in (lambda: _feed_subtasks(digest, msg), lambda: _feed_timeline(digest, envelope, msg)):
+        try:
+            feed()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+
+
+def _get_run_digest(child_session_key: str, finished: bool) -> Optional[RunDigest]:
+    """run 级解析缓存：已结束的 run 冻结（含落盘），运行中的只解析新增行"""
+    if not child_session_key:
+        return None
+    return get_run_session_cache().get(
+        child_session_key,
+        finished,
+        lambda: _resolve_child_session_path(child_session_key),
+        _feed_run_line,
+    )
+
+
+def _extract_subtasks_from_session(child_session_key: str, finished: bool = False) -> List[Dict[str, Any]]:
     """
     从子 Agent 的 session 文件中提取嵌套的子任务（subagent 调用）。
 
     Args:
         child_session_key: 格式 agent:<agentId>:subagent:<uuid>
+        finished: run 已结束时结果冻结，之后不再读取 session 文件
 
     Returns:
         子任务列表，每个包含: {task, agentId, status}
     """
-    if not child_session_key or ':' not in child_session_key:
-        return []
-    parts = child_session_key.split(':')
-    if len(parts) < 2 or parts[0] != 'agent':
-        return []
-    agent_id = parts[1]
-
     try:
-        from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
-        openclaw_path = get_openclaw_root()
-        aid = normalize_openclaw_agent_id(agent_id)
-        sessions_index = openclaw_path / "agents" / aid / "sessions" / "sessions.json"
-        if not sessions_index.exists():
+        digest = _get_run_digest(child_session_key, finished)
+        if digest is None:
             return []
-
-        index_data = _load_sessions_index_file(sessions_index)
-        if not index_data:
-            return []
-        index_map = normalize_sessions_index(index_data)
-        entry = index_map.get(child_session_key)
-        if not entry:
-            return []
-        sessions_dir = openclaw_path / "agents" / aid / "sessions"
-        session_path = resolve_session_jsonl_path(sessions_dir, entry)
-        if not session_path:
-            return []
-
-        subtasks: List[Dict[str, Any]] = []
-        seen_tasks = set()
-
-        with open(session_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    envelope, msg = parse_session_jsonl_line(line)
-                    if not envelope or envelope.get('type') != 'message' or not msg:
-                        continue
-                    if msg.get('role') != 'assistant':
-                        continue
-                    content = msg.get('content', [])
-                    for c in content:
-                        if not isinstance(c, dict) or c.get('type') != 'toolCall':
-                            continue
-                        name = c.get('name', '')
-                        if name not in ('subagent', 'delegate', 'spawn'):
-                            continue
-                        args = c.get('arguments', {})
-                        if isinstance(args, str):
-                            try:
-                                args = json.loads(args)
-                            except json.JSONDecodeError:
-                                continue
-                        task_desc = args.get('task') or args.get('prompt') or args.get('instruction', '')
-                        sub_agent_id = args.get('agentId') or args.get('agent') or args.get('agent_id', '')
-                        if task_desc and task_desc not in seen_tasks:
-                            seen_tasks.add(task_desc)
-                            subtasks.append({
-                                'task': task_desc[:200] if len(task_desc) > 200 else task_desc,
-                                'agentId': sub_agent_id,
-                                'status': 'unknown'
-                            })
-                except (KeyError, TypeError):
-                    continue
-
-        return subtasks[:5]  # 最多返回 5 个子任务
+        return [dict(t) for t in digest.subtasks]
     except Exception as e:
         record_error("io-error", str(e), "api:subagents:extract_subtasks", exc=e)
         return []
 
 
+def _frozen_run_output(child_session_key: str) -> Optional[str]:
+    """已完成 run 的 Agent 输出（非空结果缓存并落盘，空结果稍后重试）"""
+    return get_run_session_cache().frozen_extra(
+        child_session_key, 'output', lambda: get_agent_output_for_run(child_session_key)
+    )
+
+
+def _frozen_run_files(child_session_key: str) -> List[str]:
+    """已完成 run 生成的文件列表（非空结果缓存并落盘，空结果稍后重试）"""
+    return get_run_session_cache().frozen_extra(
+        child_session_key, 'generatedFiles', lambda: get_agent_files_for_run(child_session_key)
+    )
+
+
 def _run_to_task(run: Dict[str, Any]) -> Dict[str, Any]:
     """将 run 转为任务展示格式"""
     agent_id = parse_agent_id(run.get('childSessionKey', ''))
@@ -457,165 +586,84 @@ def _run_to_task(run: Dict[str, Any]) -> Dict[str, Any]:
     # 从 session 提取子任务（嵌套 subagent 调用）
     child_key = run.get('childSessionKey', '')
     if child_key:
-        subtasks = _extract_subtasks_from_session(child_key)
+        subtasks = _extract_subtasks_from_session(child_key, finished=bool(run.get('endedAt')))
         if subtasks:
             result['subtasks'] = subtasks
-    # 任务成功时，从 session 提取 Agent 输出和生成的文件
+    # 任务成功时，从 session 提取 Agent 输出和生成的文件（已结束 run 只提取一次）
     if status == 'completed' and child_key:
-        output = get_agent_output_for_run(child_key)
+        output = _frozen_run_output(child_key)
         if output:
             result['output'] = output
-        files = get_agent_files_for_run(child_key)
+        files = _frozen_run_files(child_key)
         if files:
             result['generatedFiles'] = files
     return result
 
 
 @router.get("/tasks")
-async def get_tasks():
-    """获取任务列表 - 合并 runs.json 与持久化历史，确保已完成任务不丢失"""
+async def get_tasks(
+    agent: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = MAX_MERGED_TASKS,
+):
+    """
+    获取任务列表 - 合并 runs.json 与持久化历史，确保已完成任务不丢失
+
+    支持按 agent / status / startTime 时间范围（ms）过滤，游标分页（nextCursor）；
+    历史部分的过滤与游标下推到任务历史索引。
+    """
+    before = decode_page_cursor(cursor)
+    limit = clamp_limit(limit, MAX_MERGED_TASKS, MAX_PAGE_LIMIT)
     try:
         all_runs = load_subagent_runs()
         all_runs.sort(key=lambda x: x.get('startedAt', 0), reverse=True)
 
-        tasks = merge_with_history(all_runs, _run_to_task)
+        tasks = merge_with_history(
+            all_runs, _run_to_task,
+            agent_id=agent, status=status, since=since, until=until, before=before, limit=limit + 1,
+        )
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(list(task_sort_key(tasks[-1])))
         # 对历史任务补充缺失字段
         for t in tasks:
             if t.get('status') == 'completed' and t.get('childSessionKey'):
                 if not t.get('output'):
-                    output = get_agent_output_for_run(t['childSessionKey'])
+                    output = _frozen_run_output(t['childSessionKey'])
                     if output:
                         t['output'] = output
                 if not t.get('generatedFiles'):
-                    files = get_agent_files_for_run(t['childSessionKey'])
+                    files = _frozen_run_files(t['childSessionKey'])
                     if files:
                         t['generatedFiles'] = files
             if not t.get('agentWorkspace') and t.get('agentId'):
                 t['agentWorkspace'] = _get_agent_workspace(t['agentId'])
-        return {'tasks': tasks}
+        return {'tasks': tasks, 'nextCursor': next_cursor}
     except Exception as e:
         record_error("unknown", str(e), "api:subagents:get_tasks", exc=e)
-        return {'tasks': []}
+        return {'tasks': [], 'nextCursor': None}
 
 
-def _extract_timeline_from_session(child_session_key: str) -> List[Dict[str, Any]]:
+def _extract_timeline_from_session(child_session_key: str, finished: bool = False) -> List[Dict[str, Any]]:
     """
-    从 session 文件中提取任务执行时间线。
+    从 session 文件中提取任务执行时间线（经 run 级缓存）。
 
     Args:
         child_session_key: 格式 agent:<agentId>:subagent:<uuid>
+        finished: run 已结束时结果冻结，之后不再读取 session 文件
 
     Returns:
         时间线事件列表，每个包含: {time, type, description}
     """
-    if not child_session_key or ':' not in child_session_key:
-        return []
-    parts = child_session_key.split(':')
-    if len(parts) < 2 or parts[0] != 'agent':
-        return []
-    agent_id = parts[1]
-
     try:
-        from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
-        openclaw_path = get_openclaw_root()
-        aid = normalize_openclaw_agent_id(agent_id)
-        sessions_index = openclaw_path / "agents" / aid / "sessions" / "sessions.json"
-        if not sessions_index.exists():
+        digest = _get_run_digest(child_session_key, finished)
+        if digest is None:
             return []
-
-        index_data = _load_sessions_index_file(sessions_index)
-        if not index_data:
-            return []
-        index_map = normalize_sessions_index(index_data)
-        entry = index_map.get(child_session_key)
-        if not entry:
-            return []
-        sessions_dir = openclaw_path / "agents" / aid / "sessions"
-        session_path = resolve_session_jsonl_path(sessions_dir, entry)
-        if not session_path:
-            return []
-
-        timeline: List[Dict[str, Any]] = []
-        event_count = 0
-        max_events = 50  # 限制最大事件数
-
-        with open(session_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if event_count >= max_events:
-                    break
-                try:
-                    envelope, msg = parse_session_jsonl_line(line)
-                    if not envelope or envelope.get('type') != 'message' or not msg:
-                        continue
-                    ts = envelope.get('timestamp')
-                    if isinstance(ts, str):
-                        try:
-                            from datetime import datetime as _dt
-                            if 'T' in ts:
-                                dt = _dt.fromisoformat(ts.replace('Z', '+00:00'))
-                                ts = int(dt.timestamp() * 1000)
-                            else:
-                                ts = int(ts)
-                        except (ValueError, TypeError):
-                            ts = 0
-                    elif isinstance(ts, (int, float)):
-                        ts = int(ts)
-                    else:
-                        ts = 0
-
-                    role = msg.get('role', '')
-                    content = msg.get('content', [])
-
-                    if role == 'user':
-                        for c in content:
-                            if isinstance(c, dict) and c.get('type') == 'text':
-                                text = c.get('text', '')[:100]
-                                timeline.append({
-                                    'time': ts,
-                                    'type': 'start',
-                                    'description': f'收到任务: {text}...' if len(c.get('text', '')) > 100 else f'收到任务: {text}'
-                                })
-                                event_count += 1
-                                break
-
-                    elif role == 'assistant':
-                        for c in content:
-                            if not isinstance(c, dict):
-                                continue
-                            if c.get('type') == 'toolCall':
-                                tool_name = c.get('name', 'unknown')
-                                args = c.get('arguments', {})
-                                if isinstance(args, str):
-                                    try:
-                                        args = json.loads(args)
-                                    except json.JSONDecodeError:
-                                        args = {}
-
-                                desc = _describe_tool_call(tool_name, args)
-                                timeline.append({
-                                    'time': ts,
-                                    'type': 'tool',
-                                    'tool': tool_name,
-                                    'description': desc
-                                })
-                                event_count += 1
-
-                            elif c.get('type') == 'text':
-                                text = c.get('text', '')
-                                if text.strip() and len(text) > 50:
-                                    keywords = ['完成', '成功', 'finished', 'done', 'result', '总结']
-                                    if any(kw in text.lower() for kw in keywords):
-                                        timeline.append({
-                                            'time': ts,
-                                            'type': 'response',
-                                            'description': f'输出结果 ({len(text)} 字符)'
-                                        })
-                                        event_count += 1
-
-                except (KeyError, TypeError, ValueError):
-                    continue
-
-        return timeline
+        return [dict(e) for e in digest.timeline]
     except Exception as e:
         record_error("io-error", str(e), "api:subagents:extract_timeline", exc=e)
         return []
@@ -682,13 +730,9 @@ async def get_task_timeline(run_id: str):
                 break
 
         if not target_run:
-            # 尝试从历史记录查找
-            from data.task_history import load_task_history
-            history = load_task_history()
-            for record in history:
-                if record.get('id') == run_id:
-                    target_run = record
-                    break
+            # 尝试从历史记录查找（按 runId 索引）
+            from data.task_history import get_history_task
+            target_run = get_history_task(run_id)
 
         if not target_run:
             return {'timeline': [], 'error': 'Task not found'}
@@ -697,12 +741,12 @@ async def get_task_timeline(run_id: str):
         if not child_key:
             return {'timeline': [], 'error': 'No session key'}
 
-        timeline = _extract_timeline_from_session(child_key)
-
-        # 添加任务开始和结束事件
         # 兼容两种字段名：startedAt (runs.json) 和 startTime (task_history)
         started_at = target_run.get('startedAt') or target_run.get('startTime')
         ended_at = target_run.get('endedAt') or target_run.get('endTime')
+        timeline = _extract_timeline_from_session(child_key, finished=bool(ended_at))
+
+        # 添加任务开始和结束事件
         outcome = target_run.get('outcome')
 
         if started_at:
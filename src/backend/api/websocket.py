@@ -3,7 +3,7 @@ WebSocket 路由
 支持增量状态推送，优化实时性能
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Set, List, Dict, Any
+from typing import Any, Dict, Iterable, List, Optional, Set
 import json
 import asyncio
 import sys
@@ -85,49 +85,60 @@ async def websocket_endpoint(websocket: WebSocket):
         _cancel_broadcast_task()
 
 
-async def send_initial_state(websocket: WebSocket):
-    """发送初始状态（含 collaboration，避免前端协作流程空白）"""
-    try:
+async def _build_section(name: str) -> Any:
+    """计算 full_state 的单个分区"""
+    if name == 'agents':
         from .agents import get_agents as get_agents_list
-        from .subagents import get_subagents, get_tasks
-        from .api_status import get_api_status_list
         from status.status_calculator import format_last_active
 
         agents = await get_agents_list()
-        subagents = await get_subagents()
-        api_status = await get_api_status_list()
-
         for agent in agents:
             if agent.get("lastActiveAt"):
                 agent["lastActiveFormatted"] = format_last_active(agent["lastActiveAt"])
+        return agents
+    if name == 'subagents':
+        from .subagents import get_subagents
+        return (await get_subagents())['subagents']
+    if name == 'apiStatus':
+        from .errors import get_api_status
+        return get_api_status()
+    if name == 'collaboration':
+        from .collaboration import _build_collaboration_dynamic  # 只推送动态数据
+        collab, _ = _build_collaboration_dynamic()
+        return collab.model_dump() if hasattr(collab, "model_dump") else collab
+    if name == 'tasks':
+        from .subagents import get_tasks
+        tasks_result = await get_tasks()
+        return tasks_result.get("tasks", []) if isinstance(tasks_result, dict) else []
+    if name == 'performance':
+        from .performance import get_real_stats
+        return await get_real_stats()
+    raise ValueError(name)
 
-        data = {
-            'agents': agents,
-            'subagents': subagents,
-            'apiStatus': api_status,
-        }
-        # collaboration/tasks/performance 单独获取，失败不影响主数据
-        try:
-            from .collaboration import get_collaboration
-            collab = await get_collaboration()
-            data['collaboration'] = collab.model_dump() if hasattr(collab, "model_dump") else collab
-        except Exception as e:
-            record_error("unknown", str(e), "websocket:initial_collaboration", exc=e)
-        try:
-            tasks_result = await get_tasks()
-            data['tasks'] = tasks_result.get("tasks", []) if isinstance(tasks_result, dict) else []
-        except Exception as e:
-            record_error("unknown", str(e), "websocket:initial_tasks", exc=e)
+
+async def _build_sections(names: Iterable[str], scope: str) -> Dict[str, Any]:
+    """按分区计算，单个分区失败不影响其他分区"""
+    data: Dict[str, Any] = {}
+    for name in names:
         try:
-            from .performance import get_real_stats
-            data['performance'] = await get_real_stats()
+            data[name] = await _build_section(name)
         except Exception as e:
-            record_error("unknown", str(e), "websocket:initial_performance", exc=e)
+            record_error("unknown", str(e), f"websocket:{scope}_{name}", exc=e)
+    return data
+
+
+async def send_initial_state(websocket: WebSocket):
+    """发送初始状态（含 collaboration，避免前端协作流程空白）"""
+    from watchers.dependency_map import ALL_SECTIONS
+
+    try:
+        data = await _build_sections([n for n in ALL_SECTIONS if n != 'collaboration'], 'initial')
         try:
-            from .workflow import list_workflows
-            data['workflows'] = await list_workflows()
+            from .collaboration import _build_collaboration_flow
+            collab, _ = _build_collaboration_flow()
+            data['collaboration'] = collab.model_dump() if hasattr(collab, "model_dump") else collab
         except Exception as e:
-            record_error("unknown", str(e), "websocket:initial_workflows", exc=e)
+            record_error("unknown", str(e), "websocket:initial_collaboration", exc=e)
 
         await websocket.send_json({'type': 'full_state', 'data': data})
     except Exception as e:
@@ -205,54 +216,40 @@ async def broadcast_message(message: dict):
 
 
 async def broadcast_full_state():
-    """文件变更时广播完整状态（使用动态接口优化）
-    
-    优化点：
-    1. 使用 get_collaboration_dynamic() 代替 get_collaboration()
-    2. 只推送动态数据，减少数据量
-    """
-    if not active_connections:
-        return
-    try:
-        from .agents import get_agents as get_agents_list
-        from .subagents import get_subagents
-        from .api_status import get_api_status_list
-        from .collaboration import get_collaboration_dynamic  # 使用动态接口
-        from .performance import get_real_stats
-        from .workflow import list_workflows
+    """文件变更来源未知时广播完整状态（collaboration 只含动态数据）"""
+    await broadcast_sections()
 
-        agents = await get_agents_list()
-        subagents = await get_subagents()
-        api_status = await get_api_status_list()
-        collaboration_dynamic = await get_collaboration_dynamic()  # 动态数据
-        performance = await get_real_stats()
-        workflows = await list_workflows()
 
-        # tasks 来自 subagents 的 get_tasks
-        from .subagents import get_tasks
-        tasks_result = await get_tasks()
-        tasks = tasks_result.get("tasks", []) if isinstance(tasks_result, dict) else []
+async def broadcast_sections(
+    sections: Optional[Iterable[str]] = None,
+    agent_ids: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    只重算并推送受影响的分区（见 watchers.dependency_map）
 
-        # 格式化 agents 的 lastActiveFormatted
-        from status.status_calculator import format_last_active
-        for agent in agents:
-            if agent.get("lastActiveAt"):
-                agent["lastActiveFormatted"] = format_last_active(agent["lastActiveAt"])
+    Args:
+        sections: 要推送的 full_state 分区；None 为全部
+        agent_ids: 非空时 agents 分区只重算这些 Agent，变化的以 state_update 增量推送
+    """
+    if not active_connections:
+        return
+    from watchers.dependency_map import ALL_SECTIONS
 
-        await broadcast_message({
-            "type": "full_state",
-            "data": {
-                "agents": agents,
-                "subagents": subagents,
-                "apiStatus": api_status,
-                "collaboration": collaboration_dynamic.model_dump() if hasattr(collaboration_dynamic, "model_dump") else collaboration_dynamic,
-                "tasks": tasks,
-                "performance": performance,
-                "workflows": workflows,
-            },
-        })
+    names = list(ALL_SECTIONS) if sections is None else [n for n in ALL_SECTIONS if n in set(sections)]
+    try:
+        if agent_ids is not None and 'agents' in names:
+            names.remove('agents')
+            from status.status_calculator import get_changed_agents
+            changed = await get_changed_agents(agent_ids)
+            if changed:
+                await broadcast_state_update(changed)
+        if not names:
+            return
+        data = await _build_sections(names, 'broadcast')
+        if data:
+            await broadcast_message({"type": "full_state", "data": data})
     except Exception as e:
-        record_error("unknown", str(e), "websocket:broadcast_full_state", exc=e)
+        record_error("unknown", str(e), "websocket:broadcast_sections", exc=e)
 
 
 async def broadcast_state_update(changed_agents: List[Dict[str, Any]]) -> None:
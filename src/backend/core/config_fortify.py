@@ -77,6 +77,13 @@ class FortifyConfig:
     watcher_max_retries: int
     watcher_poll_interval_sec: float
     watcher_failure_window_sec: float
+    # 轮询模式自适应间隔：有变更回到下限，空闲逐次加倍至上限
+    watcher_poll_min_interval_sec: float
+    watcher_poll_max_interval_sec: float
+    # 一个防抖窗口内最多累积的不同路径数，超出时合并为一次全量同步
+    watcher_batch_max_paths: int
+    # 动态登记的 Agent / sessions 目录 watch 上限，超出按最久无事件摘除
+    watcher_max_watch_dirs: int
 
     # NFR-S-003: Logging storage security
     log_retention_days: int
@@ -85,6 +92,30 @@ class FortifyConfig:
     log_file_path: str | None
     log_compression: bool
 
+    # Session 冷扫描：进程池并行
+    scan_workers: int
+    manifest_rescan_sec: float
+    parent_map_horizon: int
+    trigger_snippet_chars: int
+    # usage 表保留天数，0 不剔除
+    usage_retention_days: int
+
+    # 条件请求（ETag / If-None-Match）
+    conditional_get: bool
+    conditional_tick_sec: float
+
+    # model-failures.log 增量解析：内存中保留的最近条目数
+    failure_log_max_entries: int
+
+    # 框架错误事件环形缓冲条数（/api/errors/reliability 查询）
+    error_ring_size: int
+    # 相同指纹错误的合并窗口（秒），0 关闭
+    error_storm_window_sec: float
+
+    # 启动快照：关闭时写入、启动时恢复；周期写入间隔（秒），0 只在关闭时写入
+    warm_snapshot: bool
+    warm_snapshot_interval_sec: float
+
 
 @lru_cache(maxsize=1)
 def get_fortify_config() -> FortifyConfig:
@@ -111,12 +142,32 @@ def get_fortify_config() -> FortifyConfig:
         watcher_max_retries=_env_int("OPENCLAW_WATCHER_MAX_RETRIES", 3, min_v=1, max_v=10),
         watcher_poll_interval_sec=_env_float("OPENCLAW_WATCHER_POLL_INTERVAL", 5.0),
         watcher_failure_window_sec=_env_float("OPENCLAW_WATCHER_FAILURE_WINDOW", 30.0),
+        watcher_poll_min_interval_sec=max(0.1, _env_float("OPENCLAW_WATCHER_POLL_MIN_INTERVAL", 1.0)),
+        watcher_poll_max_interval_sec=_env_float("OPENCLAW_WATCHER_POLL_MAX_INTERVAL", 30.0),
+        watcher_batch_max_paths=_env_int("OPENCLAW_WATCHER_BATCH_MAX_PATHS", 512, min_v=1, max_v=100_000),
+        watcher_max_watch_dirs=_env_int("OPENCLAW_WATCHER_MAX_WATCH_DIRS", 512, min_v=1, max_v=100_000),
         # NFR-S-003: Logging storage security
         log_retention_days=_env_int("OPENCLAW_LOG_RETENTION_DAYS", 30, min_v=1, max_v=365),
         log_max_size_mb=_env_int("OPENCLAW_LOG_MAX_SIZE_MB", 100, min_v=1, max_v=1024),
         log_backup_count=_env_int("OPENCLAW_LOG_BACKUP_COUNT", 5, min_v=1, max_v=50),
         log_file_path=os.environ.get("OPENCLAW_LOG_FILE_PATH") or None,
         log_compression=_env_bool("OPENCLAW_LOG_COMPRESSION", True),
+        # 0 = 按 CPU 核数自动；1 = 关闭进程池，串行扫描
+        scan_workers=_env_int("OPENCLAW_SCAN_WORKERS", 0, min_v=0, max_v=64),
+        # watchdog 模式下 sessions 目录清单的兜底重扫间隔（秒）
+        manifest_rescan_sec=_env_float("OPENCLAW_MANIFEST_RESCAN_SEC", 30.0),
+        # trigger 溯源：每个 session 文件保留的最近消息数、trigger 文本片段长度
+        parent_map_horizon=_env_int("OPENCLAW_PARENT_MAP_HORIZON", 2000, min_v=16, max_v=1_000_000),
+        trigger_snippet_chars=_env_int("OPENCLAW_TRIGGER_SNIPPET_CHARS", 1000, min_v=50, max_v=100_000),
+        usage_retention_days=_env_int("OPENCLAW_USAGE_RETENTION_DAYS", 7, min_v=0, max_v=3650),
+        # 依赖当前时间的接口（状态、运行时长）validator 的时间粒度（秒）
+        conditional_get=_env_bool("OPENCLAW_CONDITIONAL_GET", True),
+        conditional_tick_sec=_env_float("OPENCLAW_CONDITIONAL_TICK_SEC", 5.0),
+        failure_log_max_entries=_env_int("OPENCLAW_FAILURE_LOG_MAX_ENTRIES", 5000, min_v=100, max_v=1_000_000),
+        error_ring_size=_env_int("OPENCLAW_ERROR_RING_SIZE", 1000, min_v=16, max_v=100_000),
+        error_storm_window_sec=max(0.0, _env_float("OPENCLAW_ERROR_STORM_WINDOW_SEC", 60.0)),
+        warm_snapshot=_env_bool("OPENCLAW_WARM_SNAPSHOT", True),
+        warm_snapshot_interval_sec=max(0.0, _env_float("OPENCLAW_WARM_SNAPSHOT_SEC", 300.0)),
     )
 
 
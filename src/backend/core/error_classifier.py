@@ -0,0 +1,177 @@
+"""
+错误消息分类引擎 - 规则预编译一次，结果按消息摘要做 LRU 缓存
+
+规则语义与逐条 re.search(pattern, msg.lower(), re.IGNORECASE) 一致：命中的规则中取排在最前的一条。
+形如 a.*b.*c 的模式（各段为普通文字）编译为同一行内的有序子串查找，不经过正则引擎；
+其余模式按规则合并为一个正则。
+
+error_signature 把错误文案归一为签名（去掉数字、UUID、路径、时间戳等易变部分），用于聚合同类错误。
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Generic, List, Optional, Pattern, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 分类结果缓存条数（每个分类器）
+DEFAULT_CACHE_SIZE = 4096
+
+_REGEX_META = set("\\^$.|?*+()[]{}")
+
+
+def _literal_chain(pattern: str) -> Optional[Tuple[str, ...]]:
+    """a.*b 形式的模式拆成 ('a', 'b')；含其他正则语法时为 None"""
+    pieces = pattern.split(".*")
+    if any(not p or _REGEX_META.intersection(p) for p in pieces):
+        return None
+    return tuple(p.lower() for p in pieces)
+
+
+def _chain_in(text: str, chain: Tuple[str, ...]) -> bool:
+    pos = 0
+    for piece in chain:
+        pos = text.find(piece, pos)
+        if pos < 0:
+            return False
+        pos += len(piece)
+    return True
+
+
+class _CompiledRule:
+    __slots__ = ("chains", "regex")
+
+    def __init__(self, patterns: Sequence[str], literal: bool) -> None:
+        self.chains: List[Tuple[str, ...]] = []
+        rest: List[str] = []
+        for p in patterns:
+            chain = (p.lower(),) if literal else _literal_chain(p)
+            if chain is None:
+                rest.append(p)
+            else:
+                self.chains.append(chain)
+        self.regex: Optional[Pattern[str]] = (
+            re.compile("|".join(f"(?:{p})" for p in rest), re.IGNORECASE) if rest else None
+        )
+
+    def matches(self, lowered: str, lines: Sequence[str]) -> bool:
+        for chain in self.chains:
+            # . 不匹配换行：多段模式须在同一行内命中
+            if len(chain) == 1 or len(lines) == 1:
+                if _chain_in(lowered, chain):
+                    return True
+            elif any(_chain_in(line, chain) for line in lines):
+                return True
+        return self.regex is not None and self.regex.search(lowered) is not None
+
+
+class RuleClassifier(Generic[T]):
+    """有序规则分类器（线程安全）"""
+
+    def __init__(
+        self,
+        rules: Sequence[Tuple[T, Sequence[str]]],
+        default: T,
+        *,
+        literal: bool = False,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        """
+        Args:
+            rules: [(结果, [模式...])]，越靠前优先级越高
+            literal: 模式为普通关键字（不是正则）
+        """
+        self._rules = [(label, _CompiledRule(patterns, literal)) for label, patterns in rules]
+        self._default = default
+        self._cache: "OrderedDict[bytes, T]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _match(self, text: str) -> T:
+        lowered = text.lower()
+        lines = lowered.split("\n") if "\n" in lowered else (lowered,)
+        for label, rule in self._rules:
+            if rule.matches(lowered, lines):
+                return label
+        return self._default
+
+    def classify(self, text: Optional[str]) -> T:
+        if not text:
+            return self._default
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        result = self._match(text)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+# Session / 时间线中 stopReason=error 的简要分类
+SESSION_ERROR_RULES = [
+    ("rate-limit", ["429", "rate limit"]),
+    ("token-limit", ["token", "context"]),
+    ("timeout", ["timeout", "超时"]),
+    ("quota", ["余额不足"]),
+]
+
+_session_classifier: RuleClassifier[str] = RuleClassifier(SESSION_ERROR_RULES, "unknown", literal=True)
+
+
+def classify_session_error(error_msg: Optional[str]) -> str:
+    """Session / 时间线错误类型：rate-limit / token-limit / timeout / quota / unknown"""
+    return _session_classifier.classify(error_msg)
+
+
+# 错误中心（/api/errors）分类规则
+ERROR_CENTER_RULES = [
+    ("rate-limit", ["429", "rate limit", "too many requests"]),
+    ("token-limit", ["token", "context", "length"]),
+    ("timeout", ["timeout", "超时", "timed out"]),
+    ("auth", ["401", "403", "auth", "unauthorized"]),
+]
+
+_center_classifier: RuleClassifier[str] = RuleClassifier(ERROR_CENTER_RULES, "unknown", literal=True)
+
+
+def classify_center_error(error_msg: Optional[str]) -> str:
+    """错误中心类型：rate-limit / token-limit / timeout / auth / unknown"""
+    return _center_classifier.classify(error_msg)
+
+
+# 签名中替换的易变片段，按顺序匹配
+_VOLATILE_RE = re.compile(
+    r"(?P<uuid>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"|(?P<ts>\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)"
+    r"|(?P<url>https?://\S+)"
+    r"|(?P<path>(?:[a-z]:)?[\\/](?:[\w.~-]+[\\/])+[\w.~-]*)"
+    r"|(?P<hex>0x[0-9a-f]+|\b[0-9a-f]{16,}\b)"
+    r"|(?P<n>\d+(?:\.\d+)?)"
+)
+_SPACE_RE = re.compile(r"\s+")
+
+# 参与签名的文案长度上限
+SIGNATURE_MAX_CHARS = 500
+
+
+def error_signature(message: Optional[str]) -> str:
+    """错误文案签名：小写，易变片段替换为 <uuid> / <ts> / <url> / <path> / <hex> / <n>"""
+    if not message:
+        return ""
+    text = _VOLATILE_RE.sub(lambda m: f"<{m.lastgroup}>", message[:SIGNATURE_MAX_CHARS].lower())
+    return _SPACE_RE.sub(" ", text).strip()
@@ -5,16 +5,20 @@ Unified error handling: classification, exponential backoff retry, in-process st
 """
 from __future__ import annotations
 
+import atexit
 import logging
+import queue
 import threading
 import time
 import functools
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
 from core.config_fortify import get_fortify_config
+from core.error_classifier import error_signature
+from core.error_rollups import get_error_rollups
 
 _LOG = logging.getLogger("openclaw.fortify")
 
@@ -49,20 +53,43 @@ def _ensure_fortify_logging() -> None:
     _ensure_fortify_logging._done = True  # type: ignore[attr-defined]
 
 
+# hourly_trend 保留的小时桶数
+HOURLY_TREND_HOURS = 24
+
+
 @dataclass
 class ErrorHandlerStats:
     total_count: int = 0
     by_type: Dict[str, int] = field(default_factory=dict)
     by_scope: Dict[str, int] = field(default_factory=dict)
-    hourly_trend: List[Dict[str, Any]] = field(default_factory=list)
+    # 小时序号 (epoch 秒 // 3600) -> {"hour", "count"}，按插入顺序即时间顺序
+    hourly_trend: "OrderedDict[int, Dict[str, Any]]" = field(default_factory=OrderedDict)
     last_error: Optional[Dict[str, Any]] = None
     last_update_iso: Optional[str] = None
+    # 最近的结构化错误事件（定长环形缓冲）
+    events: deque = field(default_factory=deque)
+    seq: int = 0
+    # 错误风暴聚合：指纹 -> (窗口结束时刻, 事件)，按窗口开始顺序
+    storms: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict[str, Any]]]" = field(
+        default_factory=OrderedDict
+    )
+    suppressed_total: int = 0
 
 
 _stats_lock = threading.Lock()
 _stats = ErrorHandlerStats()
 _retry_totals = defaultdict(int)
 
+# record_error 的日志写入交给后台线程，调用方不做格式化 / traceback / IO
+_log_queue: "queue.SimpleQueue[Optional[Tuple[Any, ...]]]" = queue.SimpleQueue()
+_log_thread: Optional[threading.Thread] = None
+_log_thread_lock = threading.Lock()
+_log_pending = 0
+_log_idle = threading.Condition(threading.Lock())
+
+# 同时跟踪的错误指纹上限，超出时提前结束最旧的聚合窗口
+MAX_ACTIVE_STORMS = 4096
+
 _retry_budget_lock = threading.Lock()
 _retry_budget_deques: Dict[str, deque] = {}
 _retry_budget_blocks = 0
@@ -337,12 +364,123 @@ class ErrorHandler:
         raise RuntimeError(operation)
 
 
+def _log_worker() -> None:
+    global _log_pending
+    last_storm_flush = time.monotonic()
+    while True:
+        try:
+            item = _log_queue.get(timeout=1.0)
+        except queue.Empty:
+            item = ()
+        if item is None:
+            return
+        if time.monotonic() - last_storm_flush >= 1.0:
+            last_storm_flush = time.monotonic()
+            flush_error_storms()
+        if not item:
+            continue
+        kind, args, exc = item
+        try:
+            if kind == "summary":
+                _LOG.error(
+                    "fortify_event_summary error_type=%s scope=%s count=%s suppressed=%s"
+                    " first_seen=%s last_seen=%s detail=%s",
+                    *args,
+                )
+            else:
+                _LOG.error(
+                    "fortify_event error_type=%s scope=%s exc_type=%s exc_module=%s detail=%s",
+                    *args,
+                    exc_info=(type(exc), exc, exc.__traceback__) if exc is not None else None,
+                )
+        except Exception:
+            pass
+        with _log_idle:
+            _log_pending -= 1
+            if _log_pending == 0:
+                _log_idle.notify_all()
+
+
+def _enqueue_log(kind: str, args: Tuple[Any, ...], exc: Optional[BaseException] = None) -> None:
+    global _log_thread, _log_pending
+    if not _LOG.isEnabledFor(logging.ERROR):
+        return
+    if _log_thread is None or not _log_thread.is_alive():
+        with _log_thread_lock:
+            if _log_thread is None or not _log_thread.is_alive():
+                _log_thread = threading.Thread(target=_log_worker, name="fortify-error-log", daemon=True)
+                _log_thread.start()
+    with _log_idle:
+        _log_pending += 1
+    _log_queue.put((kind, args, exc))
+
+
+def flush_error_log(timeout: float = 5.0) -> bool:
+    """等待已入队的错误日志写完；超时返回 False"""
+    with _log_idle:
+        return _log_idle.wait_for(lambda: _log_pending == 0, timeout=timeout)
+
+
+def _storm_summary(event: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        event["type"], event["scope"], event["count"], event["count"] - 1,
+        event["first_seen"], event["last_seen"], event["detail"],
+    )
+
+
+def flush_error_storms(now: Optional[float] = None) -> int:
+    """
+    结束已过窗口的错误聚合；被合并过的指纹各写一条汇总日志。
+    由日志线程每秒调用，返回写出的汇总条数。
+    """
+    now = time.time() if now is None else now
+    summaries: List[Tuple[Any, ...]] = []
+    with _stats_lock:
+        storms = _stats.storms
+        while storms:
+            fp, (window_end, event) = next(iter(storms.items()))
+            if window_end > now:
+                break
+            del storms[fp]
+            if event["count"] > 1:
+                summaries.append(_storm_summary(event))
+    for args in summaries:
+        _enqueue_log("summary", args)
+    return len(summaries)
+
+
+def _flush_at_exit() -> None:
+    flush_error_storms(float("inf"))
+    flush_error_log(2.0)
+
+
+atexit.register(_flush_at_exit)
+
+
+def _ring_size() -> int:
+    return get_fortify_config().error_ring_size
+
+
+def _rollup_framework_error(ts_ms: int, scope: str, error_type: str) -> None:
+    agent = scope.split(":", 1)[1] if scope.startswith("agent_id:") else ""
+    get_error_rollups().add("framework", ts_ms, agent=agent, error_type=error_type)
+
+
+def error_fingerprint(error_type: str, scope: str, detail: str) -> Tuple[str, str, str]:
+    """类型 + 作用域 + 文案签名（数字、UUID、路径、时间戳等视为同一形态）"""
+    return (error_type, scope, error_signature(detail))
+
+
 def record_error(
     error_type: str,
     error_detail: str,
     affected_scope: str = "",
     exc: Optional[BaseException] = None,
 ) -> None:
+    """
+    记录框架错误。相同指纹在 OPENCLAW_ERROR_STORM_WINDOW_SEC 窗口内合并为一个事件（count / first_seen /
+    last_seen），只有窗口内第一次写日志，其余在窗口结束时汇总为一条 fortify_event_summary。
+    """
     _ensure_fortify_logging()
     if exc is not None:
         error_type = classify_exception(exc) if error_type in ("", "unknown") else error_type
@@ -350,42 +488,122 @@ def record_error(
     scope = affected_scope or ""
     exc_type_name = type(exc).__name__ if exc is not None else ""
     exc_module = type(exc).__module__ if exc is not None else ""
-    _LOG.error(
-        "fortify_event error_type=%s scope=%s exc_type=%s exc_module=%s detail=%s",
-        error_type,
-        scope,
-        exc_type_name,
-        exc_module,
-        detail,
-        exc_info=exc is not None,
-    )
-    now = datetime.now(timezone.utc)
-    hour_key = now.strftime("%Y-%m-%d %H:00")
+    cfg = get_fortify_config()
+    window = cfg.error_storm_window_sec
+    fp = error_fingerprint(error_type, scope, detail) if window > 0 else None
+    ts = time.time()
+    ts_ms = int(ts * 1000)
+    now = datetime.fromtimestamp(ts, timezone.utc)
+    now_iso = now.isoformat()
+    hour = int(ts // 3600)
+    summaries: List[Tuple[Any, ...]] = []
     with _stats_lock:
         _stats.total_count += 1
         _stats.by_type[error_type] = _stats.by_type.get(error_type, 0) + 1
         if scope:
             _stats.by_scope[scope] = _stats.by_scope.get(scope, 0) + 1
-        _stats.last_error = {
+        _stats.last_update_iso = now_iso
+        # 小时桶：按小时序号直接定位，超出 24 个时淘汰最旧
+        row = _stats.hourly_trend.get(hour)
+        if row is None:
+            _stats.hourly_trend[hour] = {"hour": now.strftime("%Y-%m-%d %H:00"), "count": 1}
+            while len(_stats.hourly_trend) > HOURLY_TREND_HOURS:
+                _stats.hourly_trend.popitem(last=False)
+        else:
+            row["count"] += 1
+
+        storm = _stats.storms.get(fp) if fp is not None else None
+        if storm is not None:
+            window_end, event = storm
+            if ts < window_end:
+                event["count"] += 1
+                event["last_seen"] = now_iso
+                event["last_ts"] = ts_ms
+                _stats.suppressed_total += 1
+                _stats.last_error = event
+                _rollup_framework_error(ts_ms, scope, error_type)
+                return
+            del _stats.storms[fp]
+            if event["count"] > 1:
+                summaries.append(_storm_summary(event))
+
+        _stats.seq += 1
+        event = {
+            "seq": _stats.seq,
             "type": error_type,
             "detail": detail,
             "scope": scope,
-            "time": now.isoformat(),
+            "time": now_iso,
+            "ts": ts_ms,
             "exc_type": exc_type_name or None,
             "exc_module": exc_module or None,
+            "count": 1,
+            "first_seen": now_iso,
+            "last_seen": now_iso,
+            "last_ts": ts_ms,
         }
-        _stats.last_update_iso = now.isoformat()
-        # rolling hourly bucket (merge into hourly_trend max 24 entries)
-        found = False
-        for row in _stats.hourly_trend:
-            if row.get("hour") == hour_key:
-                row["count"] = row.get("count", 0) + 1
-                found = True
-                break
-        if not found:
-            _stats.hourly_trend.append({"hour": hour_key, "count": 1})
-            if len(_stats.hourly_trend) > 24:
-                _stats.hourly_trend = _stats.hourly_trend[-24:]
+        _stats.last_error = event
+        if _stats.events.maxlen != cfg.error_ring_size:
+            _stats.events = deque(_stats.events, maxlen=cfg.error_ring_size)
+        _stats.events.append(event)
+        if fp is not None:
+            _stats.storms[fp] = (ts + window, event)
+            while len(_stats.storms) > MAX_ACTIVE_STORMS:
+                _, (_, oldest) = _stats.storms.popitem(last=False)
+                if oldest["count"] > 1:
+                    summaries.append(_storm_summary(oldest))
+    _rollup_framework_error(ts_ms, scope, error_type)
+    for args in summaries:
+        _enqueue_log("summary", args)
+    _enqueue_log("event", (error_type, scope, exc_type_name, exc_module, detail), exc)
+
+
+def query_framework_errors(
+    scope: Optional[str] = None,
+    error_type: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    最近的框架错误事件，按首次出现倒序。
+
+    Args:
+        scope: 作用域前缀（如 "api:errors" 或完整 scope）
+        error_type: 错误类型
+        since / until: 毫秒时间戳；事件的 [首次, 最近] 出现时间与 [since, until) 相交即命中
+    """
+    with _stats_lock:
+        events = list(_stats.events)
+    out: List[Dict[str, Any]] = []
+    for ev in reversed(events):
+        if until is not None and ev["ts"] >= until:
+            continue
+        if since is not None and ev["last_ts"] < since:
+            continue
+        if error_type and ev["type"] != error_type:
+            continue
+        if scope and not ev["scope"].startswith(scope):
+            continue
+        out.append(dict(ev))
+        if len(out) >= limit:
+            break
+    return out
+
+
+def query_framework_errors_for_client(**filters: Any) -> List[Dict[str, Any]]:
+    """供 HTTP 返回：在开启脱敏时处理 detail。"""
+    from core.safe_api_error import redact_framework_events_for_client
+
+    return redact_framework_events_for_client(query_framework_errors(**filters))
+
+
+def reset_framework_error_stats_for_tests() -> None:
+    global _stats
+    flush_error_storms(float("inf"))
+    flush_error_log()
+    with _stats_lock:
+        _stats = ErrorHandlerStats()
 
 
 def record_retry(operation: str) -> None:
@@ -428,6 +646,10 @@ def get_framework_error_stats() -> Dict[str, Any]:
             {"scope": k, "count": v}
             for k, v in sorted(_stats.by_scope.items(), key=lambda kv: -kv[1])[:50]
         ]
+        hourly_trend = [dict(row) for row in _stats.hourly_trend.values()]
+        suppressed_total = _stats.suppressed_total
+        active_storms = sum(1 for _, ev in _stats.storms.values() if ev["count"] > 1)
+        last_error = dict(_stats.last_error) if _stats.last_error else None
 
     # NFR-R reliability metrics
     reliability = get_reliability_metrics()
@@ -439,9 +661,11 @@ def get_framework_error_stats() -> Dict[str, Any]:
         "by_scope_top": top_scopes,
         "sum_by_type": sum_by_type,
         "totals_consistent": sum_by_type == _stats.total_count,
-        "hourly_trend": list(_stats.hourly_trend),
+        "hourly_trend": hourly_trend,
         "last_update": _stats.last_update_iso,
-        "last_error": _stats.last_error,
+        "last_error": last_error,
+        "suppressed_count": suppressed_total,
+        "active_storms": active_storms,
         "retry_by_operation": dict(_retry_totals),
         "retry_budget_blocks": _retry_budget_blocks,
         # NFR-R Reliability
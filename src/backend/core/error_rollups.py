@@ -0,0 +1,260 @@
+"""
+错误时间序列 - 按分钟 / 小时累计的错误数，维度为 (来源, Agent, 类型, 模型)
+
+- 来源：session（stopReason=error）、model（model-failures.log）、framework（record_error）
+- 分钟桶保留 48 小时，小时桶保留 90 天；趋势与分布图直接按桶汇总，不再重扫原始数据
+- 来自文件的计数按 origin（文件路径）记账，文件截断或重写时整体撤回后重新计入；记账随小时桶一起按保留期清理
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MINUTE_MS = 60_000
+HOUR_MS = 3_600_000
+MINUTE_RETENTION = 48 * 60
+HOUR_RETENTION = 90 * 24
+
+SOURCES = ("session", "model", "framework")
+DIMENSIONS = ("source", "agent", "type", "model")
+
+# (来源, Agent, 类型, 模型)
+RollupKey = Tuple[str, str, str, str]
+Event = Tuple[int, RollupKey]
+
+
+def _bucket_index(ts_ms: int, step_ms: int) -> int:
+    return ts_ms // step_ms
+
+
+class ErrorRollups:
+    """错误计数的分钟 / 小时滚动汇总（线程安全）"""
+
+    def __init__(
+        self,
+        minute_retention: int = MINUTE_RETENTION,
+        hour_retention: int = HOUR_RETENTION,
+    ) -> None:
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self._minutes: Dict[int, Counter] = {}
+        self._hours: Dict[int, Counter] = {}
+        self._origins: Dict[str, List[Event]] = {}
+        self._ledger_cutoff = 0
+        self._lock = threading.Lock()
+        self.events_added = 0
+
+    # ---- 写入 ----
+
+    def _bump(self, buckets: Dict[int, Counter], index: int, key: RollupKey, delta: int) -> None:
+        c = buckets.get(index)
+        if c is None:
+            if delta <= 0:
+                return
+            c = buckets[index] = Counter()
+        c[key] += delta
+        if c[key] <= 0:
+            del c[key]
+            if not c:
+                del buckets[index]
+
+    def _apply(self, ts_ms: int, key: RollupKey, delta: int, now_ms: int) -> None:
+        minute = _bucket_index(ts_ms, MINUTE_MS)
+        if minute > _bucket_index(now_ms, MINUTE_MS) - self.minute_retention:
+            if delta > 0 and minute not in self._minutes:
+                self._prune(self._minutes, _bucket_index(now_ms, MINUTE_MS) - self.minute_retention)
+            self._bump(self._minutes, minute, key, delta)
+        hour = _bucket_index(ts_ms, HOUR_MS)
+        hour_cutoff = _bucket_index(now_ms, HOUR_MS) - self.hour_retention
+        if hour > hour_cutoff:
+            if delta > 0 and hour not in self._hours:
+                self._prune(self._hours, hour_cutoff)
+                self._prune_ledger(hour_cutoff)
+            self._bump(self._hours, hour, key, delta)
+
+    @staticmethod
+    def _prune(buckets: Dict[int, Counter], cutoff: int) -> None:
+        for index in [i for i in buckets if i <= cutoff]:
+            del buckets[index]
+
+    def _prune_ledger(self, hour_cutoff: int) -> None:
+        """丢弃已超出小时保留期的记账（撤回时本就不再计数），原地修改以免打断正在追加的列表"""
+        if hour_cutoff <= self._ledger_cutoff:
+            return
+        self._ledger_cutoff = hour_cutoff
+        for entries in self._origins.values():
+            kept = [e for e in entries if _bucket_index(e[0], HOUR_MS) > hour_cutoff]
+            if len(kept) != len(entries):
+                entries[:] = kept
+
+    def add(
+        self,
+        source: str,
+        ts_ms: int,
+        agent: str = "",
+        error_type: str = "unknown",
+        model: str = "",
+    ) -> None:
+        """计入一次错误（不记账，不可撤回）"""
+        if not ts_ms:
+            return
+        key = (source, agent or "", error_type or "unknown", model or "")
+        with self._lock:
+            self._apply(int(ts_ms), key, 1, int(time.time() * 1000))
+            self.events_added += 1
+
+    def add_events(self, origin: str, events: Iterable[Event]) -> None:
+        """计入来自 origin 的错误，记账以便 retract"""
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            ledger = self._origins.setdefault(origin, [])
+            for ts_ms, key in events:
+                if not ts_ms:
+                    continue
+                self._apply(ts_ms, key, 1, now_ms)
+                ledger.append((ts_ms, key))
+                self.events_added += 1
+
+    def retract(self, origin: str) -> None:
+        """撤回 origin 计入的全部错误"""
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            for ts_ms, key in self._origins.pop(origin, ()):
+                self._apply(ts_ms, key, -1, now_ms)
+
+    def origins(self) -> List[str]:
+        with self._lock:
+            return list(self._origins)
+
+    def export_framework(self) -> Dict[str, List[List[Any]]]:
+        """framework 来源的计数不记账（无法从文件重算），按桶导出供启动快照使用"""
+        with self._lock:
+            return {
+                step: [
+                    [index, key[1], key[2], key[3], n]
+                    for index, counter in buckets.items()
+                    for key, n in counter.items()
+                    if key[0] == "framework"
+                ]
+                for step, buckets in (("minute", self._minutes), ("hour", self._hours))
+            }
+
+    def restore_framework(self, data: Dict[str, List[List[Any]]]) -> int:
+        now_ms = int(time.time() * 1000)
+        restored = 0
+        with self._lock:
+            for step, rows in data.items():
+                if step not in ("minute", "hour"):
+                    continue
+                buckets, step_ms = self._resolution(step)
+                retention = self.minute_retention if step == "minute" else self.hour_retention
+                cutoff = _bucket_index(now_ms, step_ms) - retention
+                for index, agent, error_type, model, n in rows:
+                    if index > cutoff and n > 0:
+                        self._bump(buckets, int(index), ("framework", agent, error_type, model), int(n))
+                        restored += 1
+        return restored
+
+    # ---- 查询 ----
+
+    def _resolution(self, step: str) -> Tuple[Dict[int, Counter], int]:
+        return (self._minutes, MINUTE_MS) if step == "minute" else (self._hours, HOUR_MS)
+
+    @staticmethod
+    def _match(key: RollupKey, filters: Dict[str, Optional[str]]) -> bool:
+        for dim, value in zip(DIMENSIONS, key):
+            want = filters.get(dim)
+            if want is not None and value != want:
+                return False
+        return True
+
+    def series(
+        self,
+        since: int,
+        until: int,
+        step: str = "hour",
+        group_by: Optional[str] = None,
+        **filters: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """
+        [since, until) 内按 step（minute / hour）对齐的计数序列，空桶补 0。
+
+        Returns:
+            [{'t': 桶起始毫秒, 'count': n, 'groups': {维度值: n}}]（groups 仅在 group_by 非空时给出）
+        """
+        buckets, step_ms = self._resolution(step)
+        dim = DIMENSIONS.index(group_by) if group_by else None
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for index in range(since // step_ms, (until - 1) // step_ms + 1):
+                row: Dict[str, Any] = {"t": index * step_ms, "count": 0}
+                groups: Dict[str, int] = {}
+                for key, n in (buckets.get(index) or {}).items():
+                    if not self._match(key, filters):
+                        continue
+                    row["count"] += n
+                    if dim is not None:
+                        groups[key[dim]] = groups.get(key[dim], 0) + n
+                if dim is not None:
+                    row["groups"] = groups
+                out.append(row)
+        return out
+
+    def breakdown(
+        self,
+        since: Optional[int],
+        until: Optional[int],
+        by: str,
+        **filters: Optional[str],
+    ) -> Dict[str, int]:
+        """
+        [since, until) 内按维度汇总。since 落在分钟桶保留期内时按分钟精度，否则按小时桶
+        （区间两端按整点对齐）；since 为空表示全部保留期。
+        """
+        now_ms = int(time.time() * 1000)
+        until = now_ms + 1 if until is None else until
+        use_minutes = since is not None and (
+            since // MINUTE_MS > now_ms // MINUTE_MS - self.minute_retention
+        )
+        buckets, step_ms = self._resolution("minute" if use_minutes else "hour")
+        dim = DIMENSIONS.index(by)
+        lo = None if since is None else since // step_ms
+        hi = (until - 1) // step_ms
+        out: Dict[str, int] = {}
+        with self._lock:
+            for index, counter in buckets.items():
+                if index > hi or (lo is not None and index < lo):
+                    continue
+                for key, n in counter.items():
+                    if self._match(key, filters):
+                        out[key[dim]] = out.get(key[dim], 0) + n
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "minuteBuckets": len(self._minutes),
+                "hourBuckets": len(self._hours),
+                "origins": len(self._origins),
+                "eventsAdded": self.events_added,
+            }
+
+
+_rollups_instance: Optional[ErrorRollups] = None
+_rollups_lock = threading.Lock()
+
+
+def get_error_rollups() -> ErrorRollups:
+    global _rollups_instance
+    with _rollups_lock:
+        if _rollups_instance is None:
+            _rollups_instance = ErrorRollups()
+        return _rollups_instance
+
+
+def reset_error_rollups_for_tests() -> None:
+    global _rollups_instance
+    with _rollups_lock:
+        _rollups_instance = None
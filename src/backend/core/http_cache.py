@@ -0,0 +1,177 @@
+"""
+HTTP 条件请求（ETag / If-None-Match）
+
+- 强 ETag 由响应内容（剔除时间戳等易变字段后）的摘要生成
+- 易变时间戳固定为「内容最近一次变化」的时刻，内容不变时响应字节完全一致
+- If-None-Match 命中时返回 304，不再序列化响应体
+- ConditionalGetMiddleware：按已登记接口依赖的源文件指纹生成弱 ETag，命中时不执行 handler
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# key -> (content digest, 内容变化时刻 ms)
+_versions: Dict[str, Tuple[str, int]] = {}
+_versions_lock = threading.Lock()
+
+
+def content_digest(content: Any) -> str:
+    """可 JSON 序列化内容的稳定摘要"""
+    raw = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def make_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def stamp_version(key: str, digest: str, now_ms: Optional[int] = None) -> int:
+    """返回 key 当前内容的变化时刻：摘要未变沿用上次时刻，否则记为 now"""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    with _versions_lock:
+        prev = _versions.get(key)
+        if prev is not None and prev[0] == digest:
+            return prev[1]
+        _versions[key] = (digest, now_ms)
+        return now_ms
+
+
+def if_none_match(request: Optional[Request], etag: str) -> bool:
+    """请求头 If-None-Match 是否命中 etag（弱比较，支持列表与 *）"""
+    if request is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == bare:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def conditional_json(request: Optional[Request], content: Any, etag: str) -> Response:
+    """If-None-Match 命中返回 304，否则返回带 ETag 的 JSON"""
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    return JSONResponse(content=jsonable_encoder(content), headers={"ETag": etag})
+
+
+# ---------------------------------------------------------------------------
+# 基于源文件指纹的条件 GET
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class ConditionalRoute:
+    pattern: "re.Pattern[str]"
+    # 路径参数 -> 依赖源的指纹（须可 JSON 序列化）
+    sources: Callable[[Dict[str, str]], Any]
+    # 输出依赖当前时间时的 validator 时间粒度：None 不含时间，0 取 OPENCLAW_CONDITIONAL_TICK_SEC
+    tick_sec: Optional[float] = None
+
+
+_routes: List[ConditionalRoute] = []
+
+
+def register_conditional_route(
+    path_regex: str, sources: Callable[[Dict[str, str]], Any], tick_sec: Optional[float] = None
+) -> None:
+    """登记条件 GET 接口（path_regex 全匹配请求路径，命名分组作为路径参数）"""
+    _routes.append(ConditionalRoute(re.compile(path_regex), sources, tick_sec))
+
+
+def clear_conditional_routes() -> None:
+    _routes.clear()
+
+
+def _match_route(path: str) -> Optional[Tuple[ConditionalRoute, Dict[str, str]]]:
+    for route in _routes:
+        m = route.pattern.fullmatch(path)
+        if m is not None:
+            return route, m.groupdict()
+    return None
+
+
+def source_validator(path: str, query: str, route: ConditionalRoute, params: Dict[str, str]) -> str:
+    """由请求路径、查询串、源文件指纹与时间片生成弱 ETag"""
+    parts: List[Any] = [path, query, route.sources(params)]
+    if route.tick_sec is not None:
+        from core.config_fortify import get_fortify_config
+
+        tick = route.tick_sec or get_fortify_config().conditional_tick_sec
+        if tick > 0:
+            parts.append(int(time.time() // tick))
+    return "W/" + make_etag(content_digest(parts))
+
+
+class ConditionalGetMiddleware:
+    """
+    对已登记的 GET 接口：先算源文件 validator，If-None-Match 命中直接 304（不执行 handler）；
+    否则照常处理，并为 200 响应补上 ETag。
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        from core.config_fortify import get_fortify_config
+
+        matched = _match_route(scope["path"]) if get_fortify_config().conditional_get else None
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+        route, params = matched
+        try:
+            etag = source_validator(
+                scope["path"], scope.get("query_string", b"").decode("latin-1"), route, params
+            )
+        except Exception as e:
+            from core.error_handler import record_error
+
+            record_error("unknown", str(e), "http_cache:validator", exc=e)
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if if_none_match(request, etag):
+            await not_modified(etag)(scope, receive, send)
+            return
+
+        async def send_with_etag(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = list(message.get("headers", []))
+                if not any(k.lower() == b"etag" for k, _ in headers):
+                    headers.append((b"etag", etag.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
+def reset_http_cache_for_tests() -> None:
+    with _versions_lock:
+        _versions.clear()
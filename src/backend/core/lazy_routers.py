@@ -0,0 +1,89 @@
+"""
+路由模块按需加载 - 启动时只注册首屏需要的路由，其余模块在后台预加载
+
+- 请求未命中已注册路由时（后台预加载尚未完成），先同步加载全部延迟路由再继续处理
+- 模块导入在线程中进行；注册在事件循环线程中一次完成，并把静态文件 Mount 移回末尾，
+  路由顺序与一次性注册时一致
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Dict, List, Tuple
+
+from starlette.routing import Match, Mount
+
+from core.startup_profile import startup_phase
+
+# (模块名, include_router 参数)
+RouterSpec = Tuple[str, Dict[str, Any]]
+
+
+class LazyRouters:
+    def __init__(self, app: Any, specs: List[RouterSpec]) -> None:
+        self.app = app
+        self.specs = specs
+        self.loaded = not specs
+        self._import_lock = threading.Lock()
+        self._modules: List[ModuleType] = []
+
+    def _import_all(self) -> List[ModuleType]:
+        with self._import_lock:
+            if not self._modules:
+                modules = []
+                with startup_phase("routers:import", background=True):
+                    for name, _ in self.specs:
+                        with startup_phase(f"import:{name}", background=True, parent="routers:import"):
+                            modules.append(importlib.import_module(name))
+                self._modules = modules
+            return self._modules
+
+    def _register(self, modules: List[ModuleType]) -> None:
+        if self.loaded:
+            return
+        for module, (_, kwargs) in zip(modules, self.specs):
+            self.app.include_router(module.router, **kwargs)
+        routes = self.app.router.routes
+        routes[:] = [r for r in routes if not isinstance(r, Mount)] + [r for r in routes if isinstance(r, Mount)]
+        self.app.openapi_schema = None
+        self.loaded = True
+
+    async def ensure_loaded(self) -> None:
+        if self.loaded:
+            return
+        modules = await asyncio.to_thread(self._import_all)
+        self._register(modules)
+
+    def load_sync(self) -> None:
+        """无事件循环时（脚本、测试）直接加载"""
+        if not self.loaded:
+            self._register(self._import_all())
+
+    def matches(self, scope: Dict[str, Any]) -> bool:
+        """是否已有路由（不含静态文件 Mount）完整匹配该请求"""
+        for route in self.app.router.routes:
+            if isinstance(route, Mount):
+                continue
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return True
+        return False
+
+
+class LazyRouterMiddleware:
+    """请求到达时延迟路由尚未加载且没有已注册路由匹配，则先加载"""
+
+    def __init__(self, app: Any, routers: LazyRouters) -> None:
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] in ("http", "websocket")
+            and not self.routers.loaded
+            and not self.routers.matches(scope)
+        ):
+            await self.routers.ensure_loaded()
+        await self.app(scope, receive, send)
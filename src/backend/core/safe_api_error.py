@@ -5,7 +5,7 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 
 def sanitize_client_error_text(raw: str, max_len: int = 1200) -> str:
@@ -74,3 +74,18 @@ def redact_framework_stats_for_client(data: Dict[str, Any]) -> Dict[str, Any]:
         le["detail"] = sanitize_client_error_text(str(le["detail"]))
         out["last_error"] = le
     return out
+
+
+def redact_framework_events_for_client(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """为 /api/errors/reliability 的最近错误事件脱敏 detail。"""
+    from core.config_fortify import get_fortify_config
+
+    if not get_fortify_config().sanitize_api_errors:
+        return events
+    out = []
+    for ev in events:
+        if ev.get("detail"):
+            ev = dict(ev)
+            ev["detail"] = sanitize_client_error_text(str(ev["detail"]))
+        out.append(ev)
+    return out
@@ -4,8 +4,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
-import jsonschema
-from jsonschema import Draft202012Validator
+# jsonschema 导入较重（约 40ms），在首次构造校验器时才导入，不拖慢启动
 
 
 @dataclass
@@ -24,6 +23,8 @@ class SchemaValidator:
     def __init__(self, schema: Dict[str, Any], strict: bool = True):
         self.schema = schema
         self.strict = strict
+        from jsonschema import Draft202012Validator
+
         self._validator = Draft202012Validator(schema)
         self._last_errors: List[str] = []
 
@@ -32,10 +33,12 @@ class SchemaValidator:
         if not isinstance(data, (dict, list)) and self.schema.get("type") == "object":
             self._last_errors.append("expected object")
             return ValidationResult(False, list(self._last_errors))
+        from jsonschema import ValidationError
+
         try:
             self._validator.validate(data)
             return ValidationResult(True, [])
-        except jsonschema.ValidationError as e:
+        except ValidationError as e:
             self._last_errors.append(e.message)
             return ValidationResult(False, list(self._last_errors))
 
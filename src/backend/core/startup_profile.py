@@ -0,0 +1,72 @@
+"""
+启动耗时记录 - 按阶段记录导入与初始化耗时，供 GET /api/health/startup 排查冷启动
+
+- 时间以本模块导入时刻（main 导入的第一步）为零点，单位毫秒
+- ready 为 lifespan 完成、开始接受请求的时刻；后台阶段（路由预加载、缓存预热）可晚于 ready
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_T0 = time.perf_counter()
+_T0_WALL = time.time()
+
+_lock = threading.Lock()
+_phases: List[Dict[str, Any]] = []
+_marks: Dict[str, float] = {}
+
+
+def _now_ms() -> float:
+    return round((time.perf_counter() - _T0) * 1000, 2)
+
+
+@contextmanager
+def startup_phase(name: str, background: bool = False, parent: Optional[str] = None) -> Iterator[None]:
+    """记录一个阶段的起止；异常照常抛出，阶段标记为 error。parent 非空为子阶段，不计入汇总"""
+    start = _now_ms()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        end = _now_ms()
+        with _lock:
+            _phases.append({
+                "name": name,
+                "startMs": start,
+                "durationMs": round(end - start, 2),
+                "background": background,
+                "parent": parent,
+                "status": status,
+            })
+
+
+def mark_startup(name: str) -> None:
+    """记录一个时间点（如 ready）；同名只保留首次"""
+    with _lock:
+        _marks.setdefault(name, _now_ms())
+
+
+def get_startup_report() -> Dict[str, Any]:
+    with _lock:
+        phases = sorted(_phases, key=lambda p: p["startMs"])
+        marks = dict(_marks)
+    top = [p for p in phases if p["parent"] is None]
+    foreground = [p for p in top if not p["background"]]
+    background = [p for p in top if p["background"]]
+    return {
+        "startedAt": int(_T0_WALL * 1000),
+        "readyMs": marks.get("ready"),
+        "backgroundDoneMs": marks.get("background_done"),
+        "marks": marks,
+        "phases": phases,
+        "foregroundMs": round(sum(p["durationMs"] for p in foreground), 2),
+        "backgroundMs": round(sum(p["durationMs"] for p in background), 2),
+        "uptimeMs": _now_ms(),
+    }
+
@@ -3,8 +3,9 @@
 """
 import json
 import os
+import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 from datetime import datetime
@@ -103,60 +104,51 @@ def _get_workflow_state(project_id: str) -> Dict[str, Any]:
     return {}
 
 
-def build_task_chains(limit: int = 20) -> List[Dict[str, Any]]:
-    """
-    构建任务链路列表
-
-    通过解析 runs.json 中的派发关系，构建完整的任务执行链路
-    """
-    runs_data = _load_runs()
-    runs = runs_data.get('runs', {})
-
-    if not runs:
-        return []
-
-    # 按 requesterSessionKey 分组，构建链路
-    chains_map: Dict[str, Dict[str, Any]] = {}
+def _chain_id_of(run_info: Dict[str, Any]) -> Optional[str]:
+    """run 所属链路 ID；缺少 requester / child 时不参与链路"""
+    requester_key = run_info.get('requesterSessionKey', '')
+    if not requester_key or not run_info.get('childSessionKey', ''):
+        return None
+    # 使用 requester 的 session 作为链路 ID（简化处理）
+    return requester_key.split(':subagent:')[0] if ':subagent:' in requester_key else requester_key
+
+
+def _run_signature(run_info: Dict[str, Any]) -> tuple:
+    """影响链路结果的 run 字段；不变则跳过"""
+    return tuple(
+        run_info.get(k) for k in (
+            'requesterSessionKey', 'childSessionKey', 'startedAt', 'endedAt',
+            'outcome', 'task', 'archiveAtMs',
+        )
+    )
+
+
+def _build_chain(chain_id: str, runs: Dict[str, Dict[str, Any]], agent_info) -> Dict[str, Any]:
+    """由单条链路的 runs（按 runs.json 顺序）构建链路"""
+    chain: Dict[str, Any] = {
+        'chainId': chain_id,
+        'rootTask': '',
+        'startedAt': None,
+        'status': ChainStatus.RUNNING.value,
+        'nodes': {},
+        'edges': [],
+        'projectId': None
+    }
 
     for run_id, run_info in runs.items():
-        if not isinstance(run_info, dict):
-            continue
-
-        requester_key = run_info.get('requesterSessionKey', '')
-        child_key = run_info.get('childSessionKey', '')
-
-        if not requester_key or not child_key:
-            continue
-
         # 解析 requester 和 child
-        requester = _parse_session_key(requester_key)
-        child = _parse_session_key(child_key)
+        requester = _parse_session_key(run_info.get('requesterSessionKey', ''))
+        child = _parse_session_key(run_info.get('childSessionKey', ''))
 
         requester_id = requester.get('agent_id', 'main')
         child_id = child.get('agent_id', 'unknown')
 
-        # 使用 requester 的 session 作为链路 ID（简化处理）
-        chain_id = requester_key.split(':subagent:')[0] if ':subagent:' in requester_key else requester_key
-
-        if chain_id not in chains_map:
-            chains_map[chain_id] = {
-                'chainId': chain_id,
-                'rootTask': '',
-                'startedAt': None,
-                'status': ChainStatus.RUNNING.value,
-                'nodes': {},
-                'edges': [],
-                'projectId': None
-            }
-
-        chain = chains_map[chain_id]
-
         # 添加 requester 节点（如果不存在）
         if requester_id not in chain['nodes']:
-            agent_info = _get_agent_info(requester_id)
+            info = agent_info(requester_id)
             chain['nodes'][requester_id] = {
                 'agentId': requester_id,
-                'agentName': agent_info.get('name', requester_id),
+                'agentName': info.get('name', requester_id),
                 'role': requester_id.split('-')[0] if '-' in requester_id else requester_id,
                 'status': ChainNodeStatus.COMPLETED.value,
                 'startedAt': None,
@@ -172,7 +164,7 @@ def build_task_chains(limit: int = 20) -> List[Dict[str, Any]]:
             }
 
         # 添加子节点
-        agent_info = _get_agent_info(child_id)
+        info = agent_info(child_id)
         started_at = run_info.get('startedAt')
         ended_at = run_info.get('endedAt')
 
@@ -184,7 +176,7 @@ def build_task_chains(limit: int = 20) -> List[Dict[str, Any]]:
 
         chain['nodes'][child_id] = {
             'agentId': child_id,
-            'agentName': agent_info.get('name', child_id),
+            'agentName': info.get('name', child_id),
             'role': child_id.split('-')[0] if '-' in child_id else child_id,
             'status': node_status,
             'startedAt': started_at,
@@ -218,62 +210,189 @@ def build_task_chains(limit: int = 20) -> List[Dict[str, Any]]:
             chain['archiveAtMs'] = run_info.get('archiveAtMs')
 
     # 转换节点为列表并计算统计信息
-    chains = []
-    for chain_id, chain in chains_map.items():
-        nodes_list = list(chain['nodes'].values())
-
-        # 计算进度
-        completed = sum(1 for n in nodes_list if n['status'] == ChainNodeStatus.COMPLETED.value)
-        running = sum(1 for n in nodes_list if n['status'] == ChainNodeStatus.RUNNING.value)
-        total = len(nodes_list)
-
-        progress = completed / total if total > 0 else 0
-
-        # 计算总耗时
-        total_duration = sum(n['duration'] or 0 for n in nodes_list)
-
-        # 确定链路状态
-        if any(n['status'] == ChainNodeStatus.ERROR.value for n in nodes_list):
-            chain_status = ChainStatus.ERROR.value
-        elif running > 0:
-            chain_status = ChainStatus.RUNNING.value
-        else:
-            chain_status = ChainStatus.COMPLETED.value
-
-        chains.append({
-            'chainId': chain_id,
-            'projectId': chain.get('projectId'),
-            'rootTask': chain.get('rootTask', '未知任务'),
-            'startedAt': chain.get('startedAt'),
-            'archiveAtMs': chain.get('archiveAtMs'),
-            'status': chain_status,
-            'nodes': nodes_list,
-            'edges': chain['edges'],
-            'progress': progress,
-            'completedNodes': completed,
-            'totalNodes': total,
-            'totalDuration': total_duration
-        })
-
-    # 按开始时间排序
-    chains.sort(key=lambda x: x.get('startedAt') or 0, reverse=True)
-
-    return chains[:limit]
+    nodes_list = list(chain['nodes'].values())
+
+    # 计算进度
+    completed = sum(1 for n in nodes_list if n['status'] == ChainNodeStatus.COMPLETED.value)
+    running = sum(1 for n in nodes_list if n['status'] == ChainNodeStatus.RUNNING.value)
+    total = len(nodes_list)
+
+    progress = completed / total if total > 0 else 0
+
+    # 计算总耗时
+    total_duration = sum(n['duration'] or 0 for n in nodes_list)
+
+    # 确定链路状态
+    if any(n['status'] == ChainNodeStatus.ERROR.value for n in nodes_list):
+        chain_status = ChainStatus.ERROR.value
+    elif running > 0:
+        chain_status = ChainStatus.RUNNING.value
+    else:
+        chain_status = ChainStatus.COMPLETED.value
+
+    return {
+        'chainId': chain_id,
+        'projectId': chain.get('projectId'),
+        'rootTask': chain.get('rootTask', '未知任务'),
+        'startedAt': chain.get('startedAt'),
+        'archiveAtMs': chain.get('archiveAtMs'),
+        'status': chain_status,
+        'nodes': nodes_list,
+        'edges': chain['edges'],
+        'progress': progress,
+        'completedNodes': completed,
+        'totalNodes': total,
+        'totalDuration': total_duration
+    }
+
+
+def chain_sort_key(chain: Dict[str, Any]) -> Tuple[int, str]:
+    return (int(chain.get('startedAt') or 0), str(chain.get('chainId') or ''))
+
+
+class ChainGraph:
+    """
+    任务链路图 - 按 runs.json 的变化增量维护（线程安全）
+
+    - runs.json / openclaw.json 未变化时不读取文件
+    - 只重算新增、结束或移除的 run 所在链路；配置变化（Agent 名称）时全部重算
+    - 链路按 chainId 索引，状态计数随链路更新同步增减
+    返回的链路 dict 为共享只读对象。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._epoch: Optional[tuple] = None
+        self._run_sigs: Dict[str, tuple] = {}
+        self._run_chain: Dict[str, str] = {}
+        self._chain_runs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._chains: Dict[str, Dict[str, Any]] = {}
+        self._status_counts: Dict[str, int] = {s.value: 0 for s in ChainStatus}
+        self._order: Optional[List[Dict[str, Any]]] = None
+        self.chain_rebuilds = 0
+
+    def _set_chain(self, chain_id: str, chain: Optional[Dict[str, Any]]) -> None:
+        old = self._chains.pop(chain_id, None)
+        if old is not None:
+            self._status_counts[old['status']] -= 1
+        if chain is not None:
+            self._chains[chain_id] = chain
+            self._status_counts[chain['status']] += 1
+
+    def _refresh(self) -> None:
+        from data.source_fingerprint import config_fingerprint, runs_fingerprint
+
+        epoch = (runs_fingerprint(), config_fingerprint())
+        if epoch == self._epoch:
+            return
+        config_changed = self._epoch is None or epoch[1] != self._epoch[1]
+        self._epoch = epoch
+        runs = _load_runs().get('runs', {})
+
+        dirty = set(self._chains) if config_changed else set()
+        for run_id, run_info in runs.items():
+            if not isinstance(run_info, dict):
+                continue
+            sig = _run_signature(run_info)
+            if self._run_sigs.get(run_id) == sig:
+                continue
+            self._run_sigs[run_id] = sig
+            chain_id = _chain_id_of(run_info)
+            old_chain = self._run_chain.pop(run_id, None)
+            if old_chain is not None and old_chain != chain_id:
+                self._chain_runs[old_chain].pop(run_id, None)
+                dirty.add(old_chain)
+            if chain_id is not None:
+                # 同一链路内原位更新，保持 runs.json 中的顺序
+                self._run_chain[run_id] = chain_id
+                self._chain_runs.setdefault(chain_id, {})[run_id] = run_info
+                dirty.add(chain_id)
+
+        for run_id in [r for r in self._run_sigs if r not in runs]:
+            del self._run_sigs[run_id]
+            chain_id = self._run_chain.pop(run_id, None)
+            if chain_id is not None:
+                self._chain_runs[chain_id].pop(run_id, None)
+                dirty.add(chain_id)
+
+        if not dirty:
+            return
+        infos: Dict[str, Dict[str, Any]] = {}
+
+        def agent_info(agent_id: str) -> Dict[str, Any]:
+            if agent_id not in infos:
+                infos[agent_id] = _get_agent_info(agent_id)
+            return infos[agent_id]
+
+        for chain_id in dirty:
+            chain_runs = self._chain_runs.get(chain_id)
+            if not chain_runs:
+                self._chain_runs.pop(chain_id, None)
+                self._set_chain(chain_id, None)
+                continue
+            self._set_chain(chain_id, _build_chain(chain_id, chain_runs, agent_info))
+            self.chain_rebuilds += 1
+        self._order = None
+
+    def chains(self) -> List[Dict[str, Any]]:
+        """按 (startedAt, chainId) 倒序的全部链路"""
+        with self._lock:
+            self._refresh()
+            if self._order is None:
+                self._order = sorted(self._chains.values(), key=chain_sort_key, reverse=True)
+            return self._order
+
+    def get(self, chain_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._chains.get(chain_id)
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return dict(self._status_counts)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'chains': len(self._chains), 'runs': len(self._run_sigs), 'chainRebuilds': self.chain_rebuilds}
+
+
+_graph_instance: Optional[ChainGraph] = None
+_graph_lock = threading.Lock()
+
+
+def get_chain_graph() -> ChainGraph:
+    global _graph_instance
+    with _graph_lock:
+        if _graph_instance is None:
+            _graph_instance = ChainGraph()
+        return _graph_instance
+
+
+def reset_chain_graph_for_tests() -> None:
+    global _graph_instance
+    with _graph_lock:
+        _graph_instance = None
+
+
+def build_task_chains(limit: Optional[int] = 20) -> List[Dict[str, Any]]:
+    """
+    构建任务链路列表
+
+    通过解析 runs.json 中的派发关系，构建完整的任务执行链路；limit 为 None 时返回全部
+    """
+    chains = get_chain_graph().chains()
+    return list(chains) if limit is None else chains[:limit]
 
 
 def get_task_chain(chain_id: str) -> Optional[Dict[str, Any]]:
     """获取单个任务链的详情"""
-    chains = build_task_chains(limit=100)
-    for chain in chains:
-        if chain['chainId'] == chain_id:
-            return chain
-    return None
+    return get_chain_graph().get(chain_id)
 
 
 def get_active_chain() -> Optional[Dict[str, Any]]:
-    """获取当前活跃的任务链（正在执行的）"""
-    chains = build_task_chains(limit=50)
-    for chain in chains:
+    """获取当前活跃的任务链（正在执行的，取最近开始的一条）"""
+    for chain in get_chain_graph().chains():
         if chain['status'] == ChainStatus.RUNNING.value:
             return chain
     return None
@@ -281,17 +400,15 @@ def get_active_chain() -> Optional[Dict[str, Any]]:
 
 def get_chains_summary() -> Dict[str, Any]:
     """获取任务链摘要统计"""
-    chains = build_task_chains(limit=100)
-
-    running = sum(1 for c in chains if c['status'] == ChainStatus.RUNNING.value)
-    completed = sum(1 for c in chains if c['status'] == ChainStatus.COMPLETED.value)
-    error = sum(1 for c in chains if c['status'] == ChainStatus.ERROR.value)
+    graph = get_chain_graph()
+    counts = graph.status_counts()
+    chains = graph.chains()
 
     return {
-        'total': len(chains),
-        'running': running,
-        'completed': completed,
-        'error': error,
+        'total': sum(counts.values()),
+        'running': counts[ChainStatus.RUNNING.value],
+        'completed': counts[ChainStatus.COMPLETED.value],
+        'error': counts[ChainStatus.ERROR.value],
         'chains': [
             {
                 'chainId': c['chainId'],
@@ -80,6 +80,16 @@ def load_config() -> Dict[str, Any]:
         return json.load(f)
 
 
+def get_config_epoch() -> tuple:
+    """openclaw.json 的版本标识 (路径, mtime_ns, size)；文件不存在时 mtime/size 为 None"""
+    config_path = get_openclaw_root() / "openclaw.json"
+    try:
+        st = config_path.stat()
+    except OSError:
+        return (str(config_path), None, None)
+    return (str(config_path), st.st_mtime_ns, st.st_size)
+
+
 def get_agents_list() -> List[Dict[str, Any]]:
     """获取 Agent 列表"""
     config = load_config()
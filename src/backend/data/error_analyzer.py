@@ -1,11 +1,11 @@
 """
 错误分析器 - 分析 Agent 执行错误，追溯根因
 """
+import bisect
 import os
-import re
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
 
@@ -30,8 +30,10 @@ class ErrorSeverity(Enum):
     LOW = "low"            # 轻微错误，可忽略
 
 
+from core.error_classifier import RuleClassifier
 from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
 from utils.data_repair import parse_session_jsonl_line
+from utils.jsonl_tail import AppendedLines
 
 
 # 错误模式匹配规则
@@ -108,19 +110,19 @@ ERROR_PATTERNS = [
 ]
 
 
-def classify_error(error_message: str) -> Tuple[ErrorType, ErrorSeverity]:
-    """根据错误消息分类错误类型和严重程度"""
-    if not error_message:
-        return ErrorType.UNKNOWN, ErrorSeverity.MEDIUM
-
-    error_lower = error_message.lower()
+_classifier = RuleClassifier(
+    [((error_type, severity), patterns) for error_type, severity, patterns in ERROR_PATTERNS],
+    (ErrorType.UNKNOWN, ErrorSeverity.MEDIUM),
+)
 
-    for error_type, severity, patterns in ERROR_PATTERNS:
-        for pattern in patterns:
-            if re.search(pattern, error_lower, re.IGNORECASE):
-                return error_type, severity
 
-    return ErrorType.UNKNOWN, ErrorSeverity.MEDIUM
+def classify_error(error_message: str) -> Tuple[ErrorType, ErrorSeverity]:
+    """
+    根据错误消息分类错误类型和严重程度：按 ERROR_PATTERNS 顺序取首个命中的规则。
+    a.*b 形式的模式按同一行内的有序子串查找，其余模式每条规则合并为一个正则；
+    结果按消息的 blake2b 摘要 LRU 缓存
+    """
+    return _classifier.classify(error_message)
 
 
 def get_error_suggestions(error_type: ErrorType, error_message: str) -> List[str]:
@@ -178,151 +180,218 @@ def get_error_suggestions(error_type: ErrorType, error_message: str) -> List[str
     return suggestions.get(error_type, suggestions[ErrorType.UNKNOWN])
 
 
-def parse_session_for_errors(session_path: Path) -> List[Dict[str, Any]]:
-    """解析 session 文件，提取错误信息"""
-    errors = []
+def _collect_message_errors(msg: Dict[str, Any], turn_index: int, out: List[Dict[str, Any]]) -> None:
+    """提取单条消息中的错误（不含修复建议）追加到 out"""
+    role = msg.get('role')
+    timestamp = msg.get('timestamp')
+    stop_reason = msg.get('stopReason')
+
+    # 检查 stopReason 为 error
+    if stop_reason == 'error':
+        # 优先从 errorMessage 字段获取
+        error_text = msg.get('errorMessage', '')
+
+        # 如果没有 errorMessage，从 content 中提取
+        if not error_text:
+            content = msg.get('content', [])
+            for c in content:
+                if isinstance(c, dict):
+                    if c.get('type') == 'text':
+                        error_text += c.get('text', '') + ' '
+
+        # 提取更多上下文
+        provider = msg.get('provider', '')
+        model = msg.get('model', '')
+
+        error_type, severity = classify_error(error_text)
+
+        out.append({
+            'turnIndex': turn_index,
+            'timestamp': timestamp,
+            'role': role,
+            'stopReason': stop_reason,
+            'rawMessage': error_text[:500],
+            'errorType': error_type.value,
+            'severity': severity.value,
+            'provider': provider,
+            'model': model,
+        })
 
+    # 检查 toolResult 中的错误
+    if role == 'user':
+        content = msg.get('content', [])
+        for c in content:
+            if isinstance(c, dict) and c.get('type') == 'toolResult':
+                if c.get('isError') or c.get('error'):
+                    error_text = c.get('error', '') or str(c.get('content', ''))[:500]
+                    tool_name = c.get('toolName', 'unknown')
+                    error_type, severity = classify_error(error_text)
+
+                    out.append({
+                        'turnIndex': turn_index,
+                        'timestamp': timestamp,
+                        'role': 'toolResult',
+                        'toolName': tool_name,
+                        'stopReason': 'tool_error',
+                        'rawMessage': error_text,
+                        'errorType': error_type.value,
+                        'severity': severity.value,
+                    })
+
+
+def with_suggestions(error: Dict[str, Any]) -> Dict[str, Any]:
+    """补充修复建议（按 errorType 派生，不随索引存储）"""
+    try:
+        error_type = ErrorType(error.get('errorType'))
+    except ValueError:
+        error_type = ErrorType.UNKNOWN
+    error['suggestions'] = get_error_suggestions(error_type, error.get('rawMessage', ''))
+    return error
+
+
+def _has_tool_call(msg: Dict[str, Any]) -> bool:
+    content = msg.get('content')
+    return msg.get('role') == 'assistant' and isinstance(content, list) and any(
+        isinstance(c, dict) and c.get('type') == 'toolCall' for c in content
+    )
+
+
+def _message_ts(envelope: Dict[str, Any], msg: Dict[str, Any]) -> int:
+    """消息时间戳（毫秒）：优先消息自带的数值（秒或毫秒），其次信封的 ISO 时间；都没有时为 0"""
+    ts = msg.get('timestamp')
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        ts = int(ts)
+        return ts * 1000 if 0 < ts < 10_000_000_000 else ts
+    raw = envelope.get('timestamp')
+    if isinstance(raw, str) and raw:
+        try:
+            dt = datetime.fromisoformat(raw.replace('Z', '+00:00'))
+        except ValueError:
+            return 0
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+    return 0
+
+
+SessionErrorScan = Tuple[List[Tuple[int, int, Dict[str, Any]]], List[Tuple[int, int]], int, int]
+
+
+def scan_session_errors(path: str, offset: int = 0, turn_index: int = 0) -> Optional[SessionErrorScan]:
+    """
+    从字节偏移 offset（对应轮次 turn_index）起扫描 session 文件（进程池工作函数，须保持模块级）。
+
+    Returns:
+        ([(行偏移, 时间戳毫秒, 错误)], [(轮次, 行偏移)] 含工具调用的行, 消费字节数, 下一轮次)；
+        末行未写完时留待下次；文件不可读时为 None
+    """
+    errors: List[Tuple[int, int, Dict[str, Any]]] = []
+    tool_lines: List[Tuple[int, int]] = []
     try:
-        with open(session_path, 'r', encoding='utf-8') as f:
-            turn_index = 0
-            for line in f:
+        with open(path, 'rb') as f:
+            lines = AppendedLines(f, offset)
+            for line_offset, raw in lines:
                 try:
-                    envelope, msg = parse_session_jsonl_line(line)
+                    envelope, msg = parse_session_jsonl_line(raw.decode('utf-8', errors='replace'))
                     if (
                         envelope is None
                         or envelope.get('type') != 'message'
                         or msg is None
                     ):
                         continue
-                    role = msg.get('role')
-                    timestamp = msg.get('timestamp')
-                    stop_reason = msg.get('stopReason')
-
-                    # 检查 stopReason 为 error
-                    if stop_reason == 'error':
-                        # 优先从 errorMessage 字段获取
-                        error_text = msg.get('errorMessage', '')
-
-                        # 如果没有 errorMessage，从 content 中提取
-                        if not error_text:
-                            content = msg.get('content', [])
-                            for c in content:
-                                if isinstance(c, dict):
-                                    if c.get('type') == 'text':
-                                        error_text += c.get('text', '') + ' '
-
-                        # 提取更多上下文
-                        provider = msg.get('provider', '')
-                        model = msg.get('model', '')
-
-                        error_type, severity = classify_error(error_text)
-                        suggestions = get_error_suggestions(error_type, error_text)
-
-                        errors.append({
-                            'turnIndex': turn_index,
-                            'timestamp': timestamp,
-                            'role': role,
-                            'stopReason': stop_reason,
-                            'rawMessage': error_text[:500],
-                            'errorType': error_type.value,
-                            'severity': severity.value,
-                            'suggestions': suggestions,
-                            'provider': provider,
-                            'model': model,
-                        })
-
-                    # 检查 toolResult 中的错误
-                    if role == 'user':
-                        content = msg.get('content', [])
-                        for c in content:
-                            if isinstance(c, dict) and c.get('type') == 'toolResult':
-                                if c.get('isError') or c.get('error'):
-                                    error_text = c.get('error', '') or str(c.get('content', ''))[:500]
-                                    tool_name = c.get('toolName', 'unknown')
-                                    error_type, severity = classify_error(error_text)
-                                    suggestions = get_error_suggestions(error_type, error_text)
-
-                                    errors.append({
-                                        'turnIndex': turn_index,
-                                        'timestamp': timestamp,
-                                        'role': 'toolResult',
-                                        'toolName': tool_name,
-                                        'stopReason': 'tool_error',
-                                        'rawMessage': error_text,
-                                        'errorType': error_type.value,
-                                        'severity': severity.value,
-                                        'suggestions': suggestions,
-                                    })
-
+                    found: List[Dict[str, Any]] = []
+                    try:
+                        _collect_message_errors(msg, turn_index, found)
+                    finally:
+                        if found:
+                            ts_ms = _message_ts(envelope, msg)
+                            errors.extend((line_offset, ts_ms, e) for e in found)
+                    if _has_tool_call(msg):
+                        tool_lines.append((turn_index, line_offset))
                     turn_index += 1
-
                 except (KeyError, TypeError, AttributeError):
                     continue
+    except OSError:
+        return None
+    return errors, tool_lines, lines.consumed, turn_index
+
 
-    except Exception as e:
-        errors.append({
-            'error': f'Failed to parse session: {str(e)}',
+def parse_session_for_errors(session_path: Path) -> List[Dict[str, Any]]:
+    """解析整个 session 文件，提取错误信息（与错误索引同一扫描路径）"""
+    scan = scan_session_errors(str(session_path))
+    if scan is None:
+        return [{
+            'error': f'Failed to parse session: {session_path}',
             'errorType': ErrorType.UNKNOWN.value,
             'severity': ErrorSeverity.LOW.value,
-        })
+        }]
+    return [with_suggestions(e) for _, _, e in scan[0]]
 
-    return errors
-
-
-def get_tool_call_chain(session_path: Path, before_turn: int, limit: int = 10) -> List[Dict[str, Any]]:
-    """获取错误发生前的工具调用链"""
-    chain = []
 
+def _tool_calls_in_line(line: str, turn_index: int) -> List[Dict[str, Any]]:
     try:
-        with open(session_path, 'r', encoding='utf-8') as f:
-            turn_index = 0
-            for line in f:
-                try:
-                    if turn_index >= before_turn:
-                        break
-
-                    envelope, msg = parse_session_jsonl_line(line)
-                    if (
-                        envelope is None
-                        or envelope.get('type') != 'message'
-                        or msg is None
-                    ):
-                        continue
-                    role = msg.get('role')
-                    timestamp = msg.get('timestamp')
-
-                    if role == 'assistant':
-                        content = msg.get('content', [])
-                        for c in content:
-                            if isinstance(c, dict) and c.get('type') == 'toolCall':
-                                chain.append({
-                                    'turnIndex': turn_index,
-                                    'timestamp': timestamp,
-                                    'toolName': c.get('name', 'unknown'),
-                                    'toolId': c.get('id', ''),
-                                    'arguments': str(c.get('arguments', {}))[:200],
-                                })
-
-                    turn_index += 1
-
-                except (KeyError, TypeError, AttributeError):
-                    continue
-
-    except Exception:
+        envelope, msg = parse_session_jsonl_line(line)
+        if envelope is None or envelope.get('type') != 'message' or msg is None:
+            return []
+        timestamp = msg.get('timestamp')
+        return [
+            {
+                'turnIndex': turn_index,
+                'timestamp': timestamp,
+                'toolName': c.get('name', 'unknown'),
+                'toolId': c.get('id', ''),
+                'arguments': str(c.get('arguments', {}))[:200],
+            }
+            for c in msg.get('content', [])
+            if isinstance(c, dict) and c.get('type') == 'toolCall'
+        ]
+    except (KeyError, TypeError, AttributeError):
+        return []
+
+
+def get_tool_call_chains(
+    session_path: Path, before_turns: List[int], limit: int = 10, index: Any = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    多个轮次之前的工具调用链（各取最近 N 个）：按错误索引中的行偏移直接定位，
+    一次打开文件，只读取用到的行。index 为调用方已同步过的错误索引，省略时先同步该文件
+    """
+    if index is None:
+        from data.error_index import get_error_index
+
+        index = get_error_index()
+        index.sync([session_path])
+    tool_lines = index.tool_call_lines(session_path)
+    turns = [t for t, _ in tool_lines]
+    parsed: Dict[int, List[Dict[str, Any]]] = {}
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    try:
+        with open(session_path, 'rb') as f:
+            for before_turn in before_turns:
+                chain: List[Dict[str, Any]] = []
+                i = bisect.bisect_left(turns, before_turn) - 1
+                while i >= 0 and len(chain) < limit:
+                    turn, offset = tool_lines[i]
+                    if offset not in parsed:
+                        f.seek(offset)
+                        parsed[offset] = _tool_calls_in_line(
+                            f.readline().decode('utf-8', errors='replace'), turn
+                        )
+                    chain[:0] = parsed[offset]
+                    i -= 1
+                out[before_turn] = chain[-limit:] if len(chain) > limit else chain
+    except OSError:
         pass
+    return out
 
-    # 返回最近的 N 个工具调用
-    return chain[-limit:] if len(chain) > limit else chain
 
+def get_tool_call_chain(session_path: Path, before_turn: int, limit: int = 10) -> List[Dict[str, Any]]:
+    """获取错误发生前的工具调用链"""
+    return get_tool_call_chains(session_path, [before_turn], limit).get(before_turn, [])
 
-def analyze_agent_errors(agent_id: str, session_limit: int = 5) -> Dict[str, Any]:
-    """分析 Agent 的错误情况"""
-    aid = normalize_openclaw_agent_id(agent_id)
-    sessions_dir = get_openclaw_root() / "agents" / aid / "sessions"
-    if not sessions_dir.exists():
-        return {'agentId': agent_id, 'error': 'Sessions directory not found', 'errors': []}
 
-    # 获取最近的 session 文件（包括 .deleted 归档文件）
+def _select_session_files(sessions_dir: Path, session_limit: Optional[int] = None) -> List[Path]:
+    """最近修改的 N 个 session 文件（包括 .deleted 归档文件）；session_limit 为 None 时全部"""
     session_files = []
 
     # 正常的 jsonl 文件
@@ -334,9 +403,33 @@ def analyze_agent_errors(agent_id: str, session_limit: int = 5) -> Dict[str, Any
         session_files.append(f)
 
     # 按修改时间排序，取最近的 N 个
-    session_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-    session_files = session_files[:session_limit]
+    mtimes: Dict[Path, float] = {}
+    for f in session_files:
+        try:
+            mtimes[f] = f.stat().st_mtime
+        except OSError:
+            continue
+    session_files = sorted(mtimes, key=mtimes.__getitem__, reverse=True)
+    return session_files if session_limit is None else session_files[:session_limit]
+
 
+def analyze_agent_errors(agent_id: str, session_limit: Optional[int] = None) -> Dict[str, Any]:
+    """分析 Agent 的错误情况（经错误索引增量维护；session_limit 为 None 时分析全部 session）"""
+    from data.error_index import get_error_index
+
+    aid = normalize_openclaw_agent_id(agent_id)
+    sessions_dir = get_openclaw_root() / "agents" / aid / "sessions"
+    if not sessions_dir.exists():
+        return {'agentId': agent_id, 'error': 'Sessions directory not found', 'errors': []}
+
+    session_files = _select_session_files(sessions_dir, session_limit)
+    index = get_error_index()
+    index.sync(session_files, prune_under=sessions_dir if session_limit is None else None)
+    return _collect_agent_errors(agent_id, session_files, index)
+
+
+def _collect_agent_errors(agent_id: str, session_files: List[Path], index: Any) -> Dict[str, Any]:
+    """从已同步的错误索引汇总 Agent 的错误（不再访问文件清单）"""
     all_errors = []
     error_summary = {
         'total': 0,
@@ -345,31 +438,32 @@ def analyze_agent_errors(agent_id: str, session_limit: int = 5) -> Dict[str, Any
     }
 
     for session_file in session_files:
-        errors = parse_session_for_errors(session_file)
+        errors = index.errors(session_file)
+        if not errors:
+            continue
+        # 获取工具调用链（同一文件一次打开，按偏移定位）
+        chains = get_tool_call_chains(
+            session_file, sorted({e['turnIndex'] for e in errors if e.get('turnIndex')}), limit=5, index=index
+        )
         for error in errors:
-            if 'error' not in error:  # 排除解析错误
-                error['sessionFile'] = session_file.name
-                error['agentId'] = agent_id
-
-                # 标记是否为归档文件
-                error['isArchived'] = '.deleted.' in session_file.name
-
-                # 获取工具调用链
-                if error.get('turnIndex'):
-                    error['toolChain'] = get_tool_call_chain(
-                        session_file,
-                        error['turnIndex'],
-                        limit=5
-                    )
-
-                all_errors.append(error)
-
-                # 统计
-                error_summary['total'] += 1
-                et = error.get('errorType', 'unknown')
-                error_summary['byType'][et] = error_summary['byType'].get(et, 0) + 1
-                es = error.get('severity', 'medium')
-                error_summary['bySeverity'][es] = error_summary['bySeverity'].get(es, 0) + 1
+            with_suggestions(error)
+            error['sessionFile'] = session_file.name
+            error['agentId'] = agent_id
+
+            # 标记是否为归档文件
+            error['isArchived'] = '.deleted.' in session_file.name
+
+            if error.get('turnIndex'):
+                error['toolChain'] = chains.get(error['turnIndex'], [])
+
+            all_errors.append(error)
+
+            # 统计
+            error_summary['total'] += 1
+            et = error.get('errorType', 'unknown')
+            error_summary['byType'][et] = error_summary['byType'].get(et, 0) + 1
+            es = error.get('severity', 'medium')
+            error_summary['bySeverity'][es] = error_summary['bySeverity'].get(es, 0) + 1
 
     return {
         'agentId': agent_id,
@@ -379,13 +473,35 @@ def analyze_agent_errors(agent_id: str, session_limit: int = 5) -> Dict[str, Any
     }
 
 
+def sync_error_index() -> Tuple[Any, Dict[str, List[Path]]]:
+    """
+    一次同步全部 Agent 的 session 文件到错误索引（新文件一次性分片到进程池），并删除已消失文件的条目。
+
+    Returns:
+        (错误索引, {agent_id: session 文件})
+    """
+    from data.error_index import get_error_index
+
+    index = get_error_index()
+    agents_dir = get_openclaw_root() / "agents"
+    files_by_agent: Dict[str, List[Path]] = {}
+    if agents_dir.exists():
+        for d in agents_dir.iterdir():
+            if not d.is_dir():
+                continue
+            sessions_dir = agents_dir / normalize_openclaw_agent_id(d.name) / "sessions"
+            if sessions_dir.exists():
+                files_by_agent[d.name] = _select_session_files(sessions_dir)
+    index.sync([f for files in files_by_agent.values() for f in files], prune_under=agents_dir)
+    return index, files_by_agent
+
+
 def analyze_all_agents_errors() -> Dict[str, Any]:
     """分析所有 Agent 的错误"""
-    agents_dir = get_openclaw_root() / "agents"
-    if not agents_dir.exists():
+    if not (get_openclaw_root() / "agents").exists():
         return {'agents': [], 'globalSummary': {}}
 
-    agent_ids = [d.name for d in agents_dir.iterdir() if d.is_dir()]
+    index, files_by_agent = sync_error_index()
 
     all_results = []
     global_summary = {
@@ -395,8 +511,8 @@ def analyze_all_agents_errors() -> Dict[str, Any]:
         'bySeverity': {},
     }
 
-    for agent_id in agent_ids:
-        result = analyze_agent_errors(agent_id, session_limit=3)
+    for agent_id, session_files in files_by_agent.items():
+        result = _collect_agent_errors(agent_id, session_files, index)
         if result.get('errors'):
             all_results.append(result)
 
@@ -418,19 +534,64 @@ def analyze_all_agents_errors() -> Dict[str, Any]:
     }
 
 
+def query_error_page(
+    agent: Optional[str] = None,
+    error_type: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    before: Optional[Tuple[int, str]] = None,
+    limit: int = 100,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, str]], List[Tuple[str, str, str, int]]]:
+    """
+    按条件从错误索引取一页错误（时间倒序），只为本页错误读取工具调用链。
+
+    Returns:
+        (本页错误, 下一页游标 (ts_ms, id) 或 None, [(Agent, errorType, 严重程度, 条数)] 全部命中的汇总)
+    """
+    index, _ = sync_error_index()
+    rows = index.query_errors(agent, error_type, since, until, before, limit + 1)
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    turns_by_path: Dict[str, set] = {}
+    for _, path, _, _, _, error in rows:
+        if error.get('turnIndex'):
+            turns_by_path.setdefault(path, set()).add(error['turnIndex'])
+    chains = {
+        path: get_tool_call_chains(Path(path), sorted(turns), limit=5, index=index)
+        for path, turns in turns_by_path.items()
+    }
+
+    errors = []
+    for uid, path, agent_id, ts_ms, archived, error in rows:
+        with_suggestions(error)
+        error['id'] = uid
+        error['sessionFile'] = Path(path).name
+        error['agentId'] = agent_id
+        error['isArchived'] = bool(archived)
+        if error.get('turnIndex'):
+            error['toolChain'] = chains.get(path, {}).get(error['turnIndex'], [])
+        errors.append(error)
+    next_cursor = (rows[-1][3], rows[-1][0]) if more and rows else None
+    return errors, next_cursor, index.error_counts(agent, error_type, since, until)
+
+
 def get_error_detail(agent_id: str, session_file: str, turn_index: int) -> Optional[Dict[str, Any]]:
-    """获取单个错误的详细信息"""
+    """获取单个错误的详细信息（按错误索引定位，不从头读取文件）"""
+    from data.error_index import get_error_index
+
     aid = normalize_openclaw_agent_id(agent_id)
     session_path = get_openclaw_root() / "agents" / aid / "sessions" / session_file
     if not session_path.exists():
         return None
 
-    errors = parse_session_for_errors(session_path)
-    for error in errors:
-        if error.get('turnIndex') == turn_index:
-            error['agentId'] = agent_id
-            error['sessionFile'] = session_file
-            error['toolChain'] = get_tool_call_chain(session_path, turn_index, limit=10)
-            return error
-
-    return None
+    index = get_error_index()
+    index.sync([session_path])
+    errors = index.errors(session_path, turn_index=turn_index)
+    if not errors:
+        return None
+    error = with_suggestions(errors[0])
+    error['agentId'] = agent_id
+    error['sessionFile'] = session_file
+    error['toolChain'] = get_tool_call_chains(session_path, [turn_index], limit=10, index=index).get(turn_index, [])
+    return error
@@ -0,0 +1,219 @@
+"""
+Session 错误聚类 - 按 (类型, 文案签名) 聚合 stopReason=error 的消息
+
+- 由 data.error_rollup_feed 按错误索引（data.error_index）的新增行写入，不单独读取文件
+- 内存中每簇只保留汇总：计数、受影响 Agent / 模型、首末出现时间与一条样例；成员本身只存于错误索引，按簇分页查询
+- 文件重写 / 删除时记下该文件涉及的簇，错误索引更新后按索引重算这些簇的汇总
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.error_classifier import error_signature
+
+# 样例保留的文案长度
+MEMBER_MESSAGE_CHARS = 300
+
+# (成员 id, 时间戳毫秒, Agent, 类型, 模型, 文案)
+Member = Tuple[str, int, str, str, str, str]
+
+
+def cluster_id_of(error_type: str, signature: str) -> str:
+    raw = f"{error_type}\0{signature}".encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+@dataclass
+class _Cluster:
+    id: str
+    type: str
+    signature: str
+    count: int = 0
+    agents: Counter = field(default_factory=Counter)
+    models: Counter = field(default_factory=Counter)
+    first_seen: int = 0
+    last_seen: int = 0
+    exemplar: Optional[Member] = None
+
+    def add(self, member: Member) -> None:
+        _, ts, agent, _, model, _ = member
+        self.count += 1
+        self.agents[agent] += 1
+        if model:
+            self.models[model] += 1
+        if self.exemplar is None or ts >= self.last_seen:
+            self.exemplar = member
+        self.first_seen = ts if self.count == 1 else min(self.first_seen, ts)
+        self.last_seen = max(self.last_seen, ts)
+
+    def as_dict(self) -> Dict[str, Any]:
+        exemplar = self.exemplar
+        return {
+            "id": self.id,
+            "type": self.type,
+            "signature": self.signature,
+            "count": self.count,
+            "agents": dict(self.agents.most_common()),
+            "models": dict(self.models.most_common()),
+            "firstSeen": self.first_seen,
+            "lastSeen": self.last_seen,
+            "exemplar": _member_dict(exemplar) if exemplar is not None else None,
+        }
+
+
+def _member_dict(member: Member) -> Dict[str, Any]:
+    member_id, ts, agent, error_type, model, message = member
+    return {
+        "id": member_id,
+        "agentId": agent,
+        "type": error_type,
+        "model": model,
+        "message": (message or "")[:MEMBER_MESSAGE_CHARS] or "(无详情)",
+        "timestamp": ts,
+    }
+
+
+def _aggregate(rows: List[Tuple[str, str, str, int, int, int]]) -> Dict[str, Tuple[int, Counter, Counter, int, int]]:
+    """cluster_counts 的行 -> {簇 id: (条数, Agent 计数, 模型计数, 最早, 最近)}"""
+    out: Dict[str, list] = {}
+    for cid, agent, model, n, first, last in rows:
+        agg = out.get(cid)
+        if agg is None:
+            agg = out[cid] = [0, Counter(), Counter(), first, last]
+        agg[0] += n
+        agg[1][agent] += n
+        if model:
+            agg[2][model] += n
+        agg[3], agg[4] = min(agg[3], first), max(agg[4], last)
+    return {cid: tuple(agg) for cid, agg in out.items()}
+
+
+class ErrorClusterTable:
+    """错误簇汇总表（线程安全）；成员查询与按时间窗计数经错误索引"""
+
+    def __init__(self) -> None:
+        self._clusters: Dict[str, _Cluster] = {}
+        # origin（文件）-> 涉及的簇；撤回时这些簇待按索引重算
+        self._origins: Dict[str, Set[str]] = {}
+        self._stale: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add_members(self, origin: str, members: List[Tuple[str, str, int, str, str, str, str]]) -> None:
+        """members: [(簇 id, 成员 id, 时间戳, Agent, 类型, 模型, 完整文案)]（簇 id 由错误索引写入时算出）"""
+        with self._lock:
+            touched = self._origins.setdefault(origin, set())
+            for cid, member_id, ts, agent, error_type, model, message in members:
+                cluster = self._clusters.get(cid)
+                if cluster is None:
+                    cluster = self._clusters[cid] = _Cluster(cid, error_type, error_signature(message))
+                cluster.add((member_id, ts, agent, error_type, model, message[:MEMBER_MESSAGE_CHARS]))
+                touched.add(cid)
+
+    def retract(self, origin: str) -> None:
+        """标记 origin 涉及的簇待重算（错误索引中该文件的旧行已删除）"""
+        with self._lock:
+            self._stale |= self._origins.pop(origin, set())
+
+    def refresh(self, index: Any) -> int:
+        """按错误索引重算待重算簇的汇总与样例；没有剩余成员的簇删除。返回重算的簇数"""
+        with self._lock:
+            stale, self._stale = list(self._stale), set()
+        if not stale:
+            return 0
+        aggregates = _aggregate(index.cluster_counts(stale))
+        exemplars = {cid: index.cluster_members(cid, limit=1) for cid in aggregates}
+        with self._lock:
+            for cid in stale:
+                agg = aggregates.get(cid)
+                cluster = self._clusters.get(cid)
+                if agg is None:
+                    self._clusters.pop(cid, None)
+                    continue
+                if cluster is None:
+                    continue
+                cluster.count, cluster.agents, cluster.models, cluster.first_seen, cluster.last_seen = agg
+                top = exemplars[cid]
+                cluster.exemplar = tuple(top[0]) if top else None
+        return len(stale)
+
+    def clusters(
+        self,
+        agent: Optional[str] = None,
+        error_type: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        index: Any = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按最近出现时间倒序。不带时间窗时为全部成员的汇总；带 since / until 时计数、Agent、模型与首末时间
+        只统计窗口内的成员（经错误索引），样例仍为簇内最近一条
+        """
+        windowed = since is not None or until is not None
+        window = _aggregate(index.cluster_counts(None, since, until)) if windowed else None
+        out = []
+        with self._lock:
+            for c in self._clusters.values():
+                if error_type is not None and c.type != error_type:
+                    continue
+                row = c.as_dict()
+                if window is not None:
+                    agg = window.get(c.id)
+                    if agg is None:
+                        continue
+                    count, agents, models, first, last = agg
+                    row.update(
+                        count=count, agents=dict(agents.most_common()), models=dict(models.most_common()),
+                        firstSeen=first, lastSeen=last,
+                    )
+                if agent is None or agent in row["agents"]:
+                    out.append(row)
+        out.sort(key=lambda c: (c["lastSeen"], c["id"]), reverse=True)
+        return out
+
+    def summary(self, cluster_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cluster = self._clusters.get(cluster_id)
+            return cluster.as_dict() if cluster is not None else None
+
+    def members(
+        self,
+        cluster_id: str,
+        index: Any,
+        agent: Optional[str] = None,
+        before: Optional[Tuple[int, str]] = None,
+        limit: int = 50,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """簇成员一页（时间倒序，经错误索引）；簇不存在时为 None"""
+        with self._lock:
+            if cluster_id not in self._clusters:
+                return None
+        return [_member_dict(m) for m in index.cluster_members(cluster_id, agent, before, limit)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clusters": len(self._clusters),
+                "members": sum(c.count for c in self._clusters.values()),
+            }
+
+
+_table_instance: Optional[ErrorClusterTable] = None
+_table_lock = threading.Lock()
+
+
+def get_error_cluster_table() -> ErrorClusterTable:
+    global _table_instance
+    with _table_lock:
+        if _table_instance is None:
+            _table_instance = ErrorClusterTable()
+        return _table_instance
+
+
+def reset_error_cluster_table_for_tests() -> None:
+    global _table_instance
+    with _table_lock:
+        _table_instance = None
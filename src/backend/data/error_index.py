@@ -0,0 +1,386 @@
+"""
+Session 错误索引 - 每个 session 文件中错误发生的轮次、字节偏移、时间、类型与严重程度
+
+- 按字节偏移增量维护：文件追加时只扫描新增的完整行，截断或重写时重建该文件
+- 同时记录含工具调用的行偏移，错误详情与工具调用链直接 seek 定位，不再从头读取
+- 存储为 SQLite（Dashboard 数据目录 error_index.db），重启后已索引的文件无需重新解析
+- 错误行带唯一 id（Agent + 文件 + 字节偏移）、毫秒时间戳、中心分类与错误簇 id，供错误时间序列 / 错误簇按行 id 增量消费；
+  文件每次从头重建换一个新的 gen，消费方据此撤回旧计数。错误簇成员只存于此表，按簇分页查询
+- 表结构版本记在 PRAGMA user_version，不一致时丢弃重建
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from core.error_classifier import classify_center_error, error_signature
+from data.error_analyzer import scan_session_errors
+from data.error_clusters import cluster_id_of
+from data.session_manifest import is_session_jsonl
+from data.task_history import DASHBOARD_DATA_DIR
+from utils.jsonl_tail import is_rewritten
+
+ERROR_INDEX_DB_PATH = DASHBOARD_DATA_DIR / "error_index.db"
+SCHEMA_VERSION = 3
+
+# error_events_since 的行：(文件, 唯一 id, Agent, 时间戳毫秒, 中心分类, 模型, 文案, 错误簇 id)
+ErrorEvent = Tuple[str, str, str, int, str, str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    offset INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    gen INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    turn_index INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    timestamp,
+    ts_ms INTEGER NOT NULL,
+    error_type TEXT,
+    severity TEXT,
+    center_type TEXT,
+    cluster_id TEXT,
+    model TEXT,
+    archived INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_errors_path_turn ON errors (path, turn_index);
+CREATE INDEX IF NOT EXISTS idx_errors_ts ON errors (ts_ms, uid);
+CREATE INDEX IF NOT EXISTS idx_errors_agent_ts ON errors (agent_id, ts_ms);
+CREATE INDEX IF NOT EXISTS idx_errors_cluster ON errors (cluster_id, ts_ms, uid);
+CREATE TABLE IF NOT EXISTS tool_lines (
+    path TEXT NOT NULL,
+    turn_index INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (path, turn_index)
+);
+"""
+
+
+def _ts_column(value: Any) -> Any:
+    return value if isinstance(value, (int, float, str)) and not isinstance(value, bool) else None
+
+
+class ErrorOccurrenceIndex:
+    """session 错误 / 工具调用行的持久化索引（SQLite，线程安全）"""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        if str(db_path) != ":memory:":
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS errors; DROP TABLE IF EXISTS tool_lines;"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self._gen = self._conn.execute("SELECT COALESCE(MAX(gen), 0) FROM files").fetchone()[0]
+        self.bytes_scanned = 0
+
+    def _drop_file(self, path: str) -> None:
+        self._conn.execute("DELETE FROM errors WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM tool_lines WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _store_scan(self, path: str, size: int, mtime: float, start: int, scan, gen: Optional[int] = None) -> None:
+        """写入扫描结果；gen 为空（从头扫描）时分配新的 gen"""
+        errors, tool_lines, consumed, turns = scan
+        if gen is None:
+            self._gen += 1
+            gen = self._gen
+        p = Path(path)
+        agent_id = p.parent.parent.name
+        archived = 0 if is_session_jsonl(p.name) else 1
+        rows = []
+        prev_offset, n = None, 0
+        for offset, ts_ms, e in errors:
+            # 同一行的第 n 个错误（如多个失败的 toolResult）
+            n = n + 1 if offset == prev_offset else 0
+            prev_offset = offset
+            uid = f"session-{agent_id}-{p.name}-{offset}" + (f"-{n}" if n else "")
+            center_type = cluster_id = None
+            if e.get('stopReason') == 'error':
+                message = e.get('rawMessage') or ''
+                center_type = classify_center_error(message)
+                cluster_id = cluster_id_of(center_type, error_signature(message))
+            rows.append((
+                uid, path, agent_id, e.get('turnIndex', 0), offset, _ts_column(e.get('timestamp')), ts_ms,
+                e.get('errorType'), e.get('severity'), center_type, cluster_id, e.get('model') or '', archived,
+                json.dumps(e, ensure_ascii=False),
+            ))
+        self._conn.executemany(
+            "INSERT INTO errors (uid, path, agent_id, turn_index, offset, timestamp, ts_ms,"
+            " error_type, severity, center_type, cluster_id, model, archived, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO tool_lines (path, turn_index, offset) VALUES (?, ?, ?)",
+            [(path, turn, offset) for turn, offset in tool_lines],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime, offset, turns, gen) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime, start + consumed, turns, gen),
+        )
+        self.bytes_scanned += consumed
+
+    def _prune(self, root: Path, keep: Set[str]) -> None:
+        """删除 root 下已不在文件清单中的条目"""
+        prefix = str(root).rstrip(os.sep) + os.sep
+        for (path,) in self._conn.execute("SELECT path FROM files").fetchall():
+            if path.startswith(prefix) and path not in keep:
+                self._drop_file(path)
+
+    def sync(self, paths: Sequence[Any], prune_under: Optional[Path] = None) -> None:
+        """
+        把给定文件的索引更新到当前内容；新文件经进程池并行扫描。
+        prune_under 非空时 paths 视为该目录下的完整清单，清单外的已索引文件一并删除。
+        """
+        from data.parallel_scan import map_files
+
+        with self._lock:
+            cold: List[Tuple[str, int, float]] = []
+            with self._conn:
+                if prune_under is not None:
+                    self._prune(prune_under, {str(p) for p in paths})
+                for p in paths:
+                    key = str(p)
+                    try:
+                        st = os.stat(key)
+                    except OSError:
+                        self._drop_file(key)
+                        continue
+                    row = self._conn.execute(
+                        "SELECT size, mtime, offset, turns, gen FROM files WHERE path = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        size, mtime, offset, turns, gen = row
+                        if is_rewritten(st.st_size, st.st_mtime, offset, size, mtime):
+                            # 截断 / 原地重写：重建
+                            self._drop_file(key)
+                            row = None
+                        elif st.st_size == offset:
+                            if st.st_mtime != mtime:
+                                self._conn.execute(
+                                    "UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                                    (st.st_size, st.st_mtime, key),
+                                )
+                            continue
+                    if row is None:
+                        cold.append((key, st.st_size, st.st_mtime))
+                        continue
+                    scan = scan_session_errors(key, offset, turns)
+                    if scan is not None:
+                        self._store_scan(key, st.st_size, st.st_mtime, offset, scan, gen)
+            if not cold:
+                return
+            results = map_files(scan_session_errors, [(key, 0, 0) for key, _, _ in cold])
+            with self._conn:
+                for (key, size, mtime), scan in zip(cold, results):
+                    if scan is not None:
+                        self._store_scan(key, size, mtime, 0, scan)
+
+    def errors(self, path: Any, turn_index: Optional[int] = None) -> List[Dict[str, Any]]:
+        """文件中的错误（按出现顺序）；turn_index 非空时只取该轮次"""
+        sql = "SELECT data FROM errors WHERE path = ?"
+        args: List[Any] = [str(path)]
+        if turn_index is not None:
+            sql += " AND turn_index = ?"
+            args.append(turn_index)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id", args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def error_events_since(self, last_id: int) -> Tuple[Dict[str, int], List[ErrorEvent], int]:
+        """
+        id 大于 last_id 的 stopReason=error 行（不含归档文件），按 id 升序。
+
+        Returns:
+            ({文件: gen}, 新增行, 当前最大行 id)；同一快照内读取，gen 变化或消失的文件须先撤回
+        """
+        with self._lock:
+            gens = dict(self._conn.execute("SELECT path, gen FROM files").fetchall())
+            rows = self._conn.execute(
+                "SELECT path, uid, agent_id, ts_ms, center_type, model, data, cluster_id FROM errors"
+                " WHERE id > ? AND center_type IS NOT NULL AND archived = 0 ORDER BY id",
+                (last_id,),
+            ).fetchall()
+            max_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM errors").fetchone()[0]
+        events = [
+            (path, uid, agent_id, ts_ms, center_type, model, json.loads(data).get('rawMessage') or '', cluster_id)
+            for path, uid, agent_id, ts_ms, center_type, model, data, cluster_id in rows
+        ]
+        return gens, events, max(last_id, max_id)
+
+    def cluster_counts(
+        self,
+        cluster_ids: Optional[Sequence[str]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> List[Tuple[str, str, str, int, int, int]]:
+        """
+        错误簇成员按 (簇, Agent, 模型) 的汇总：[(簇 id, Agent, 模型, 条数, 最早, 最近)]；
+        cluster_ids 为空时不限簇，since / until 限定时间窗
+        """
+        where, args = self._filters(None, "center_type", None, since, until, True)
+        if cluster_ids is not None:
+            if not cluster_ids:
+                return []
+            where.append(f"cluster_id IN ({', '.join('?' * len(cluster_ids))})")
+            args.extend(cluster_ids)
+        sql = (
+            "SELECT cluster_id, agent_id, model, COUNT(*), MIN(ts_ms), MAX(ts_ms) FROM errors"
+            " WHERE " + " AND ".join(where) + " GROUP BY cluster_id, agent_id, model"
+        )
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def cluster_members(
+        self,
+        cluster_id: str,
+        agent: Optional[str] = None,
+        before: Optional[Tuple[int, str]] = None,
+        limit: int = 50,
+    ) -> List[Tuple[str, int, str, str, str, str]]:
+        """错误簇成员一页（时间倒序）：[(唯一 id, 时间戳毫秒, Agent, 中心分类, 模型, 文案)]"""
+        where, args = self._filters(agent, "center_type", None, None, None, True)
+        where.append("cluster_id = ?")
+        args.append(cluster_id)
+        if before is not None:
+            where.append("(ts_ms < ? OR (ts_ms = ? AND uid < ?))")
+            args.extend([before[0], before[0], before[1]])
+        sql = (
+            "SELECT uid, ts_ms, agent_id, center_type, model, data FROM errors WHERE "
+            + " AND ".join(where) + " ORDER BY ts_ms DESC, uid DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, [*args, limit]).fetchall()
+        return [
+            (uid, ts, agent_id, center_type, model or '', json.loads(data).get('rawMessage') or '')
+            for uid, ts, agent_id, center_type, model, data in rows
+        ]
+
+    @staticmethod
+    def _filters(
+        agent: Optional[str],
+        type_column: str,
+        error_type: Optional[str],
+        since: Optional[int],
+        until: Optional[int],
+        center_only: bool,
+    ) -> Tuple[List[str], List[Any]]:
+        where: List[str] = []
+        args: List[Any] = []
+        if center_only:
+            where.append("center_type IS NOT NULL AND archived = 0")
+        if agent:
+            where.append("agent_id = ?")
+            args.append(agent)
+        if error_type:
+            where.append(f"{type_column} = ?")
+            args.append(error_type)
+        if since is not None:
+            where.append("ts_ms >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts_ms < ?")
+            args.append(until)
+        return where, args
+
+    def query_errors(
+        self,
+        agent: Optional[str] = None,
+        error_type: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        before: Optional[Tuple[int, str]] = None,
+        limit: int = 100,
+        center_only: bool = False,
+    ) -> List[Tuple[str, str, str, int, int, Dict[str, Any]]]:
+        """
+        按 (时间戳, 唯一 id) 倒序取一页错误：before 为上一页最后一条的 (ts_ms, uid)。
+        center_only 时只取 stopReason=error 的行（不含归档文件），error_type 按中心分类过滤，否则按 errorType。
+
+        Returns:
+            [(唯一 id, 文件, Agent, 时间戳毫秒, 是否归档, 错误)]
+        """
+        where, args = self._filters(
+            agent, "center_type" if center_only else "error_type", error_type, since, until, center_only
+        )
+        if before is not None:
+            where.append("(ts_ms < ? OR (ts_ms = ? AND uid < ?))")
+            args.extend([before[0], before[0], before[1]])
+        sql = "SELECT uid, path, agent_id, ts_ms, archived, data FROM errors"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY ts_ms DESC, uid DESC LIMIT ?", [*args, limit]).fetchall()
+        return [(uid, path, agent_id, ts, archived, json.loads(data)) for uid, path, agent_id, ts, archived, data in rows]
+
+    def error_counts(
+        self,
+        agent: Optional[str] = None,
+        error_type: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> List[Tuple[str, str, str, int]]:
+        """按 (Agent, errorType, 严重程度) 汇总的错误数"""
+        where, args = self._filters(agent, "error_type", error_type, since, until, False)
+        sql = "SELECT agent_id, error_type, severity, COUNT(*) FROM errors"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            return self._conn.execute(sql + " GROUP BY agent_id, error_type, severity", args).fetchall()
+
+    def tool_call_lines(self, path: Any) -> List[Tuple[int, int]]:
+        """含工具调用的行：[(轮次, 字节偏移)]，按轮次升序"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT turn_index, offset FROM tool_lines WHERE path = ? ORDER BY turn_index",
+                (str(path),),
+            ).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            errors = self._conn.execute("SELECT COUNT(*) FROM errors").fetchone()[0]
+        return {'files': files, 'errors': errors, 'bytesScanned': self.bytes_scanned}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_index_instance: Optional[ErrorOccurrenceIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_error_index() -> ErrorOccurrenceIndex:
+    global _index_instance
+    with _index_lock:
+        if _index_instance is None:
+            _index_instance = ErrorOccurrenceIndex(ERROR_INDEX_DB_PATH)
+        return _index_instance
+
+
+def reset_error_index_for_tests(index: Optional[ErrorOccurrenceIndex] = None) -> None:
+    """测试用：替换为给定实例（默认内存库）"""
+    global _index_instance
+    with _index_lock:
+        if _index_instance is not None and _index_instance is not index:
+            _index_instance.close()
+        _index_instance = index if index is not None else ErrorOccurrenceIndex(Path(":memory:"))
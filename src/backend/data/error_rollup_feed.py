@@ -0,0 +1,139 @@
+"""
+错误时间序列的数据来源同步 - 把 session 错误与 model-failures.log 增量计入 core.error_rollups，
+session 错误同时写入错误簇表（data.error_clusters）
+
+- session 错误不单独读取文件：同步错误索引（data.error_index）后按行 id 消费新增的 stopReason=error 行
+- 索引中文件从头重建（截断 / 重写）时 gen 变化，文件删除时条目消失：撤回该文件计入的全部错误
+- model-failures.log 复用 FailureLogTail 的增量解析，只计入新封闭的分节；未封闭分节单独记账、每次替换
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.error_rollups import ErrorRollups, Event, get_error_rollups
+from data.error_clusters import ErrorClusterTable, get_error_cluster_table
+
+
+class ErrorRollupFeed:
+    """各数据源到 ErrorRollups 的增量同步状态（线程安全）"""
+
+    def __init__(self, rollups: ErrorRollups, clusters: ErrorClusterTable) -> None:
+        self.rollups = rollups
+        self.clusters = clusters
+        # 已消费到的错误索引行 id 与各文件的 gen
+        self._last_id = 0
+        self._gens: Dict[str, int] = {}
+        self._failure_logs: Dict[str, Tuple[int, int]] = {}
+        self._failure_tails: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.rows_fed = 0
+
+    def _retract_session(self, path: str) -> None:
+        self.rollups.retract('session:' + path)
+        self.clusters.retract('session:' + path)
+
+    def sync_sessions(self, index: Any) -> None:
+        """index 为已同步的 data.error_index.ErrorOccurrenceIndex"""
+        gens, events, max_id = index.error_events_since(self._last_id)
+        for path, gen in self._gens.items():
+            if gens.get(path) != gen:
+                self._retract_session(path)
+        by_path: Dict[str, List[Any]] = {}
+        for event in events:
+            by_path.setdefault(event[0], []).append(event)
+        for path, rows in by_path.items():
+            origin = 'session:' + path
+            self.rollups.add_events(
+                origin,
+                [(ts, ('session', agent_id, err_type, model)) for _, _, agent_id, ts, err_type, model, _, _ in rows],
+            )
+            self.clusters.add_members(
+                origin,
+                [
+                    (cid, uid, ts, agent_id, err_type, model, message)
+                    for _, uid, agent_id, ts, err_type, model, message, cid in rows
+                ],
+            )
+        # 撤回文件涉及的簇按更新后的索引重算
+        self.clusters.refresh(index)
+        self._gens = gens
+        self._last_id = max_id
+        self.rows_fed += len(events)
+
+    @staticmethod
+    def _failure_event(entry: Dict[str, Any]) -> Event:
+        return (
+            int(entry.get('timestamp') or 0),
+            ('model', '', entry.get('error_type') or 'unknown', entry.get('model') or ''),
+        )
+
+    def sync_failure_logs(self, tail: Any) -> None:
+        """tail 为已同步的 status.error_detector.FailureLogTail"""
+        changes = tail.changes(self._failure_logs)
+        for path in [p for p in self._failure_logs if p not in changes]:
+            del self._failure_logs[path]
+            self._failure_tails.pop(path, None)
+            self.rollups.retract('model:' + path)
+            self.rollups.retract('model-tail:' + path)
+        for path, (generation, parsed, entries, open_entry) in changes.items():
+            previous = self._failure_logs.get(path)
+            if previous is not None and previous[0] != generation:
+                self.rollups.retract('model:' + path)
+            self._failure_logs[path] = (generation, parsed)
+            if entries:
+                self.rollups.add_events('model:' + path, [self._failure_event(e) for e in entries])
+            if self._failure_tails.get(path) != open_entry:
+                self.rollups.retract('model-tail:' + path)
+                self._failure_tails[path] = open_entry
+                if open_entry is not None:
+                    self.rollups.add_events('model-tail:' + path, [self._failure_event(open_entry)])
+
+    def sync(self) -> ErrorRollups:
+        from data.error_analyzer import sync_error_index
+        from status.error_detector import sync_failure_logs
+
+        index, _ = sync_error_index()
+        tail = sync_failure_logs()
+        with self._lock:
+            self.sync_sessions(index)
+            self.sync_failure_logs(tail)
+        return self.rollups
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        """只含框架错误的分桶；session 错误启动后从持久化的错误索引重新计入，model-failures.log 重新增量解析"""
+        return {'framework': self.rollups.export_framework()}
+
+    def restore_snapshot(self, data: Dict[str, Any]) -> int:
+        return self.rollups.restore_framework(data.get('framework') or {})
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'sessionFiles': len(self._gens),
+                'failureLogs': len(self._failure_logs),
+                'rowsFed': self.rows_fed,
+            }
+
+
+_feed_instance: Optional[ErrorRollupFeed] = None
+_feed_lock = threading.Lock()
+
+
+def get_error_rollup_feed() -> ErrorRollupFeed:
+    global _feed_instance
+    with _feed_lock:
+        if _feed_instance is None:
+            _feed_instance = ErrorRollupFeed(get_error_rollups(), get_error_cluster_table())
+        return _feed_instance
+
+
+def sync_error_rollups() -> ErrorRollups:
+    """把 session 错误与 model-failures.log 增量同步到错误时间序列"""
+    return get_error_rollup_feed().sync()
+
+
+def reset_error_rollup_feed_for_tests() -> None:
+    global _feed_instance
+    with _feed_lock:
+        _feed_instance = None
@@ -0,0 +1,84 @@
+"""
+Session 冷扫描并行执行器 - 按文件分片到进程池，子进程内完成纯解析，主进程合并
+
+- 工作进程数：OPENCLAW_SCAN_WORKERS（0 = CPU 核数，1 = 串行）
+- 只负责冷扫描的分片；增量进度由各调用方按文件偏移自行维护
+- 进程池不可用时自动回退串行，不影响结果
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from core.config_fortify import get_fortify_config
+from core.error_handler import record_error
+
+# 待解析文件少于该数目时直接串行（进程间传输开销不划算）
+MIN_PARALLEL_FILES = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_scan_workers() -> int:
+    """生效的扫描工作进程数"""
+    n = get_fortify_config().scan_workers
+    if n <= 0:
+        n = os.cpu_count() or 1
+    return max(1, n)
+
+
+def _get_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers == workers:
+            return _pool
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        try:
+            # spawn：避免在含后台线程（watcher / 探针）的进程里 fork
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        except Exception as e:
+            record_error("unknown", str(e), "parallel_scan:pool_start", exc=e)
+            _pool = None
+        return _pool
+
+
+def shutdown_scan_pool() -> None:
+    """关闭进程池（应用退出时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def map_files(fn: Callable[..., Any], args: Sequence[Tuple[Any, ...]]) -> List[Any]:
+    """
+    对每组参数执行 fn（须为模块级函数，可被 pickle），保持输入顺序返回结果。
+    文件数达到阈值且 workers > 1 时分片到进程池，否则串行。
+    """
+    workers = min(get_scan_workers(), len(args))
+    if workers > 1 and len(args) >= MIN_PARALLEL_FILES:
+        pool = _get_pool(get_scan_workers())
+        if pool is not None:
+            try:
+                chunksize = max(1, len(args) // (workers * 4))
+                return list(pool.map(fn, *zip(*args), chunksize=chunksize))
+            except Exception as e:
+                # BrokenProcessPool 等：回退串行
+                record_error("unknown", str(e), "parallel_scan:map_files", exc=e)
+                shutdown_scan_pool()
+    return [fn(*a) for a in args]
+
+
+def reset_parallel_scan_for_tests() -> None:
+    shutdown_scan_pool()
@@ -0,0 +1,273 @@
+"""
+子任务 run 的 session 解析缓存 - 按 childSessionKey 缓存子任务 / 时间线等派生结果
+
+- 运行中的 run：记录字节偏移，只解析新增的完整行；读文件不持全局锁，返回结果快照
+- 已结束的 run：结果冻结，不再访问 session 文件，并落盘到 Dashboard 数据目录，重启后仍有效
+- 落盘合并进行：变更只标脏，FLUSH_DELAY_SEC 后（或关闭时 flush）整文件写一次
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from core.error_handler import record_error
+from data.task_history import DASHBOARD_DATA_DIR
+from utils.jsonl_tail import AppendedLines
+
+RUN_CACHE_PATH = DASHBOARD_DATA_DIR / "run_session_cache.json"
+# 最多冻结保存的 run 数（更早的 run 再次访问时重新解析一次）；须大于单次任务列表涉及的 run 数
+MAX_FROZEN_RUNS = 2000
+# 标脏后延迟落盘的秒数：一次请求内冻结的多个 run 合并为一次写入
+FLUSH_DELAY_SEC = 2.0
+# 空的一次性结果（尚无输出 / 文件）只在内存中保留的秒数，之后重新计算
+EMPTY_EXTRA_RETRY_SEC = 60.0
+
+
+@dataclass
+class RunDigest:
+    """单个 run 的增量解析状态"""
+    path: Optional[str] = None
+    offset: int = 0
+    size: int = 0
+    mtime: float = 0.0
+    subtasks: List[Dict[str, Any]] = field(default_factory=list)
+    seen_tasks: Set[str] = field(default_factory=set)
+    timeline: List[Dict[str, Any]] = field(default_factory=list)
+    frozen: bool = False
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'subtasks': self.subtasks, 'timeline': self.timeline}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "RunDigest":
+        subtasks = data.get('subtasks') or []
+        return cls(
+            subtasks=subtasks,
+            seen_tasks={s.get('task', '') for s in subtasks if isinstance(s, dict)},
+            timeline=data.get('timeline') or [],
+            frozen=True,
+        )
+
+
+LineFeeder = Callable[[RunDigest, str], None]
+
+
+def _feed_appended(digest: RunDigest, feed_line: LineFeeder) -> None:
+    """从 digest.offset 起解析新增完整行；末行未写完时留待下次"""
+    with open(digest.path, 'rb') as f:
+        lines = AppendedLines(f, digest.offset)
+        for _, raw in lines:
+            feed_line(digest, raw.decode('utf-8', errors='replace'))
+    digest.offset = lines.end
+
+
+class RunSessionCache:
+    """run 级 session 解析缓存（线程安全）"""
+
+    def __init__(self, persist_path: Optional[Path] = None) -> None:
+        self.persist_path = persist_path
+        self._runs: "OrderedDict[str, RunDigest]" = OrderedDict()
+        # 已结束 run 的一次性结果（如 output / generatedFiles）：key -> {name: value}
+        self._extras: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 空的一次性结果：(key, name) -> (过期时刻 monotonic 秒, 值)
+        self._empty_extras: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        # 未冻结 run 的解析锁：同一 run 的增量解析串行，不同 run 互不阻塞
+        self._run_locks: Dict[str, threading.Lock] = {}
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self.file_reads = 0
+        self.saves = 0
+
+    def _load(self) -> None:
+        self._loaded = True
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, value in (data.get('runs') or {}).items():
+                if isinstance(value, dict):
+                    self._runs[key] = RunDigest.from_json(value)
+            for key, value in (data.get('extras') or {}).items():
+                if isinstance(value, dict):
+                    self._extras[key] = value
+        except (OSError, ValueError, AttributeError) as e:
+            record_error("parsing-error", str(e), "run_session_cache:load", exc=e)
+
+    def _mark_dirty(self) -> None:
+        """调用方持有 _lock：标脏并安排一次延迟落盘（裁剪也在落盘时进行）"""
+        if self.persist_path is None:
+            self._trim()
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(FLUSH_DELAY_SEC, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """有未落盘的变更时裁剪并整文件写入；序列化在锁内，写文件在锁外"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty or self.persist_path is None:
+                return
+            self._dirty = False
+            self._trim()
+            frozen = {k: d.to_json() for k, d in self._runs.items() if d.frozen}
+            payload = json.dumps({'version': 1, 'runs': frozen, 'extras': self._extras}, ensure_ascii=False)
+        with self._save_lock:
+            try:
+                self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.persist_path.with_suffix('.tmp')
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp, self.persist_path)
+                self.saves += 1
+            except OSError as e:
+                record_error("io-error", str(e), "run_session_cache:save", exc=e)
+
+    def cancel_flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _trim(self) -> None:
+        frozen_keys = [k for k, d in self._runs.items() if d.frozen]
+        for key in frozen_keys[: max(0, len(frozen_keys) - MAX_FROZEN_RUNS)]:
+            del self._runs[key]
+        while len(self._extras) > MAX_FROZEN_RUNS:
+            self._extras.popitem(last=False)
+
+    def get(
+        self,
+        child_session_key: str,
+        finished: bool,
+        resolve_path: Callable[[], Optional[Path]],
+        feed_line: LineFeeder,
+    ) -> Optional[RunDigest]:
+        """
+        返回 run 的解析结果；已冻结的直接返回，否则解析新增行，finished 时冻结。
+        session 文件无法解析时返回 None（不冻结，下次重试）。
+
+        全局锁只用于查找与登记；路径解析、stat 与读文件在锁外进行，同一 run 由 run 级锁串行。
+        未冻结的结果返回快照（列表浅拷贝），调用方读取时不受后续增量解析影响。
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            digest = self._runs.get(child_session_key)
+            if digest is not None and digest.frozen:
+                self._runs.move_to_end(child_session_key)
+                return digest
+            run_lock = self._run_locks.setdefault(child_session_key, threading.Lock())
+
+        with run_lock:
+            with self._lock:
+                digest = self._runs.get(child_session_key)
+                if digest is not None and digest.frozen:
+                    return digest
+            path = resolve_path()
+            if not path:
+                return None
+            key_path = str(path)
+            try:
+                st = os.stat(key_path)
+            except OSError:
+                return None
+            if digest is None or digest.path != key_path or st.st_size < digest.offset:
+                digest = RunDigest(path=key_path)
+            read = st.st_size > digest.offset
+            if read:
+                _feed_appended(digest, feed_line)
+            digest.size, digest.mtime = st.st_size, st.st_mtime
+
+            with self._lock:
+                self._runs[child_session_key] = digest
+                self._runs.move_to_end(child_session_key)
+                if read:
+                    self.file_reads += 1
+                if finished:
+                    digest.frozen = True
+                    self._run_locks.pop(child_session_key, None)
+                    self._mark_dirty()
+                    return digest
+                return RunDigest(
+                    path=digest.path,
+                    offset=digest.offset,
+                    size=digest.size,
+                    mtime=digest.mtime,
+                    subtasks=list(digest.subtasks),
+                    seen_tasks=set(digest.seen_tasks),
+                    timeline=list(digest.timeline),
+                )
+
+    def frozen_extra(self, child_session_key: str, name: str, compute: Callable[[], Any]) -> Any:
+        """
+        已结束 run 的一次性结果：非空结果缓存并落盘，之后不再访问 session 文件；
+        空结果（文件可能稍后才出现）只在内存中保留 EMPTY_EXTRA_RETRY_SEC 秒
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            values = self._extras.get(child_session_key)
+            if values is not None and name in values:
+                self._extras.move_to_end(child_session_key)
+                return values[name]
+            empty = self._empty_extras.get((child_session_key, name))
+            if empty is not None and time.monotonic() < empty[0]:
+                return empty[1]
+        value = compute()
+        with self._lock:
+            if value:
+                self._empty_extras.pop((child_session_key, name), None)
+                self._extras.setdefault(child_session_key, {})[name] = value
+                self._extras.move_to_end(child_session_key)
+                self._mark_dirty()
+            else:
+                now = time.monotonic()
+                if len(self._empty_extras) >= MAX_FROZEN_RUNS:
+                    self._empty_extras = {k: v for k, v in self._empty_extras.items() if v[0] > now}
+                self._empty_extras[(child_session_key, name)] = (now + EMPTY_EXTRA_RETRY_SEC, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'runs': len(self._runs),
+                'frozen': sum(1 for d in self._runs.values() if d.frozen),
+                'fileReads': self.file_reads,
+                'saves': self.saves,
+            }
+
+
+_cache_instance: Optional[RunSessionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_run_session_cache() -> RunSessionCache:
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = RunSessionCache(RUN_CACHE_PATH)
+        return _cache_instance
+
+
+def reset_run_session_cache_for_tests(persist_path: Optional[Path] = None) -> None:
+    """测试用：替换为新实例（默认不落盘）"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is not None:
+            _cache_instance.cancel_flush()
+        _cache_instance = RunSessionCache(persist_path)
@@ -0,0 +1,165 @@
+"""
+Session 文件计数索引 - 每个 jsonl 的消息数 / 工具调用数 / 错误数
+
+按字节偏移增量维护：文件追加时只解析新增的完整行，截断或重写时从头重算。
+任务进度估算等只需计数的场景不必再逐行解析整个文件。
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from core.error_handler import record_error
+from utils.data_repair import parse_session_jsonl_line
+from utils.jsonl_tail import AppendedLines, is_rewritten
+
+# 索引最多跟踪的文件数（LRU）
+MAX_TRACKED_FILES = 4096
+
+
+@dataclass
+class SessionCounters:
+    messages: int = 0
+    tool_calls: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {'messages': self.messages, 'toolCalls': self.tool_calls, 'errors': self.errors}
+
+
+@dataclass
+class _CounterState:
+    offset: int = 0
+    size: int = 0
+    mtime: float = 0.0
+    counters: Optional[SessionCounters] = None
+
+
+def _count_line(line: str, counters: SessionCounters) -> None:
+    envelope, msg = parse_session_jsonl_line(line)
+    if not envelope or envelope.get('type') != 'message' or msg is None:
+        return
+    counters.messages += 1
+    if msg.get('role') != 'assistant':
+        return
+    if msg.get('stopReason') == 'error':
+        counters.errors += 1
+    content = msg.get('content')
+    if isinstance(content, list):
+        counters.tool_calls += sum(
+            1 for c in content if isinstance(c, dict) and c.get('type') == 'toolCall'
+        )
+
+
+def _read_appended(path: str, offset: int, counters: SessionCounters) -> int:
+    """从 offset 起累加新增完整行，返回消费字节数；末行未写完时留待下次"""
+    with open(path, 'rb') as f:
+        lines = AppendedLines(f, offset)
+        for _, raw in lines:
+            _count_line(raw.decode('utf-8', errors='replace'), counters)
+    return lines.consumed
+
+
+class SessionCounterIndex:
+    """按文件路径维护增量计数（线程安全）"""
+
+    def __init__(self, max_files: int = MAX_TRACKED_FILES) -> None:
+        self.max_files = max_files
+        self._files: "OrderedDict[str, _CounterState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_parsed = 0
+
+    def get(self, path: Any) -> SessionCounters:
+        """返回文件当前计数（副本）；文件不可读时为全 0"""
+        key = str(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            with self._lock:
+                self._files.pop(key, None)
+            return SessionCounters()
+        with self._lock:
+            state = self._files.get(key)
+            if state is None:
+                state = self._files[key] = _CounterState()
+            self._files.move_to_end(key)
+            if state.counters is None or is_rewritten(
+                st.st_size, st.st_mtime, state.offset, state.size, state.mtime
+            ):
+                # 首次 / 截断 / 原地重写：从头重算
+                state.counters = SessionCounters()
+                state.offset = 0
+            if st.st_size > state.offset:
+                try:
+                    consumed = _read_appended(key, state.offset, state.counters)
+                except OSError as e:
+                    record_error("io-error", str(e), "session_counters:read", exc=e)
+                    consumed = 0
+                state.offset += consumed
+                self.bytes_parsed += consumed
+            state.size, state.mtime = st.st_size, st.st_mtime
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+            c = state.counters
+            return SessionCounters(c.messages, c.tool_calls, c.errors)
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'files': [
+                    {
+                        'path': key,
+                        'offset': st.offset,
+                        'size': st.size,
+                        'mtime': st.mtime,
+                        'counters': [st.counters.messages, st.counters.tool_calls, st.counters.errors],
+                    }
+                    for key, st in self._files.items()
+                    if st.counters is not None
+                ],
+            }
+
+    def restore_snapshot(self, data: Dict[str, Any], valid: Callable[[Dict[str, Any]], bool]) -> int:
+        """恢复尚未跟踪且 valid 通过的文件，返回恢复的文件数"""
+        restored = 0
+        with self._lock:
+            for f in data.get('files') or []:
+                if f['path'] in self._files or not valid(f):
+                    continue
+                self._files[f['path']] = _CounterState(
+                    f['offset'], f['size'], f['mtime'], SessionCounters(*f['counters'])
+                )
+                restored += 1
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return restored
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'files': len(self._files), 'bytesParsed': self.bytes_parsed}
+
+
+_index_instance: Optional[SessionCounterIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_session_counter_index() -> SessionCounterIndex:
+    global _index_instance
+    with _index_lock:
+        if _index_instance is None:
+            _index_instance = SessionCounterIndex()
+        return _index_instance
+
+
+def get_session_counters(path: Any) -> SessionCounters:
+    """session jsonl 的消息 / 工具调用 / 错误计数（增量维护）"""
+    return get_session_counter_index().get(path)
+
+
+def reset_session_counters_for_tests() -> None:
+    global _index_instance
+    with _index_lock:
+        _index_instance = None
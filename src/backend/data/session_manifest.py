@@ -0,0 +1,223 @@
+"""
+Session 目录清单 - 每个 agents/*/sessions 目录的 (path, size, mtime, 首末时间戳)
+
+时间窗查询据此只打开时间范围与窗口重叠的 session 文件。
+清单由 scandir 重建；watchdog 正常工作时由文件事件标脏，未标脏的目录在
+OPENCLAW_MANIFEST_RESCAN_SEC 内不再重复 scandir。
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config_fortify import get_fortify_config
+
+# mtime 与消息时间戳的容差（写入延迟、时钟抖动）
+MTIME_SLACK_MS = 60_000
+
+
+def is_session_jsonl(name: str) -> bool:
+    """参与统计的 session 文件：*.jsonl，跳过 lock 和 deleted"""
+    return name.endswith('.jsonl') and 'lock' not in name and 'deleted' not in name
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    agent_id: str
+    size: int
+    mtime: float
+    first_ts_ms: Optional[int] = None
+    last_ts_ms: Optional[int] = None
+
+    def may_overlap(self, since_ms: Optional[int] = None, until_ms: Optional[int] = None) -> bool:
+        """文件时间范围是否可能与 [since_ms, until_ms) 重叠；末时间以 mtime 兜底"""
+        if since_ms is not None:
+            upper = max(self.last_ts_ms or 0, int(self.mtime * 1000)) + MTIME_SLACK_MS
+            if upper < since_ms:
+                return False
+        if until_ms is not None and self.first_ts_ms is not None and self.first_ts_ms >= until_ms:
+            return False
+        return True
+
+
+@dataclass
+class _DirState:
+    agent_id: str
+    entries: Dict[str, ManifestEntry] = field(default_factory=dict)
+    scanned_at: float = 0.0
+    dirty: bool = True
+
+
+class SessionManifest:
+    """sessions 目录清单（线程安全）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._root: Optional[str] = None
+        self._dirs: Dict[str, _DirState] = {}
+        self._trust_events = False
+        self.scans = 0
+
+    def set_trust_events(self, trusted: bool) -> None:
+        """watchdog 模式下文件事件可信；轮询/停止时每次查询都重新 scandir"""
+        with self._lock:
+            self._trust_events = trusted
+            if not trusted:
+                for st in self._dirs.values():
+                    st.dirty = True
+
+    def note_path(self, filepath: str) -> None:
+        """watcher 事件：标记所属 sessions 目录待重扫"""
+        p = Path(filepath)
+        if p.parent.name != 'sessions':
+            return
+        with self._lock:
+            st = self._dirs.get(str(p.parent))
+            if st is not None:
+                st.dirty = True
+
+    def _scan_dir(self, sessions_path: str, st: _DirState) -> None:
+        try:
+            files = list(os.scandir(sessions_path))
+        except OSError:
+            st.entries.clear()
+            return
+        seen = set()
+        for fe in files:
+            if not is_session_jsonl(fe.name):
+                continue
+            try:
+                stat = fe.stat()
+            except OSError:
+                continue
+            seen.add(fe.path)
+            ent = st.entries.get(fe.path)
+            if ent is None:
+                st.entries[fe.path] = ManifestEntry(fe.path, st.agent_id, stat.st_size, stat.st_mtime)
+            elif ent.size != stat.st_size or ent.mtime != stat.st_mtime:
+                if stat.st_size < ent.size:
+                    # 截断/重写：时间范围作废
+                    ent.first_ts_ms = ent.last_ts_ms = None
+                ent.size = stat.st_size
+                ent.mtime = stat.st_mtime
+        for path in [k for k in st.entries if k not in seen]:
+            del st.entries[path]
+        st.scanned_at = time.monotonic()
+        st.dirty = False
+        self.scans += 1
+
+    def refresh(self, agents_path: Path) -> List[ManifestEntry]:
+        """按需重扫各 sessions 目录，返回全部文件条目"""
+        root = str(agents_path)
+        rescan_sec = get_fortify_config().manifest_rescan_sec
+        with self._lock:
+            if self._root != root:
+                self._root = root
+                self._dirs = {}
+            try:
+                agent_entries = [e for e in os.scandir(root) if e.is_dir()]
+            except OSError:
+                agent_entries = []
+            now = time.monotonic()
+            live = set()
+            out: List[ManifestEntry] = []
+            for agent_entry in agent_entries:
+                sessions_path = os.path.join(agent_entry.path, 'sessions')
+                if not os.path.isdir(sessions_path):
+                    continue
+                live.add(sessions_path)
+                st = self._dirs.get(sessions_path)
+                if st is None:
+                    st = self._dirs[sessions_path] = _DirState(agent_id=agent_entry.name)
+                if st.dirty or not self._trust_events or now - st.scanned_at >= rescan_sec:
+                    self._scan_dir(sessions_path, st)
+                out.extend(st.entries.values())
+            for path in [k for k in self._dirs if k not in live]:
+                del self._dirs[path]
+            return out
+
+    def update_range(self, filepath: str, first_ts_ms: Optional[int], last_ts_ms: Optional[int]) -> None:
+        """解析后回填文件内消息的首末时间戳"""
+        if first_ts_ms is None and last_ts_ms is None:
+            return
+        with self._lock:
+            st = self._dirs.get(str(Path(filepath).parent))
+            ent = st.entries.get(filepath) if st else None
+            if ent is None:
+                return
+            if first_ts_ms is not None:
+                ent.first_ts_ms = first_ts_ms if ent.first_ts_ms is None else min(ent.first_ts_ms, first_ts_ms)
+            if last_ts_ms is not None:
+                ent.last_ts_ms = last_ts_ms if ent.last_ts_ms is None else max(ent.last_ts_ms, last_ts_ms)
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self._root,
+                'dirs': [
+                    {
+                        'path': sessions_path,
+                        'agent': st.agent_id,
+                        'files': [
+                            {
+                                'path': e.path,
+                                'size': e.size,
+                                'mtime': e.mtime,
+                                'first': e.first_ts_ms,
+                                'last': e.last_ts_ms,
+                            }
+                            for e in st.entries.values()
+                        ],
+                    }
+                    for sessions_path, st in self._dirs.items()
+                ],
+            }
+
+    def restore_snapshot(self, data: Dict[str, Any], valid: Callable[[Dict[str, Any]], bool]) -> int:
+        """恢复各文件的首末时间戳；目录均标脏，首次查询时仍 scandir 校正"""
+        restored = 0
+        with self._lock:
+            if self._dirs or not data.get('root'):
+                return 0
+            self._root = data['root']
+            for d in data.get('dirs') or []:
+                st = self._dirs[d['path']] = _DirState(agent_id=d['agent'])
+                for f in d.get('files') or []:
+                    if not valid(f):
+                        continue
+                    st.entries[f['path']] = ManifestEntry(
+                        f['path'], d['agent'], f['size'], f['mtime'], f.get('first'), f.get('last')
+                    )
+                    restored += 1
+        return restored
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'dirs': len(self._dirs),
+                'files': sum(len(st.entries) for st in self._dirs.values()),
+                'scans': self.scans,
+            }
+
+
+_manifest_instance: Optional[SessionManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_session_manifest() -> SessionManifest:
+    global _manifest_instance
+    with _manifest_lock:
+        if _manifest_instance is None:
+            _manifest_instance = SessionManifest()
+        return _manifest_instance
+
+
+def reset_session_manifest_for_tests() -> None:
+    global _manifest_instance
+    with _manifest_lock:
+        _manifest_instance = None
@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 
+from core.error_classifier import classify_session_error
 from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id
 from utils.data_repair import parse_session_jsonl_line
 
@@ -285,18 +286,7 @@ def get_last_error(agent_id: str) -> Optional[Dict[str, Any]]:
 
 def detect_error_type(error_msg: str) -> str:
     """检测错误类型"""
-    error_msg_lower = (error_msg or '').lower()
-    
-    if '429' in error_msg or 'rate limit' in error_msg_lower:
-        return 'rate-limit'
-    elif 'token' in error_msg_lower or 'context' in error_msg_lower:
-        return 'token-limit'
-    elif 'timeout' in error_msg_lower or '超时' in error_msg_lower:
-        return 'timeout'
-    elif '余额不足' in (error_msg or ''):
-        return 'quota'
-    else:
-        return 'unknown'
+    return classify_session_error(error_msg)
 
 
 def get_session_updated_at(agent_id: str) -> int:
@@ -0,0 +1,65 @@
+"""
+数据源指纹 - 各 API 依赖的源文件 (size, mtime_ns)，用于条件请求 validator
+
+只做 stat / scandir，不读取文件内容；session 文件列表复用 session_manifest。
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from data.config_reader import get_config_epoch, get_openclaw_root, normalize_openclaw_agent_id
+from data.session_manifest import get_session_manifest
+
+
+def stat_fingerprint(path: Path) -> Optional[Tuple[int, int]]:
+    """(size, mtime_ns)；文件不存在时为 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def config_fingerprint() -> tuple:
+    return get_config_epoch()
+
+
+def runs_fingerprint() -> tuple:
+    path = get_openclaw_root() / "subagents" / "runs.json"
+    return (str(path), stat_fingerprint(path))
+
+
+def sessions_fingerprint(agent_id: Optional[str] = None) -> tuple:
+    """agents/*/sessions 下 jsonl 与 sessions.json 的指纹；agent_id 非空时只取该 Agent"""
+    agents_path = get_openclaw_root() / "agents"
+    target = normalize_openclaw_agent_id(agent_id) if agent_id else None
+    files = []
+    for ent in get_session_manifest().refresh(agents_path):
+        if target is not None and normalize_openclaw_agent_id(ent.agent_id) != target:
+            continue
+        files.append((ent.path, ent.size, ent.mtime))
+    try:
+        agent_dirs = [e.name for e in os.scandir(agents_path) if e.is_dir()]
+    except OSError:
+        agent_dirs = []
+    for name in agent_dirs:
+        if target is not None and normalize_openclaw_agent_id(name) != target:
+            continue
+        index = agents_path / name / "sessions" / "sessions.json"
+        files.append((str(index),) + (stat_fingerprint(index) or (None, None)))
+    files.sort(key=lambda f: f[0])
+    return tuple(files)
+
+
+def failure_logs_fingerprint() -> tuple:
+    from status.error_detector import _get_failure_log_paths
+
+    return tuple((str(p), stat_fingerprint(p)) for p in _get_failure_log_paths())
+
+
+def task_history_fingerprint() -> tuple:
+    from data.task_history import TASK_HISTORY_DB_PATH
+
+    return (str(TASK_HISTORY_DB_PATH), stat_fingerprint(TASK_HISTORY_DB_PATH))
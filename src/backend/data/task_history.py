@@ -1,11 +1,16 @@
 """
 任务历史持久化 - 保存已完成任务，避免 runs.json 清空后数据丢失
 数据存放在 Dashboard 自有目录，不修改 OpenClaw 的 ~/.openclaw 目录结构。
+
+存储为 SQLite（task_history.db）：已完成任务只追加不重写，按 runId / agent / startTime 建索引，
+不限条数；旧版 task_history.json 首次打开时导入一次。
 """
 import json
 import os
+import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 # 旧路径（兼容迁移）：~/.openclaw/dashboard/ → ~/.openclaw-dashboard/ → ~/.openclaw-agent-dashboard/
 _LEGACY_DASHBOARD_DIR = Path.home() / ".openclaw" / "dashboard"
@@ -23,8 +28,11 @@ def get_dashboard_data_dir() -> Path:
 
 
 DASHBOARD_DATA_DIR = get_dashboard_data_dir()
+# 旧版 JSON 历史（仅用于一次性导入）
 TASK_HISTORY_PATH = DASHBOARD_DATA_DIR / "task_history.json"
-MAX_HISTORY_ITEMS = 200
+TASK_HISTORY_DB_PATH = DASHBOARD_DATA_DIR / "task_history.db"
+# merge_with_history 返回的最大条数
+MAX_MERGED_TASKS = 100
 
 
 def _ensure_dir():
@@ -50,46 +58,231 @@ def _migrate_from_legacy_if_needed() -> None:
         return
 
 
-def load_task_history() -> List[Dict[str, Any]]:
-    """加载任务历史"""
-    _migrate_from_legacy_if_needed()
-    if not TASK_HISTORY_PATH.exists():
-        return []
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    run_id TEXT PRIMARY KEY,
+    agent_id TEXT,
+    status TEXT,
+    start_time INTEGER NOT NULL DEFAULT 0,
+    end_time INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_start ON tasks (start_time DESC, run_id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_agent_start ON tasks (agent_id, start_time DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _as_int(value: Any) -> int:
     try:
-        with open(TASK_HISTORY_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        tasks = data.get('tasks', [])
-        return tasks if isinstance(tasks, list) else []
-    except Exception as e:
-        print(f"加载任务历史失败: {e}")
-        return []
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class TaskHistoryStore:
+    """已完成任务的追加式存储（SQLite，线程安全）"""
+
+    def __init__(self, db_path: Path, legacy_json: Optional[Path] = None) -> None:
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        if legacy_json is not None:
+            self._import_legacy_json(legacy_json)
+
+    def _import_legacy_json(self, path: Path) -> None:
+        """旧版 task_history.json 导入一次（保留原文件）"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+            if row is not None or not path.exists():
+                return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tasks = json.load(f).get('tasks', [])
+        except Exception as e:
+            print(f"加载任务历史失败: {e}")
+            return
+        if isinstance(tasks, list):
+            self.add_many(t for t in tasks if isinstance(t, dict))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')")
+        self.compact()
+
+    def add_many(self, tasks: Iterable[Dict[str, Any]]) -> int:
+        """追加任务；runId 已存在的忽略（已完成任务不重写）。返回新增条数"""
+        rows = [
+            (
+                t.get('id'),
+                t.get('agentId'),
+                t.get('status'),
+                _as_int(t.get('startTime')),
+                t.get('endTime'),
+                json.dumps(t, ensure_ascii=False),
+            )
+            for t in tasks
+            if t.get('id')
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (run_id, agent_id, status, start_time, end_time, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def existing_ids(self, run_ids: Iterable[str]) -> set:
+        ids = [r for r in run_ids if r]
+        found: set = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    r[0] for r in self._conn.execute(
+                        f"SELECT run_id FROM tasks WHERE run_id IN ({placeholders})", chunk
+                    )
+                )
+        return found
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """按 runId 查询（主键索引）"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM tasks WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(
+        self,
+        limit: int,
+        agent_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        before: Optional[Tuple[int, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按 (startTime, runId) 倒序查询，过滤条件走索引。
+
+        Args:
+            since / until: startTime 范围（含 since，不含 until）
+            before: 游标 (startTime, runId)，只返回严格小于它的任务
+        """
+        where: List[str] = []
+        args: List[Any] = []
+        if agent_id:
+            where.append("agent_id = ?")
+            args.append(agent_id)
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if since is not None:
+            where.append("start_time >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("start_time < ?")
+            args.append(until)
+        if before is not None:
+            where.append("(start_time < ? OR (start_time = ? AND run_id < ?))")
+            args.extend([before[0], before[0], before[1]])
+        sql = "SELECT data FROM tasks"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY start_time DESC, run_id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def recent(self, limit: int, agent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按 startTime 倒序取最近任务"""
+        return self.query(limit, agent_id=agent_id)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def compact(self) -> None:
+        """回收空间并重建索引"""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[TaskHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_task_history_store() -> TaskHistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _migrate_from_legacy_if_needed()
+            _store = TaskHistoryStore(TASK_HISTORY_DB_PATH, legacy_json=TASK_HISTORY_PATH)
+        return _store
+
+
+def reset_task_history_store_for_tests(store: Optional[TaskHistoryStore] = None) -> None:
+    global _store
+    with _store_lock:
+        if _store is not None and _store is not store:
+            _store.close()
+        _store = store
+
+
+def load_task_history() -> List[Dict[str, Any]]:
+    """加载全部任务历史（按开始时间倒序）"""
+    store = get_task_history_store()
+    return store.recent(store.count())
+
+
+def get_history_task(run_id: str) -> Optional[Dict[str, Any]]:
+    """按 runId 查询历史任务"""
+    return get_task_history_store().get(run_id)
 
 
 def save_task_history(tasks: List[Dict[str, Any]]) -> None:
-    """保存任务历史，保留最近 N 条"""
-    _ensure_dir()
-    trimmed = tasks[:MAX_HISTORY_ITEMS]
+    """追加保存任务历史（已存在的 runId 不覆盖）"""
     try:
-        with open(TASK_HISTORY_PATH, 'w', encoding='utf-8') as f:
-            json.dump({'tasks': trimmed, 'version': 1}, f, ensure_ascii=False, indent=2)
-    except Exception as e:
+        get_task_history_store().add_many(tasks)
+    except sqlite3.Error as e:
         print(f"保存任务历史失败: {e}")
 
 
+def task_sort_key(task: Dict[str, Any]) -> Tuple[int, str]:
+    """任务列表排序 / 游标键：(startTime, id)，与 TaskHistoryStore.query 的顺序一致"""
+    return (_as_int(task.get('startTime')), str(task.get('id') or ''))
+
+
 def merge_with_history(
     current_runs: List[Dict[str, Any]],
     run_to_task_fn,
+    *,
+    agent_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    before: Optional[Tuple[int, str]] = None,
+    limit: int = MAX_MERGED_TASKS,
 ) -> List[Dict[str, Any]]:
     """
     合并当前 runs 与历史，并持久化新完成的任务
-    
+
     Args:
         current_runs: 从 runs.json 读取的当前运行记录
         run_to_task_fn: 将 run 转为 task 格式的函数 (run) -> dict
+        agent_id / status / since / until / before: 过滤与游标，历史部分下推到索引查询
+        limit: 返回条数上限
     """
-    history = load_task_history()
-    history_ids = {t.get('id') for t in history if t.get('id')}
-    
+    store = get_task_history_store()
+    known = store.existing_ids(r.get('runId', '') for r in current_runs if r.get('endedAt'))
+
     # 当前 runs 转为 tasks
     current_tasks = []
     new_completed = []
@@ -97,22 +290,35 @@ def merge_with_history(
         task = run_to_task_fn(run)
         current_tasks.append(task)
         run_id = run.get('runId', '')
-        if run.get('endedAt') and run_id and run_id not in history_ids:
+        if run.get('endedAt') and run_id and run_id not in known:
             new_completed.append(task)
-            history_ids.add(run_id)
-    
-    # 新完成的任务加入历史
+            known.add(run_id)
+
+    # 新完成的任务追加到历史
     if new_completed:
-        for t in reversed(new_completed):
-            history.insert(0, t)
-        save_task_history(history)
-    
-    # 合并：当前 runs 中的任务 + 历史中已不在 runs 里的
+        save_task_history(new_completed)
+
+    def _wanted(t: Dict[str, Any]) -> bool:
+        if agent_id and t.get('agentId') != agent_id:
+            return False
+        if status and t.get('status') != status:
+            return False
+        ts = _as_int(t.get('startTime'))
+        if (since is not None and ts < since) or (until is not None and ts >= until):
+            return False
+        return before is None or task_sort_key(t) < before
+
+    # 合并：当前 runs 中的任务 + 历史中已不在 runs 里的（只取足够排出前 N 条的部分）
     current_ids = {r.get('runId') for r in current_runs}
+    merged = [t for t in current_tasks if _wanted(t)]
+    history = store.query(
+        limit + len(current_ids), agent_id=agent_id, status=status,
+        since=since, until=until, before=before,
+    )
     for h in history:
         if h.get('id') not in current_ids:
-            current_tasks.append(h)
-    
+            merged.append(h)
+
     # 按开始时间倒序
-    current_tasks.sort(key=lambda x: x.get('startTime') or 0, reverse=True)
-    return current_tasks[:100]  # 最多返回 100 条
+    merged.sort(key=task_sort_key, reverse=True)
+    return merged[:limit]
@@ -92,6 +92,7 @@ class TimelineStep:
         return {k: v for k, v in asdict(self).items() if v is not None}
 
 
+from core.error_classifier import classify_session_error
 from data.config_reader import get_openclaw_root, normalize_openclaw_agent_id, agent_ids_equal
 from data.session_reader import (
     normalize_sessions_index,
@@ -252,17 +253,7 @@ def _looks_like_uuid(s: str) -> bool:
 
 def _detect_error_type(error_msg: str) -> str:
     """检测错误类型"""
-    error_msg_lower = (error_msg or '').lower()
-    if '429' in error_msg or 'rate limit' in error_msg_lower:
-        return 'rate-limit'
-    elif 'token' in error_msg_lower or 'context' in error_msg_lower:
-        return 'token-limit'
-    elif 'timeout' in error_msg_lower or '超时' in error_msg_lower:
-        return 'timeout'
-    elif '余额不足' in (error_msg or ''):
-        return 'quota'
-    else:
-        return 'unknown'
+    return classify_session_error(error_msg)
 
 
 def _truncate_text(text: str, max_len: int = 500) -> str:
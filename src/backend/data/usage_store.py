@@ -0,0 +1,773 @@
+"""
+Token 用量列式存储 - performance / collaboration 共用
+
+每条带 usage 的消息按列存入 array（epoch 毫秒、agent/session/model/trigger 下标、各类 token），
+字符串经字典驻留；按 session 文件字节偏移增量追加，避免每次请求重建 list-of-dict。
+另维护按 ts_ms 排序的行号索引，时间窗查询二分定位；早于保留期（OPENCLAW_USAGE_RETENTION_DAYS）的行定期剔除。
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config_fortify import get_fortify_config
+from core.error_handler import record_error
+from data.session_manifest import ManifestEntry, SessionManifest, get_session_manifest
+from utils.data_repair import parse_session_jsonl_line
+from utils.jsonl_tail import AppendedLines, is_rewritten
+
+DEFAULT_TRIGGER = '(用户输入)'
+
+# flags 列位
+FLAG_REQUEST = 1  # role == assistant
+
+# 协作视图光球最多展示的最近调用数
+RECENT_CALLS_CAPACITY = 100
+
+# 待排序的新增行不超过该数时逐条二分插入，否则整体归并
+_ORDER_INSORT_MAX = 256
+# 过期行至少达到该数（或表的 1/8）才压缩，避免每次同步都整表重建
+_EVICT_MIN_ROWS = 1024
+
+
+def _extract_trigger_text(msg: Dict) -> str:
+    """从消息中提取触发内容（完整展示）"""
+    content = msg.get('content') or []
+    if isinstance(content, str):
+        return content.replace('\n', ' ')
+    if not isinstance(content, list):
+        return ''
+    for item in content:
+        if isinstance(item, dict):
+            if item.get('type') == 'text' and item.get('text'):
+                text = str(item['text'])
+                if '[Subagent Task]' in text:
+                    m = re.search(r'\*\*任务[：:]\s*(.+?)\*\*', text)
+                    if m:
+                        return f"子任务: {m.group(1).strip()}"
+                return text.replace('\n', ' ')
+            if item.get('type') == 'toolCall':
+                return f"工具调用: {item.get('name', '?')}"
+    return ''
+
+
+def _describe_tool_call(name: str, args: Any) -> str:
+    """toolCall arguments 的展示文本"""
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except Exception:
+            args = {}
+    if not isinstance(args, dict):
+        args = {}
+    if name == 'exec' and args:
+        cmd = args.get('command', '')
+        if cmd:
+            return f"exec: {cmd}"
+    if name == 'read' and args:
+        path = args.get('path', '')
+        if path:
+            return f"read: {path}"
+    if name == 'write' and args:
+        path = args.get('path', '')
+        if path:
+            return f"write: {path}"
+    if name == 'process' and args:
+        action = args.get('action', '')
+        sid = args.get('sessionId', '')
+        if action and sid:
+            return f"process: {action} ({sid})"
+        if action:
+            return f"process: {action}"
+    if name == 'sessions_spawn' and args:
+        task = (args.get('task') or '').replace(chr(10), ' ')
+        agent = args.get('agentId', '')
+        if task and agent:
+            return f"sessions_spawn: {agent} - {task}"
+        if agent:
+            return f"sessions_spawn: {agent}"
+    # 其他工具：显示完整 arguments
+    if args:
+        try:
+            s = json.dumps(args, ensure_ascii=False)
+            return f"{name}: {s}"
+        except Exception:
+            pass
+    return f"工具: {name}"
+
+
+def _extract_tool_call_detail(msg: Dict, tool_call_id: str) -> str:
+    """从 assistant 消息的 content 中提取 toolCall 的 arguments 详情"""
+    content = msg.get('content') or []
+    if not isinstance(content, list):
+        return ''
+    for item in content:
+        if not isinstance(item, dict):
+            continue
+        if item.get('type') == 'toolCall' and item.get('id') == tool_call_id:
+            return _describe_tool_call(item.get('name', ''), item.get('arguments') or {})
+    return ''
+
+
+def _tool_call_details(msg: Dict) -> Optional[Dict[str, str]]:
+    """assistant 消息内全部 toolCall 的 {id: 详情}，无则 None"""
+    content = msg.get('content') or []
+    if not isinstance(content, list):
+        return None
+    out: Dict[str, str] = {}
+    for item in content:
+        if isinstance(item, dict) and item.get('type') == 'toolCall' and item.get('id'):
+            tid = item['id']
+            if tid not in out:
+                out[tid] = _describe_tool_call(item.get('name', ''), item.get('arguments') or {})
+    return out or None
+
+
+def parse_usage_timestamp_ms(envelope: Dict, msg: Dict) -> Optional[int]:
+    """envelope/message 时间戳 → UTC epoch 毫秒；无 tz 的 ISO 串按 UTC 处理"""
+    ts_raw = envelope.get('timestamp') or msg.get('timestamp')
+    if isinstance(ts_raw, bool) or ts_raw is None:
+        return None
+    if isinstance(ts_raw, (int, float)):
+        v = float(ts_raw)
+        return int(v if v > 1e12 else v * 1000)
+    if isinstance(ts_raw, str):
+        try:
+            ts = datetime.fromisoformat(ts_raw.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp() * 1000)
+    return None
+
+
+# (ts_ms, model, trigger, input, output, cacheRead, cacheWrite, total, flags)
+UsageRow = Tuple[int, str, str, int, int, int, int, int, int]
+ParentMap = OrderedDict[str, Tuple[Optional[str], str, Any]]
+
+
+def _resolve_trigger(parents: ParentMap, parent_id: Optional[str]) -> str:
+    if not parent_id or parent_id not in parents:
+        return ''
+    grand_id, role, payload = parents[parent_id]
+    if role == 'user':
+        return payload or ''
+    if role == 'toolResult':
+        tool, tool_call_id = payload
+        if tool_call_id and grand_id and grand_id in parents:
+            g_role_payload = parents[grand_id]
+            details = g_role_payload[2] if g_role_payload[1] == 'assistant' else None
+            detail = (details or {}).get(tool_call_id, '')
+            # toolResult 触发的消息即工具执行完成后的回传，不是工具调用本身
+            return f"【完成回传】{detail}" if detail else f"【完成回传】工具: {tool}"
+        return f"【完成回传】工具: {tool}"
+    return ''
+
+
+def _snippet(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def _parse_usage_line(line: str, parents: ParentMap, horizon: int, snippet_chars: int) -> Optional[UsageRow]:
+    """
+    解析一行：登记紧凑 parent 信息；带 usage 时返回一行记录。
+
+    parents 只保留 (parentId, role, payload)：user → trigger 片段，toolResult → (toolName, toolCallId)，
+    assistant → {toolCallId: 详情片段}；超过 horizon 条时淘汰最早登记的消息。
+    """
+    try:
+        envelope, msg = parse_session_jsonl_line(line)
+    except Exception:
+        return None
+    if not envelope or envelope.get('type') != 'message' or not msg:
+        return None
+    role = msg.get('role', '')
+    parent_id = envelope.get('parentId')
+    if role == 'user':
+        payload: Any = _snippet(_extract_trigger_text(msg), snippet_chars)
+    elif role == 'toolResult':
+        tool = msg.get('toolName', '') or (msg.get('details') or {}).get('tool', '?')
+        payload = (tool, msg.get('toolCallId', ''))
+    elif role == 'assistant':
+        details = _tool_call_details(msg)
+        payload = {k: _snippet(v, snippet_chars) for k, v in details.items()} if details else None
+    else:
+        payload = None
+    parents[envelope.get('id', '')] = (parent_id, role, payload)
+    while len(parents) > horizon:
+        parents.popitem(last=False)
+
+    usage = msg.get('usage')
+    if not isinstance(usage, dict):
+        return None
+    ts_ms = parse_usage_timestamp_ms(envelope, msg)
+    if ts_ms is None:
+        return None
+    is_request = role == 'assistant'
+    try:
+        return (
+            ts_ms,
+            (msg.get('model', '') or '') if is_request else '',
+            (_resolve_trigger(parents, parent_id) or DEFAULT_TRIGGER) if is_request else '',
+            int(usage.get('input', 0) or 0),
+            int(usage.get('output', 0) or 0),
+            int(usage.get('cacheRead', 0) or 0),
+            int(usage.get('cacheWrite', 0) or 0),
+            int(usage.get('totalTokens', 0) or 0),
+            FLAG_REQUEST if is_request else 0,
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def read_usage_chunk(path: str, offset: int, parents: ParentMap) -> Tuple[List[UsageRow], int]:
+    """
+    从字节偏移逐行流式读取新增的完整行，返回 (记录, 消费字节数)；末行未写完时留待下次。
+    峰值内存只与单行大小和 parent 视界有关，与文件大小无关。
+    """
+    cfg = get_fortify_config()
+    horizon, snippet_chars = cfg.parent_map_horizon, cfg.trigger_snippet_chars
+    rows: List[UsageRow] = []
+    with open(path, 'rb') as f:
+        lines = AppendedLines(f, offset)
+        for _, raw in lines:
+            row = _parse_usage_line(raw.decode('utf-8', errors='replace'), parents, horizon, snippet_chars)
+            if row is not None:
+                rows.append(row)
+    return rows, lines.consumed
+
+
+def parse_usage_file(path: str) -> Optional[Tuple[List[UsageRow], ParentMap, int]]:
+    """冷扫描整文件（进程池工作函数，须保持模块级且无共享状态）"""
+    parents: ParentMap = OrderedDict()
+    try:
+        rows, consumed = read_usage_chunk(path, 0, parents)
+    except OSError:
+        return None
+    return rows, parents, consumed
+
+
+class StringPool:
+    """字符串驻留：str ↔ int 下标"""
+
+    __slots__ = ('_index', '_values')
+
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self._values)
+            self._index[value] = idx
+            self._values.append(value)
+        return idx
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self._index.get(value)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._values[idx]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def values(self) -> List[str]:
+        return list(self._values)
+
+
+class RecentCallsFeed:
+    """
+    最近模型调用的有界缓冲：按时间戳保留最新 capacity 条（小顶堆）。
+    冷扫描按文件顺序追加、时间乱序时也只淘汰更旧的调用。
+    """
+
+    def __init__(self, capacity: int = RECENT_CALLS_CAPACITY) -> None:
+        self.capacity = capacity
+        # (ts_ms, seq, file_idx, agentId, sessionId, model, trigger, tokens)
+        self._heap: List[Tuple[int, int, int, str, str, str, str, int]] = []
+        self._seq = 0
+
+    def push(self, ts_ms: int, file_idx: int, agent_id: str, session_id: str,
+             model: str, trigger: str, tokens: int) -> None:
+        if len(self._heap) >= self.capacity and ts_ms <= self._heap[0][0]:
+            return
+        self._seq += 1
+        item = (ts_ms, self._seq, file_idx, agent_id, session_id, model, trigger, tokens)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+
+    def discard_file(self, file_idx: int) -> int:
+        """移除某文件的调用，返回移除条数"""
+        before = len(self._heap)
+        self._heap = [it for it in self._heap if it[2] != file_idx]
+        heapq.heapify(self._heap)
+        return before - len(self._heap)
+
+    def snapshot(self, since_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按时间升序返回 since_ms 之后的调用"""
+        return [
+            {
+                'timestampMs': it[0],
+                'agentId': it[3],
+                'sessionId': it[4],
+                'model': it[5],
+                'trigger': it[6],
+                'tokens': it[7],
+            }
+            for it in sorted(self._heap)
+            if since_ms is None or it[0] >= since_ms
+        ]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+@dataclass
+class _FileState:
+    """单个 session 文件的增量读取进度"""
+    file_idx: int
+    agent_idx: int
+    session_idx: int
+    offset: int = 0
+    size: int = 0
+    mtime: float = 0.0
+    # 消息 id → (parentId, role, payload)，用于 trigger 溯源
+    parents: ParentMap = field(default_factory=OrderedDict)
+    # 由启动快照恢复的文件不带 parents：文件再有新增时整文件重读
+    parents_complete: bool = True
+
+
+class UsageTable:
+    """Append-only 列式 usage 表（线程安全）；retention_ms 非空时剔除更早的行"""
+
+    _INT_COLUMNS = ('agent', 'session', 'model', 'trigger', 'file')
+    _I64_COLUMNS = ('ts_ms', 'input', 'output', 'cache_read', 'cache_write', 'total')
+
+    def __init__(self, retention_ms: Optional[int] = None) -> None:
+        self._lock = threading.RLock()
+        self._root: Optional[Path] = None
+        self.retention_ms = retention_ms
+        self.evicted = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.agents = StringPool()
+        self.sessions = StringPool()
+        self.models = StringPool()
+        self.triggers = StringPool()
+        self.files = StringPool()
+        self._files: Dict[str, _FileState] = {}
+        for name in self._I64_COLUMNS:
+            setattr(self, name, array('q'))
+        for name in self._INT_COLUMNS:
+            setattr(self, name, array('i'))
+        self.flags = array('b')
+        self.recent = RecentCallsFeed()
+        # 按 ts_ms 升序的行号与对应时间戳；新增行先进入 _pending，查询前并入
+        self._order = array('i')
+        self._order_ts = array('q')
+        self._pending: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ts_ms)
+
+    # ---------- ingest ----------
+
+    def _new_state(self, key: str, agent_id: str) -> _FileState:
+        st = _FileState(
+            file_idx=self.files.intern(key),
+            agent_idx=self.agents.intern(agent_id),
+            session_idx=self.sessions.intern(Path(key).stem),
+        )
+        self._files[key] = st
+        return st
+
+    def _append_rows(self, st: _FileState, rows: List[UsageRow]) -> None:
+        for ts_ms, model, trigger, inp, out, cr, cw, total, flags in rows:
+            self._pending.append(len(self.ts_ms))
+            self.ts_ms.append(ts_ms)
+            self.agent.append(st.agent_idx)
+            self.session.append(st.session_idx)
+            self.model.append(self.models.intern(model))
+            self.trigger.append(self.triggers.intern(trigger))
+            self.file.append(st.file_idx)
+            self.input.append(inp)
+            self.output.append(out)
+            self.cache_read.append(cr)
+            self.cache_write.append(cw)
+            self.total.append(total)
+            self.flags.append(flags)
+            if flags & FLAG_REQUEST:
+                # trigger 已在解析时溯源，直接入最近调用缓冲
+                self.recent.push(ts_ms, st.file_idx, self.agents[st.agent_idx],
+                                 self.sessions[st.session_idx], model, trigger, total)
+
+    def sync_file(self, path: Path, agent_id: str, size: Optional[int] = None,
+                  mtime: Optional[float] = None) -> int:
+        """增量读取 session 文件新增的完整行，返回新增记录数"""
+        key = str(path)
+        with self._lock:
+            if size is None or mtime is None:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    self.drop_file(path)
+                    return 0
+                size, mtime = stat.st_size, stat.st_mtime
+            st = self._files.get(key)
+            if st is not None and size == st.size and mtime == st.mtime:
+                return 0
+            if st is not None and (
+                is_rewritten(size, mtime, st.offset, st.size, st.mtime) or not st.parents_complete
+            ):
+                # 文件被截断/重写，或快照恢复的文件有新增：丢弃旧记录后从头读取
+                self.drop_file(path)
+                st = None
+            if st is None:
+                st = self._new_state(key, agent_id)
+            try:
+                rows, consumed = read_usage_chunk(key, st.offset, st.parents)
+            except OSError as e:
+                record_error("io-error", f"{path}: {e}", "usage_store:sync_file", exc=e)
+                return 0
+            self._append_rows(st, rows)
+            st.offset += consumed
+            st.size = size
+            st.mtime = mtime
+            return len(rows)
+
+    def drop_file(self, path: Path) -> None:
+        """移除某文件贡献的全部记录（文件删除或截断时）"""
+        key = str(path)
+        with self._lock:
+            st = self._files.pop(key, None)
+            if st is None:
+                return
+            discarded = self.recent.discard_file(st.file_idx)
+            keep = [i for i, fi in enumerate(self.file) if fi != st.file_idx]
+            if len(keep) < len(self):
+                self._compact(keep)
+            if discarded:
+                self._refill_recent()
+
+    def _refill_recent(self) -> None:
+        """最近调用缓冲因摘除文件变少时，沿时间索引从最新的行重建"""
+        self._ensure_order()
+        feed = RecentCallsFeed(self.recent.capacity)
+        order, flags = self._order, self.flags
+        for pos in range(len(order) - 1, -1, -1):
+            if len(feed) >= feed.capacity:
+                break
+            i = order[pos]
+            if flags[i] & FLAG_REQUEST:
+                feed.push(self.ts_ms[i], self.file[i], self.agents[self.agent[i]],
+                          self.sessions[self.session[i]], self.models[self.model[i]],
+                          self.triggers[self.trigger[i]], self.total[i])
+        self.recent = feed
+
+    def _compact(self, keep: List[int]) -> None:
+        """只保留 keep（升序行号）中的行，并把时间索引映射到新行号"""
+        remap = array('i', [-1]) * len(self)
+        for new, old in enumerate(keep):
+            remap[old] = new
+        for name in self._I64_COLUMNS + self._INT_COLUMNS + ('flags',):
+            col = getattr(self, name)
+            setattr(self, name, array(col.typecode, (col[i] for i in keep)))
+        order = [(remap[i], t) for i, t in zip(self._order, self._order_ts) if remap[i] >= 0]
+        self._order = array('i', (i for i, _ in order))
+        self._order_ts = array('q', (t for _, t in order))
+        self._pending = [remap[i] for i in self._pending if remap[i] >= 0]
+
+    def _ensure_order(self) -> None:
+        """把新增行并入时间索引：少量逐条二分插入，大批（冷扫描）排序后整体归并"""
+        if not self._pending:
+            return
+        ts = self.ts_ms
+        pending = sorted(self._pending, key=ts.__getitem__)
+        self._pending = []
+        order, order_ts = self._order, self._order_ts
+        if not order_ts or ts[pending[0]] >= order_ts[-1]:
+            order.extend(pending)
+            order_ts.extend(ts[i] for i in pending)
+        elif len(pending) <= _ORDER_INSORT_MAX:
+            for i in pending:
+                pos = bisect.bisect_right(order_ts, ts[i])
+                order.insert(pos, i)
+                order_ts.insert(pos, ts[i])
+        else:
+            merged = list(heapq.merge(order, pending, key=ts.__getitem__))
+            self._order = array('i', merged)
+            self._order_ts = array('q', (ts[i] for i in merged))
+
+    def evict_expired(self, now_ms: Optional[int] = None) -> int:
+        """剔除早于保留期的行（过期行足够多时才压缩），返回剔除的行数"""
+        if self.retention_ms is None:
+            return 0
+        cutoff = (now_ms if now_ms is not None else int(time.time() * 1000)) - self.retention_ms
+        with self._lock:
+            self._ensure_order()
+            expired = bisect.bisect_left(self._order_ts, cutoff)
+            if expired == 0 or expired < min(_EVICT_MIN_ROWS, max(1, len(self) // 8)):
+                return 0
+            drop = bytearray(len(self))
+            for i in self._order[:expired]:
+                drop[i] = 1
+            self._compact([i for i in range(len(drop)) if not drop[i]])
+            self.evicted += expired
+            return expired
+
+    def sync_agents_dir(self, agents_path: Path, since_ms: Optional[int] = None) -> None:
+        """
+        按目录清单增量同步 agents/*/sessions/*.jsonl，并剔除已消失的文件。
+
+        Args:
+            since_ms: 时间窗起点；未解析过且时间范围早于窗口的文件不打开
+        """
+        manifest = get_session_manifest()
+        if self.retention_ms is not None:
+            # 整体早于保留期的文件不必打开
+            cutoff = int(time.time() * 1000) - self.retention_ms
+            since_ms = cutoff if since_ms is None else max(since_ms, cutoff)
+        with self._lock:
+            agents_path = Path(agents_path)
+            if self._root != agents_path:
+                self.clear()
+                self._root = agents_path
+            entries = manifest.refresh(agents_path)
+            seen = {e.path for e in entries}
+            for key in [k for k in self._files if k not in seen]:
+                self.drop_file(Path(key))
+            cold: List[ManifestEntry] = []
+            for ent in entries:
+                if ent.path in self._files:
+                    before = len(self)
+                    self.sync_file(Path(ent.path), ent.agent_id, ent.size, ent.mtime)
+                    self._note_range(manifest, ent.path, before)
+                elif ent.may_overlap(since_ms):
+                    cold.append(ent)
+            if cold:
+                self._ingest_cold(cold, manifest)
+            self.evict_expired()
+
+    def _note_range(self, manifest: SessionManifest, path: str, start: int) -> None:
+        """把 [start, len) 新增行的时间范围回填到清单"""
+        if start >= len(self):
+            return
+        seg = self.ts_ms[start:]
+        manifest.update_range(path, min(seg), max(seg))
+
+    def _ingest_cold(self, cold: List[ManifestEntry], manifest: SessionManifest) -> None:
+        """首次出现的文件：整文件解析分片到进程池，按输入顺序合并"""
+        from data.parallel_scan import map_files
+
+        results = map_files(parse_usage_file, [(ent.path,) for ent in cold])
+        for ent, result in zip(cold, results):
+            if result is None:
+                record_error("io-error", f"{ent.path}: unreadable", "usage_store:cold_scan")
+                continue
+            rows, parents, consumed = result
+            st = self._new_state(ent.path, ent.agent_id)
+            st.parents = parents
+            before = len(self)
+            self._append_rows(st, rows)
+            self._note_range(manifest, ent.path, before)
+            st.offset = consumed
+            st.size = ent.size
+            st.mtime = ent.mtime
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    # ---------- 启动快照 ----------
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        """按文件导出已解析的记录（不含 parents）；模型与 trigger 以下标引用。锁内只复制列数组，逐行组装在锁外"""
+        names = ('file', 'ts_ms', 'model', 'trigger', 'input', 'output', 'cache_read', 'cache_write', 'total', 'flags')
+        with self._lock:
+            cols = [getattr(self, name)[:] for name in names]
+            root = str(self._root) if self._root is not None else None
+            models, triggers = self.models.values(), self.triggers.values()
+            files = [
+                (key, self.agents[st.agent_idx], st.offset, st.size, st.mtime, st.file_idx)
+                for key, st in self._files.items()
+            ]
+        rows: Dict[int, List[List[int]]] = {}
+        file_col, values = cols[0], cols[1:]
+        for i, file_idx in enumerate(file_col):
+            rows.setdefault(file_idx, []).append([col[i] for col in values])
+        return {
+            'root': root,
+            'models': models,
+            'triggers': triggers,
+            'files': [
+                {
+                    'path': key,
+                    'agent': agent,
+                    'offset': offset,
+                    'size': size,
+                    'mtime': mtime,
+                    'rows': rows.get(file_idx, []),
+                }
+                for key, agent, offset, size, mtime, file_idx in files
+            ],
+        }
+
+    def restore_snapshot(self, data: Dict[str, Any], valid: Callable[[Dict[str, Any]], bool]) -> int:
+        """空表时按快照恢复 valid 通过的文件，返回恢复的文件数"""
+        with self._lock:
+            if self._files or not data.get('root'):
+                return 0
+            models, triggers = data.get('models') or [], data.get('triggers') or []
+            self._root = Path(data['root'])
+            restored = 0
+            for f in data.get('files') or []:
+                if not valid(f):
+                    continue
+                st = self._new_state(f['path'], f['agent'])
+                st.offset, st.size, st.mtime = f['offset'], f['size'], f['mtime']
+                st.parents_complete = False
+                self._append_rows(st, [
+                    (r[0], models[r[1]], triggers[r[2]], r[3], r[4], r[5], r[6], r[7], r[8])
+                    for r in f['rows']
+                ])
+                restored += 1
+            return restored
+
+    # ---------- query ----------
+
+    def _match(self, since_ms: Optional[int], until_ms: Optional[int],
+               agent_id: Optional[str], requests_only: bool) -> Iterable[int]:
+        agent_idx = None
+        if agent_id is not None:
+            agent_idx = self.agents.lookup(agent_id)
+            if agent_idx is None:
+                return ()
+        self._ensure_order()
+        order_ts = self._order_ts
+        if self.retention_ms is not None:
+            # 尚未压缩掉的过期行不返回
+            cutoff = int(time.time() * 1000) - self.retention_ms
+            since_ms = cutoff if since_ms is None else max(since_ms, cutoff)
+        lo = bisect.bisect_left(order_ts, since_ms) if since_ms is not None else 0
+        hi = bisect.bisect_left(order_ts, until_ms) if until_ms is not None else len(order_ts)
+        rows = self._order[lo:hi]
+        if agent_idx is None and not requests_only:
+            return rows
+        agent, flags = self.agent, self.flags
+        return [
+            i for i in rows
+            if (agent_idx is None or agent[i] == agent_idx)
+            and (not requests_only or flags[i] & FLAG_REQUEST)
+        ]
+
+    def records(self, since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                agent_id: Optional[str] = None, requests_only: bool = True) -> List[Dict[str, Any]]:
+        """按时间窗 [since_ms, until_ms) 物化为 dict（仅命中行，时间升序）"""
+        with self._lock:
+            return [self._row(i) for i in self._match(since_ms, until_ms, agent_id, requests_only)]
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        return {
+            'timestampMs': self.ts_ms[i],
+            'agentId': self.agents[self.agent[i]],
+            'sessionId': self.sessions[self.session[i]],
+            'model': self.models[self.model[i]],
+            'trigger': self.triggers[self.trigger[i]],
+            'tokens': self.total[i],
+            'inputTokens': self.input[i],
+            'outputTokens': self.output[i],
+            'cacheRead': self.cache_read[i],
+            'cacheWrite': self.cache_write[i],
+            'isRequest': bool(self.flags[i] & FLAG_REQUEST),
+        }
+
+    def recent_calls(self, since_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近的 assistant 调用（至多 RECENT_CALLS_CAPACITY 条，时间升序）"""
+        with self._lock:
+            return self.recent.snapshot(since_ms)
+
+    def aggregate(self, since_ms: int, bucket_ms: int, requests_only: bool = False,
+                  ) -> Tuple[Dict[int, List[int]], Dict[str, List[int]]]:
+        """
+        按时间桶与 agent 汇总。
+
+        Returns:
+            (buckets, by_agent)：值均为 [tokens, requests, input, output, cacheRead, cacheWrite]，
+            buckets 的键为 ts_ms // bucket_ms
+        """
+        buckets: Dict[int, List[int]] = {}
+        by_agent: Dict[str, List[int]] = {}
+        with self._lock:
+            for i in self._match(since_ms, None, None, requests_only):
+                vals = (
+                    self.total[i], 1 if self.flags[i] & FLAG_REQUEST else 0,
+                    self.input[i], self.output[i], self.cache_read[i], self.cache_write[i],
+                )
+                for acc in (
+                    buckets.setdefault(self.ts_ms[i] // bucket_ms, [0] * 6),
+                    by_agent.setdefault(self.agents[self.agent[i]], [0] * 6),
+                ):
+                    for k, v in enumerate(vals):
+                        acc[k] += v
+        return buckets, by_agent
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            column_bytes = sum(
+                getattr(self, n).itemsize * len(getattr(self, n))
+                for n in self._I64_COLUMNS + self._INT_COLUMNS + ('flags',)
+            )
+            return {
+                'rows': len(self),
+                'files': len(self._files),
+                'agents': len(self.agents),
+                'models': len(self.models),
+                'triggers': len(self.triggers),
+                'column_bytes': column_bytes,
+                'evicted': self.evicted,
+            }
+
+
+_store_instance: Optional[UsageTable] = None
+_store_lock = threading.Lock()
+
+
+def get_usage_store() -> UsageTable:
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            days = get_fortify_config().usage_retention_days
+            _store_instance = UsageTable(days * 86_400_000 if days > 0 else None)
+        return _store_instance
+
+
+def sync_usage_store(since_ms: Optional[int] = None) -> UsageTable:
+    """以当前 OpenClaw 根目录增量同步全局 usage 表；since_ms 为查询时间窗起点"""
+    from data.config_reader import get_openclaw_root
+
+    store = get_usage_store()
+    store.sync_agents_dir(get_openclaw_root() / 'agents', since_ms)
+    return store
+
+
+def reset_usage_store_for_tests() -> None:
+    global _store_instance
+    with _store_lock:
+        _store_instance = None
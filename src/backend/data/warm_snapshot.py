@@ -0,0 +1,184 @@
+"""
+启动快照 - 关闭时与周期性地把派生状态写入 Dashboard 数据目录，启动时按文件检查点恢复仍有效的部分
+
+- 分区：usage 表、session 计数、框架错误时间序列、session 清单、上次推送的 Agent 状态
+- 每个文件条目带 (size, mtime) 检查点：与当前文件一致才恢复；可增量续读的分区允许文件此后仅有追加
+- 快照版本或 OpenClaw 根目录不一致时整体丢弃；恢复只填充空的缓存，不覆盖已有数据
+- 已自带持久化的缓存（错误索引、冻结的 run 解析结果、任务历史）不在此重复保存；session 错误的时间序列与错误簇启动后从错误索引重新计入
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.error_handler import record_error
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = "warm_snapshot.json"
+
+_stats_lock = threading.Lock()
+_last_restore: Optional[Dict[str, Any]] = None
+_last_write: Optional[Dict[str, Any]] = None
+
+
+def snapshot_path() -> Path:
+    from data.task_history import get_dashboard_data_dir
+
+    return get_dashboard_data_dir() / SNAPSHOT_FILE
+
+
+def _file_unchanged(entry: Dict[str, Any]) -> bool:
+    try:
+        st = os.stat(entry["path"])
+    except (OSError, KeyError, TypeError):
+        return False
+    return st.st_size == entry.get("size") and st.st_mtime == entry.get("mtime")
+
+
+def _file_appended(entry: Dict[str, Any]) -> bool:
+    """文件未变，或自检查点以来只增长（与运行期增量读取的截断 / 重写判定一致）"""
+    try:
+        st = os.stat(entry["path"])
+    except (OSError, KeyError, TypeError):
+        return False
+    size = entry.get("size")
+    if not isinstance(size, int) or st.st_size < max(size, int(entry.get("offset") or 0)):
+        return False
+    return st.st_size > size or st.st_mtime == entry.get("mtime")
+
+
+def _sections() -> Dict[str, Tuple[Callable[[], Any], Callable[[Any], int]]]:
+    """分区名 -> (导出, 恢复)；恢复返回恢复的条目数"""
+    from data.error_rollup_feed import get_error_rollup_feed
+    from data.session_counters import get_session_counter_index
+    from data.session_manifest import get_session_manifest
+    from data.usage_store import get_usage_store
+    from status.change_tracker import get_tracker
+
+    usage = get_usage_store()
+    counters = get_session_counter_index()
+    feed = get_error_rollup_feed()
+    manifest = get_session_manifest()
+    tracker = get_tracker()
+    return {
+        # usage 恢复的文件没有 parents，有新增时会整文件重读：只恢复未变的文件
+        "usage": (usage.export_snapshot, lambda d: usage.restore_snapshot(d, _file_unchanged)),
+        "sessionCounters": (counters.export_snapshot, lambda d: counters.restore_snapshot(d, _file_appended)),
+        "errorRollups": (feed.export_snapshot, feed.restore_snapshot),
+        "sessionManifest": (manifest.export_snapshot, lambda d: manifest.restore_snapshot(d, _file_appended)),
+        "lastBroadcast": (tracker.export_snapshot, tracker.restore_snapshot),
+    }
+
+
+def write_warm_snapshot(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """导出各分区并原子写入；返回写入统计，失败时为 None"""
+    global _last_write
+    from data.config_reader import get_openclaw_root
+
+    path = path or snapshot_path()
+    started = time.perf_counter()
+    sections: Dict[str, Any] = {}
+    for name, (export, _) in _sections().items():
+        try:
+            sections[name] = export()
+        except Exception as e:
+            record_error("unknown", str(e), f"warm_snapshot:export:{name}", exc=e)
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "root": str(get_openclaw_root()),
+        "writtenAt": int(time.time() * 1000),
+        "sections": sections,
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        size = path.stat().st_size
+    except (OSError, TypeError, ValueError) as e:
+        record_error("io-error", str(e), "warm_snapshot:write", exc=e)
+        return None
+    result = {
+        "at": payload["writtenAt"],
+        "bytes": size,
+        "durationMs": round((time.perf_counter() - started) * 1000, 2),
+        "sections": sorted(sections),
+    }
+    with _stats_lock:
+        _last_write = result
+    return result
+
+
+def restore_warm_snapshot(path: Optional[Path] = None) -> Dict[str, Any]:
+    """读取快照并按文件检查点恢复；返回各分区恢复条目数"""
+    global _last_restore
+    from data.config_reader import get_openclaw_root
+
+    path = path or snapshot_path()
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"status": "missing", "sections": {}}
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            record_error("parsing-error", str(e), "warm_snapshot:load", exc=e)
+            payload = None
+        if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+            result["status"] = "incompatible"
+        elif payload.get("root") != str(get_openclaw_root()):
+            result["status"] = "root_changed"
+        else:
+            result["status"] = "restored"
+            result["writtenAt"] = payload.get("writtenAt")
+            data = payload.get("sections") or {}
+            for name, (_, restore) in _sections().items():
+                if name not in data:
+                    continue
+                try:
+                    result["sections"][name] = restore(data[name])
+                except Exception as e:
+                    record_error("parsing-error", str(e), f"warm_snapshot:restore:{name}", exc=e)
+                    result["sections"][name] = 0
+    result["durationMs"] = round((time.perf_counter() - started) * 1000, 2)
+    with _stats_lock:
+        _last_restore = result
+    return result
+
+
+def start_warm_snapshot_background() -> Optional[threading.Event]:
+    """OPENCLAW_WARM_SNAPSHOT_SEC > 0 时启动周期写入线程，返回用于停止的 Event"""
+    from core.config_fortify import get_fortify_config
+
+    interval = get_fortify_config().warm_snapshot_interval_sec
+    if interval <= 0:
+        return None
+
+    stop = threading.Event()
+
+    def loop() -> None:
+        while not stop.wait(timeout=interval):
+            try:
+                write_warm_snapshot()
+            except Exception as e:
+                record_error("unknown", str(e), "warm_snapshot:periodic", exc=e)
+
+    threading.Thread(target=loop, daemon=True, name="openclaw_warm_snapshot").start()
+    return stop
+
+
+def get_warm_snapshot_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {"lastRestore": _last_restore, "lastWrite": _last_write}
+
+
+def reset_warm_snapshot_stats_for_tests() -> None:
+    global _last_restore, _last_write
+    with _stats_lock:
+        _last_restore = None
+        _last_write = None
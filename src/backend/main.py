@@ -1,12 +1,39 @@
 """
 OpenClaw Agent Dashboard - 主入口
 """
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+import sys
 from pathlib import Path
-import asyncio
+
+sys.path.append(str(Path(__file__).parent))
+
+# 启动耗时以此为零点（须先于 fastapi 等导入）
+from core.startup_profile import get_startup_report, mark_startup, startup_phase
+
+with startup_phase("import:fastapi"):
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+    import asyncio
+
+
+async def _background_startup() -> None:
+    """不阻塞就绪的启动工作：预加载其余路由、预热状态缓存"""
+    try:
+        await lazy_routers.ensure_loaded()
+        from core.config_fortify import get_fortify_config
+
+        if get_fortify_config().cache_preload:
+            from status.status_calculator import get_agents_with_status
+
+            with startup_phase("cache_preload", background=True):
+                await asyncio.to_thread(get_agents_with_status)
+    except Exception as e:
+        from core.error_handler import record_error
+
+        record_error("unknown", str(e), "main:cache_preload", exc=e)
+    finally:
+        mark_startup("background_done")
 
 
 @asynccontextmanager
@@ -14,21 +41,28 @@ async def lifespan(app: FastAPI):
     """应用生命周期：启动时启动文件监听，关闭时停止"""
     loop = asyncio.get_running_loop()
     probe_stop = None
+    snapshot_stop = None
+    background = None
+    from core.config_fortify import get_fortify_config
+
+    warm_snapshot = get_fortify_config().warm_snapshot
+    if warm_snapshot:
+        try:
+            from data.warm_snapshot import restore_warm_snapshot, start_warm_snapshot_background
+
+            with startup_phase("warm_snapshot:restore"):
+                restore_warm_snapshot()
+            snapshot_stop = start_warm_snapshot_background()
+        except Exception as e:
+            from core.error_handler import record_error
+
+            record_error("unknown", str(e), "main:warm_snapshot", exc=e)
     try:
         from watchers.file_watcher import start_file_watcher
-        from core.config_fortify import get_fortify_config
 
-        start_file_watcher(loop)
-        cfg = get_fortify_config()
-        if cfg.cache_preload:
-            try:
-                from status.status_calculator import get_agents_with_status
-
-                get_agents_with_status()
-            except Exception as e:
-                from core.error_handler import record_error
-
-                record_error("unknown", str(e), "main:cache_preload", exc=e)
+        with startup_phase("file_watcher"):
+            start_file_watcher(loop)
+        background = asyncio.create_task(_background_startup())
         from status.cache_fp_probe import start_cache_fp_probe_background
 
         probe_stop = start_cache_fp_probe_background()
@@ -36,13 +70,27 @@ async def lifespan(app: FastAPI):
         from core.error_handler import record_error
 
         record_error("unknown", str(e), "main:file_watcher_start", exc=e)
+    mark_startup("ready")
     yield
     try:
+        if background is not None and not background.done():
+            background.cancel()
         if probe_stop is not None:
             probe_stop.set()
+        if snapshot_stop is not None:
+            snapshot_stop.set()
         from watchers.file_watcher import stop_file_watcher
+        from data.parallel_scan import shutdown_scan_pool
 
         stop_file_watcher()
+        from data.run_session_cache import get_run_session_cache
+
+        get_run_session_cache().flush()
+        if warm_snapshot:
+            from data.warm_snapshot import write_warm_snapshot
+
+            write_warm_snapshot()
+        shutdown_scan_pool()
     except Exception:
         pass
 
@@ -55,6 +103,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 条件 GET（ETag / If-None-Match）；须在 CORS 之前添加，使 304 响应同样带 CORS 头
+from core.http_cache import ConditionalGetMiddleware
+
+app.add_middleware(ConditionalGetMiddleware)
+
 # CORS 配置
 app.add_middleware(
     CORSMiddleware,
@@ -65,26 +118,34 @@ app.add_middleware(
 )
 
 # 导入路由（必须在 StaticFiles 之前注册，否则 /api 会被静态服务拦截）
-import sys
-sys.path.append(str(Path(__file__).parent))
+# 首屏需要的 agents 路由立即注册；其余模块由后台任务预加载，未加载完时请求未命中路由会先同步加载
+from core.lazy_routers import LazyRouterMiddleware, LazyRouters
 
-from api import agents, subagents, websocket, performance, collaboration, agents_config, errors, timeline, chains, agent_config_api, error_analysis, debug_paths, version, fortify_routes
+with startup_phase("import:api.agents"):
+    from api import agents
 
-# 注册 API 路由
 app.include_router(agents.router, prefix="/api", tags=["agents"])
-app.include_router(errors.router, prefix="/api", tags=["errors"])
-app.include_router(fortify_routes.router, prefix="/api", tags=["fortify"])
-app.include_router(agents_config.router, prefix="/api", tags=["agents-config"])
-app.include_router(subagents.router, prefix="/api", tags=["subagents"])
-app.include_router(websocket.router, tags=["websocket"])
-app.include_router(performance.router, prefix="/api", tags=["performance"])
-app.include_router(collaboration.router, prefix="/api", tags=["collaboration"])
-app.include_router(timeline.router, prefix="/api", tags=["timeline"])
-app.include_router(chains.router, prefix="/api", tags=["chains"])
-app.include_router(agent_config_api.router, prefix="/api", tags=["agent-config"])
-app.include_router(error_analysis.router, prefix="/api", tags=["error-analysis"])
-app.include_router(debug_paths.router, prefix="/api", tags=["debug"])
-app.include_router(version.router, prefix="/api", tags=["version"])
+
+lazy_routers = LazyRouters(app, [
+    ("api.errors", {"prefix": "/api", "tags": ["errors"]}),
+    ("api.fortify_routes", {"prefix": "/api", "tags": ["fortify"]}),
+    ("api.agents_config", {"prefix": "/api", "tags": ["agents-config"]}),
+    ("api.subagents", {"prefix": "/api", "tags": ["subagents"]}),
+    ("api.websocket", {"tags": ["websocket"]}),
+    ("api.performance", {"prefix": "/api", "tags": ["performance"]}),
+    ("api.collaboration", {"prefix": "/api", "tags": ["collaboration"]}),
+    ("api.timeline", {"prefix": "/api", "tags": ["timeline"]}),
+    ("api.chains", {"prefix": "/api", "tags": ["chains"]}),
+    ("api.agent_config_api", {"prefix": "/api", "tags": ["agent-config"]}),
+    ("api.error_analysis", {"prefix": "/api", "tags": ["error-analysis"]}),
+    ("api.debug_paths", {"prefix": "/api", "tags": ["debug"]}),
+    ("api.version", {"prefix": "/api", "tags": ["version"]}),
+])
+app.add_middleware(LazyRouterMiddleware, routers=lazy_routers)
+
+from api.conditional_get import register_conditional_routes
+
+register_conditional_routes()
 
 
 @app.get("/health")
@@ -103,6 +164,18 @@ async def get_config():
         return {"mainAgentId": "main"}
 
 
+@app.get("/api/health/startup")
+async def get_startup_timing():
+    """启动耗时：各导入 / 初始化阶段、就绪时刻与后台预加载完成时刻（毫秒）"""
+    from data.warm_snapshot import get_warm_snapshot_stats
+
+    return {
+        **get_startup_report(),
+        "lazyRoutersLoaded": lazy_routers.loaded,
+        "warmSnapshot": get_warm_snapshot_stats(),
+    }
+
+
 # 前端静态文件（必须放在 API 路由之后，否则会拦截 /api 请求）
 # 插件形态：dashboard/ 与 frontend-dist/ 同级；开发形态：src/backend/ 与 frontend/dist 同级
 _plugin_frontend = Path(__file__).parent.parent / "frontend-dist"
@@ -110,3 +183,4 @@ _dev_frontend = Path(__file__).parent.parent.parent / "frontend" / "dist"
 frontend_dist = _plugin_frontend if _plugin_frontend.exists() else _dev_frontend
 if frontend_dist.exists():
     app.mount("/", StaticFiles(directory=str(frontend_dist), html=True), name="frontend")
+mark_startup("app_created")
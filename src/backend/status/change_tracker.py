@@ -104,6 +104,25 @@ class ChangeTracker:
             return {k: v for k, v in state.items() if not k.startswith('_')}
 
 
+    def export_snapshot(self) -> Dict[str, Any]:
+        """上次推送的各 Agent 状态（启动快照）"""
+        with self._lock:
+            return {
+                agent_id: {k: v for k, v in state.items() if not k.startswith('_')}
+                for agent_id, state in self._last_states.items()
+            }
+
+    def restore_snapshot(self, data: Dict[str, Any]) -> int:
+        with self._lock:
+            if self._last_states:
+                return 0
+            now = time.time()
+            for agent_id, state in list(data.items())[:self.MAX_SNAPSHOTS]:
+                if isinstance(state, dict):
+                    self._last_states[agent_id] = {**state, '_updated_at': now}
+            return len(self._last_states)
+
+
 # 全局单例
 _tracker = ChangeTracker()
 
@@ -2,9 +2,18 @@
 API 状态检测器
 """
 import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
-import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from core.config_fortify import get_fortify_config
+from core.error_handler import record_error
+from utils.jsonl_tail import is_rewritten
+
+SECTION_MARK = b'## '
 
 
 def _get_failure_log_paths() -> List[Path]:
@@ -25,25 +34,204 @@ def _get_failure_log_paths() -> List[Path]:
     return [fallback] if fallback.exists() else []
 
 
+def _parse_section(section: str) -> Optional[Dict[str, Any]]:
+    entry = {
+        'timestamp': extract_timestamp(section),
+        'model': extract_model(section),
+        'error_type': extract_error_type(section),
+        'message': extract_message(section)
+    }
+    return entry if entry['model'] and entry['error_type'] else None
+
+
+def _entry_id(path: str, offset: int) -> str:
+    """条目唯一 id：workspace 目录名 + 分节起始偏移（日志位于 <workspace>/memory/model-failures.log）"""
+    return f"model-{Path(path).parent.parent.name}-{offset}"
+
+
+def _section_starts(data: bytes) -> List[int]:
+    """'## ' 分节标记的位置（与 str.split('## ') 的切分点一致）"""
+    starts = []
+    pos = data.find(SECTION_MARK)
+    while pos >= 0:
+        starts.append(pos)
+        pos = data.find(SECTION_MARK, pos + len(SECTION_MARK))
+    return starts
+
+
+def _count_model(models: Dict[str, List[int]], entry: Dict[str, Any]) -> None:
+    agg = models.setdefault(entry['model'], [0, 0])
+    agg[0] += 1
+    agg[1] = max(agg[1], entry['timestamp'])
+
+
+@dataclass
+class _LogState:
+    # in_section 时为最后一个（可能仍在写入的）分节的起始偏移，否则为前言的扫描位置
+    offset: int = 0
+    in_section: bool = False
+    size: int = 0
+    mtime: float = 0.0
+    entries: Deque[Dict[str, Any]] = field(default_factory=deque)
+    tail: Optional[Dict[str, Any]] = None
+    # 模型 -> [累计错误数, 最近错误时间]
+    models: Dict[str, List[int]] = field(default_factory=dict)
+    # 文件重建时换代；parsed 为本代已封闭的分节数
+    generation: int = 0
+    parsed: int = 0
+
+
+class FailureLogTail:
+    """
+    model-failures.log 增量解析（线程安全）
+
+    - 每个日志文件记录最后一个分节的起始偏移：已被下一个 '## ' 封闭的分节只解析一次，
+      仅重读最后一个分节（可能仍在追加）
+    - 解析结果只保留最近 max_entries 条；按模型的累计错误数不受保留上限影响
+    - 文件截断或原地重写时从头解析
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._files: Dict[str, _LogState] = {}
+        self._lock = threading.Lock()
+        self._merged: Optional[List[Dict[str, Any]]] = None
+        self._generation = 0
+        self.bytes_read = 0
+
+    def _sync_file(self, key: str, st: os.stat_result) -> None:
+        state = self._files.get(key)
+        if state is None or is_rewritten(st.st_size, st.st_mtime, state.offset, state.size, state.mtime):
+            self._generation += 1
+            state = self._files[key] = _LogState(
+                entries=deque(maxlen=self.max_entries), generation=self._generation
+            )
+        elif st.st_size == state.size:
+            return
+        with open(key, 'rb') as f:
+            f.seek(state.offset)
+            data = f.read()
+        self.bytes_read += len(data)
+        state.size, state.mtime = st.st_size, st.st_mtime
+        self._merged = None
+
+        starts = _section_starts(data)
+        if not starts:
+            if not state.in_section:
+                # 尚未出现分节：跳过前言，只保留末尾可能不完整的标记
+                state.offset += max(0, len(data) - (len(SECTION_MARK) - 1))
+            return
+        # 相邻标记之间为已封闭的分节；最后一个标记到文件末尾为未封闭分节
+        for begin, end in zip(starts, starts[1:]):
+            entry = _parse_section(data[begin + len(SECTION_MARK):end].decode('utf-8', errors='replace'))
+            if entry is not None:
+                entry['id'] = _entry_id(key, state.offset + begin)
+                state.entries.append(entry)
+                state.parsed += 1
+                _count_model(state.models, entry)
+        state.tail = _parse_section(data[starts[-1] + len(SECTION_MARK):].decode('utf-8', errors='replace'))
+        if state.tail is not None:
+            state.tail['id'] = _entry_id(key, state.offset + starts[-1])
+        state.offset += starts[-1]
+        state.in_section = True
+
+    def sync(self, paths: List[Path]) -> None:
+        with self._lock:
+            keys = set()
+            for p in paths:
+                key = str(p)
+                keys.add(key)
+                try:
+                    st = os.stat(key)
+                    self._sync_file(key, st)
+                except OSError as e:
+                    record_error("io-error", str(e), "error_detector:failure_log", exc=e)
+                    self._files.pop(key, None)
+                    self._merged = None
+            for key in [k for k in self._files if k not in keys]:
+                del self._files[key]
+                self._merged = None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """按时间倒序的最近条目（最多 max_entries 条）"""
+        with self._lock:
+            if self._merged is None:
+                merged = []
+                for state in self._files.values():
+                    merged.extend(state.entries)
+                    if state.tail is not None:
+                        merged.append(state.tail)
+                merged.sort(key=lambda x: (x['timestamp'], x['id']), reverse=True)
+                self._merged = merged[:self.max_entries]
+            return list(self._merged)
+
+    def model_summary(self) -> Dict[str, List[int]]:
+        """模型 -> [累计错误数, 最近错误时间]（含已超出保留上限的条目），按最近错误时间倒序"""
+        with self._lock:
+            models: Dict[str, List[int]] = {}
+            for state in self._files.values():
+                for model, (count, last_ts) in state.models.items():
+                    agg = models.setdefault(model, [0, 0])
+                    agg[0] += count
+                    agg[1] = max(agg[1], last_ts)
+                if state.tail is not None:
+                    _count_model(models, state.tail)
+        return dict(sorted(models.items(), key=lambda kv: kv[1][1], reverse=True))
+
+    def changes(
+        self, seen: Dict[str, Tuple[int, int]]
+    ) -> Dict[str, Tuple[int, int, List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """
+        各文件相对 seen[path] = (generation, parsed) 新封闭的条目（时间顺序）与当前未封闭分节。
+        generation 不同表示文件已重建，返回保留中的全部条目。
+
+        Returns:
+            {path: (generation, parsed, 新条目, 未封闭分节)}
+        """
+        out = {}
+        with self._lock:
+            for key, state in self._files.items():
+                generation, parsed = seen.get(key, (None, 0))
+                if generation != state.generation:
+                    parsed = 0
+                new = min(state.parsed - parsed, len(state.entries))
+                entries = [state.entries[-i] for i in range(new, 0, -1)]
+                out[key] = (state.generation, state.parsed, entries, state.tail)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'files': len(self._files), 'bytesRead': self.bytes_read}
+
+
+_tail_instance: Optional[FailureLogTail] = None
+_tail_lock = threading.Lock()
+
+
+def get_failure_log_tail() -> FailureLogTail:
+    global _tail_instance
+    with _tail_lock:
+        if _tail_instance is None:
+            _tail_instance = FailureLogTail(get_fortify_config().failure_log_max_entries)
+        return _tail_instance
+
+
+def reset_failure_log_tail_for_tests() -> None:
+    global _tail_instance
+    with _tail_lock:
+        _tail_instance = None
+
+
+def sync_failure_logs() -> FailureLogTail:
+    """把所有 workspace 的 model-failures.log 增量同步到内存"""
+    tail = get_failure_log_tail()
+    tail.sync(_get_failure_log_paths())
+    return tail
+
+
 def parse_failure_log() -> List[Dict[str, Any]]:
-    """解析失败日志（合并所有 workspace 的 model-failures.log）"""
-    log_paths = _get_failure_log_paths()
-    entries = []
-    for log_path in log_paths:
-        with open(log_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            sections = content.split('## ')
-            for section in sections[1:]:
-                entry = {
-                    'timestamp': extract_timestamp(section),
-                    'model': extract_model(section),
-                    'error_type': extract_error_type(section),
-                    'message': extract_message(section)
-                }
-                if entry['model'] and entry['error_type']:
-                    entries.append(entry)
-    entries.sort(key=lambda x: x['timestamp'], reverse=True)
-    return entries
+    """解析失败日志（合并所有 workspace 的 model-failures.log，增量维护，按时间倒序）"""
+    return sync_failure_logs().entries()
 
 
 def extract_timestamp(text: str) -> int:
@@ -88,35 +276,3 @@ def extract_message(text: str) -> str:
         if '错误类型' in line or 'error' in line.lower():
             return line.strip()
     return ''
-
-
-def get_api_status() -> List[Dict[str, Any]]:
-    """获取 API 状态"""
-    failures = parse_failure_log()
-    
-    # 按 provider/model 分组
-    status_map = {}
-    
-    for failure in failures:
-        model = failure['model']
-        if model not in status_map:
-            status_map[model] = {
-                'model': model,
-                'status': 'healthy',
-                'lastError': None,
-                'errorCount': 0
-            }
-        
-        status_map[model]['errorCount'] += 1
-        
-        # 检查是否最近5分钟有错误
-        if failure['timestamp'] > int(time.time() * 1000) - 300000:
-            status_map[model]['status'] = 'degraded'
-            if not status_map[model]['lastError']:
-                status_map[model]['lastError'] = {
-                    'type': failure['error_type'],
-                    'message': failure['message'],
-                    'timestamp': failure['timestamp']
-                }
-    
-    return list(status_map.values())
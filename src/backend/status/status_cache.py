@@ -10,10 +10,19 @@ import time
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-try:
-    import psutil
-except ImportError:
-    psutil = None  # type: ignore
+_psutil: Any = False  # False：尚未尝试导入；None：未安装
+
+
+def _get_psutil() -> Any:
+    """psutil 只在读取统计时用到，首次调用时再导入"""
+    global _psutil
+    if _psutil is False:
+        try:
+            import psutil
+        except ImportError:
+            psutil = None  # type: ignore
+        _psutil = psutil
+    return _psutil
 
 
 def _estimate_payload_size(data: Dict[str, Any]) -> int:
@@ -191,6 +200,7 @@ class StatusCache:
             total = self._hits + self._misses
             hit_rate = (self._hits / total) if total else 0.0
             rss_mb = None
+            psutil = _get_psutil()
             if psutil:
                 try:
                     rss_mb = round(psutil.Process().memory_info().rss / (1024 * 1024), 2)
@@ -8,8 +8,14 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 import logging
 import time
-from typing import Literal, Dict, Any, List
-from data.config_reader import get_agents_list, get_agent_config, get_main_agent_id, agent_ids_equal
+from typing import Literal, Dict, Any, Iterable, List, Optional
+from data.config_reader import (
+    agent_ids_equal,
+    get_agent_config,
+    get_agents_list,
+    get_main_agent_id,
+    normalize_openclaw_agent_id,
+)
 from data.subagent_reader import is_agent_working, get_agent_runs
 from data.session_reader import (
     has_recent_errors,
@@ -378,18 +384,24 @@ def get_display_status(agent_id: str) -> Dict[str, Any]:
     return {'status': 'working', 'display': '处理中...', 'duration': 0, 'alert': False}
 
 
-async def get_changed_agents() -> List[Dict[str, Any]]:
+async def get_changed_agents(agent_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
     """
     获取状态发生变化的 Agent 列表
     
     用于增量推送，只返回状态发生变化的 Agent
     
+    Args:
+        agent_ids: 只重算这些 Agent（文件变更只涉及部分 Agent 时）；None 为全部
+    
     Returns:
         变化的 Agent 状态列表（包含 id, status, currentTask, lastActiveAt, error 等）
     """
     tracker = get_tracker()
     
     agents = get_agents_list()
+    if agent_ids is not None:
+        wanted = {normalize_openclaw_agent_id(a) for a in agent_ids}
+        agents = [a for a in agents if normalize_openclaw_agent_id(a.get('id')) in wanted]
     changed_agents = []
     
     for agent in agents:
@@ -14,19 +14,66 @@ sys.path.insert(0, str(BACKEND))
 @pytest.fixture(autouse=True)
 def reset_fortify_state():
     """Reset all fortify singletons between tests."""
+    from api.collaboration import reset_collaboration_cache_for_tests
     from core.config_fortify import refresh_fortify_config_cache
-    from core.error_handler import reset_reliability_metrics_for_tests
+    from core.error_handler import reset_framework_error_stats_for_tests, reset_reliability_metrics_for_tests
+    from core.error_rollups import reset_error_rollups_for_tests
     from core.fallback_manager import reset_fallback_handlers_for_tests
+    from core.http_cache import reset_http_cache_for_tests
+    from data.chain_reader import reset_chain_graph_for_tests
+    from data.error_clusters import reset_error_cluster_table_for_tests
+    from data.error_index import reset_error_index_for_tests
+    from data.error_rollup_feed import reset_error_rollup_feed_for_tests
+    from data.parallel_scan import reset_parallel_scan_for_tests
+    from data.run_session_cache import reset_run_session_cache_for_tests
+    from data.session_counters import reset_session_counters_for_tests
+    from data.session_manifest import reset_session_manifest_for_tests
+    from data.task_history import TaskHistoryStore, reset_task_history_store_for_tests
+    from data.usage_store import reset_usage_store_for_tests
+    from data.warm_snapshot import reset_warm_snapshot_stats_for_tests
+    from status.error_detector import reset_failure_log_tail_for_tests
     from status.status_cache import reset_cache_for_tests
 
     reset_cache_for_tests()
+    reset_collaboration_cache_for_tests()
+    reset_http_cache_for_tests()
+    reset_chain_graph_for_tests()
+    reset_error_index_for_tests()
+    reset_error_rollups_for_tests()
+    reset_error_rollup_feed_for_tests()
+    reset_error_cluster_table_for_tests()
+    reset_failure_log_tail_for_tests()
+    reset_usage_store_for_tests()
+    reset_parallel_scan_for_tests()
+    reset_session_manifest_for_tests()
+    reset_session_counters_for_tests()
+    reset_warm_snapshot_stats_for_tests()
+    reset_run_session_cache_for_tests()
+    reset_task_history_store_for_tests(TaskHistoryStore(Path(":memory:")))
     reset_fallback_handlers_for_tests()
     reset_reliability_metrics_for_tests()
+    reset_framework_error_stats_for_tests()
     refresh_fortify_config_cache()
     yield
     reset_cache_for_tests()
+    reset_collaboration_cache_for_tests()
+    reset_http_cache_for_tests()
+    reset_chain_graph_for_tests()
+    reset_error_index_for_tests()
+    reset_error_rollups_for_tests()
+    reset_error_rollup_feed_for_tests()
+    reset_error_cluster_table_for_tests()
+    reset_failure_log_tail_for_tests()
+    reset_usage_store_for_tests()
+    reset_parallel_scan_for_tests()
+    reset_session_manifest_for_tests()
+    reset_session_counters_for_tests()
+    reset_warm_snapshot_stats_for_tests()
+    reset_run_session_cache_for_tests()
+    reset_task_history_store_for_tests()
     reset_fallback_handlers_for_tests()
     reset_reliability_metrics_for_tests()
+    reset_framework_error_stats_for_tests()
     refresh_fortify_config_cache()
 
 
@@ -304,6 +304,1310 @@ def test_performance_parse_session_file_uses_fortify_parser(tmp_path):
     assert msgs[0]["is_request"] is True
 
 
+def test_usage_table_incremental_append_and_truncate(tmp_path):
+    """usage 表按字节偏移增量追加；toolResult 触发回溯到发起调用的 assistant；截断后重建。"""
+    import json
+
+    from data.usage_store import UsageTable
+
+    def line(obj):
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    p = tmp_path / "s1.jsonl"
+    p.write_text(
+        line({"type": "message", "id": "u1", "timestamp": "2026-01-01T12:00:00Z",
+              "message": {"role": "user", "content": [{"type": "text", "text": "hi"}]}})
+        + line({"type": "message", "id": "a1", "parentId": "u1", "timestamp": "2026-01-01T12:00:01Z",
+                "message": {"role": "assistant", "model": "m1",
+                            "usage": {"totalTokens": 10, "input": 6, "output": 4},
+                            "content": [{"type": "toolCall", "id": "t1", "name": "exec",
+                                         "arguments": {"command": "ls"}}]}}),
+        encoding="utf-8",
+    )
+    table = UsageTable()
+    assert table.sync_file(p, "main") == 1
+    assert table.sync_file(p, "main") == 0
+
+    with open(p, "a", encoding="utf-8") as f:
+        f.write(line({"type": "message", "id": "r1", "parentId": "a1", "timestamp": "2026-01-01T12:00:02Z",
+                       "message": {"role": "toolResult", "toolName": "exec", "toolCallId": "t1", "content": []}}))
+        f.write(line({"type": "message", "id": "a2", "parentId": "r1", "timestamp": "2026-01-01T12:00:03Z",
+                       "message": {"role": "assistant", "model": "m1",
+                                   "usage": {"totalTokens": 5, "input": 3, "output": 2}, "content": []}}))
+        f.write('{"type": "message", "id": "partial"')
+    assert table.sync_file(p, "main") == 1
+    rows = table.records()
+    assert [r["trigger"] for r in rows] == ["hi", "【完成回传】exec: ls"]
+    assert table.stats()["models"] == 1
+
+    p.write_text("", encoding="utf-8")
+    table.sync_file(p, "main")
+    assert len(table) == 0
+
+
+def test_parallel_cold_scan_matches_serial(monkeypatch, tmp_path):
+    """进程池冷扫描与串行结果一致。"""
+    import json
+
+    from core.config_fortify import refresh_fortify_config_cache
+    from data.usage_store import UsageTable
+
+    agents = tmp_path / "agents"
+    for i in range(6):
+        sd = agents / f"agent-{i % 2}" / "sessions"
+        sd.mkdir(parents=True, exist_ok=True)
+        (sd / f"s{i}.jsonl").write_text(json.dumps({
+            "type": "message", "id": f"a{i}", "timestamp": 1767268800000 + i,
+            "message": {"role": "assistant", "model": "m", "usage": {"totalTokens": i + 1}, "content": []},
+        }) + "\n", encoding="utf-8")
+
+    def totals(workers):
+        monkeypatch.setenv("OPENCLAW_SCAN_WORKERS", str(workers))
+        refresh_fortify_config_cache()
+        table = UsageTable()
+        table.sync_agents_dir(agents)
+        return table.aggregate(0, 60_000)[1]
+
+    assert totals(2) == totals(1) == {"agent-0": [9, 3, 0, 0, 0, 0], "agent-1": [12, 3, 0, 0, 0, 0]}
+
+
+def test_session_manifest_skips_files_outside_window(tmp_path):
+    """时间窗查询不打开 mtime 早于窗口的冷文件；放宽窗口后再解析。"""
+    import json
+    import os
+    import time
+
+    from data.session_manifest import get_session_manifest
+    from data.usage_store import UsageTable
+
+    sd = tmp_path / "agents" / "main" / "sessions"
+    sd.mkdir(parents=True)
+    now_ms = int(time.time() * 1000)
+    for name, ts in (("old", now_ms - 30 * 86_400_000), ("new", now_ms)):
+        p = sd / f"{name}.jsonl"
+        p.write_text(json.dumps({
+            "type": "message", "id": name, "timestamp": ts,
+            "message": {"role": "assistant", "usage": {"totalTokens": 1}, "content": []},
+        }) + "\n", encoding="utf-8")
+        os.utime(p, (ts / 1000, ts / 1000))
+
+    table = UsageTable()
+    table.sync_agents_dir(tmp_path / "agents", since_ms=now_ms - 3_600_000)
+    assert table.stats()["files"] == 1
+    ent = {e.path: e for e in get_session_manifest().refresh(tmp_path / "agents")}[str(sd / "new.jsonl")]
+    assert ent.first_ts_ms == ent.last_ts_ms == now_ms
+
+    table.sync_agents_dir(tmp_path / "agents")
+    assert table.stats()["files"] == 2
+
+
+def test_recent_calls_feed_keeps_newest_regardless_of_ingest_order():
+    """最近调用缓冲按时间戳保留最新 N 条；文件移除时同步剔除。"""
+    from data.usage_store import RecentCallsFeed
+
+    feed = RecentCallsFeed(capacity=3)
+    for ts, file_idx in ((50, 0), (10, 1), (40, 1), (20, 0), (30, 1)):
+        feed.push(ts, file_idx, "a", "s", "m", "t", 1)
+    assert [c["timestampMs"] for c in feed.snapshot()] == [30, 40, 50]
+    assert [c["timestampMs"] for c in feed.snapshot(since_ms=40)] == [40, 50]
+
+    feed.discard_file(1)
+    assert [c["timestampMs"] for c in feed.snapshot()] == [50]
+
+
+def test_usage_parent_map_bounded_by_horizon(monkeypatch, tmp_path):
+    """trigger 溯源的 parent map 按视界淘汰，且只保存 trigger 片段。"""
+    import json
+    from collections import OrderedDict
+
+    from core.config_fortify import refresh_fortify_config_cache
+    from data.usage_store import read_usage_chunk
+
+    monkeypatch.setenv("OPENCLAW_PARENT_MAP_HORIZON", "16")
+    monkeypatch.setenv("OPENCLAW_TRIGGER_SNIPPET_CHARS", "50")
+    refresh_fortify_config_cache()
+
+    lines = [json.dumps({"type": "message", "id": f"u{i}", "timestamp": 1767268800000 + i,
+                         "message": {"role": "user", "content": "x" * 500}}) for i in range(40)]
+    lines.append(json.dumps({"type": "message", "id": "a", "parentId": "u39", "timestamp": 1767268900000,
+                             "message": {"role": "assistant", "usage": {"totalTokens": 1}, "content": []}}))
+    p = tmp_path / "big.jsonl"
+    p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    parents = OrderedDict()
+    rows, consumed = read_usage_chunk(str(p), 0, parents)
+    assert consumed == p.stat().st_size
+    assert len(parents) == 16 and "u0" not in parents
+    assert rows[0][2] == "x" * 50 + "…"
+
+
+def test_collaboration_etag_and_static_topology_cache(monkeypatch, tmp_path):
+    """协作接口：内容不变时 ETag 稳定并可 304；静态拓扑随 openclaw.json 变化重建。"""
+    import asyncio
+    import json
+    import os
+
+    import httpx
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    cfg = tmp_path / "openclaw.json"
+    cfg.write_text(json.dumps({"agents": {"list": [
+        {"id": "main", "default": True, "model": {"primary": "p/m1"}},
+        {"id": "dev", "model": {"primary": "p/m2"}},
+    ]}}), encoding="utf-8")
+    from main import app
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            r1 = await c.get("/api/collaboration")
+            assert r1.status_code == 200
+            etag = r1.headers["etag"]
+            assert etag.startswith('"')
+            assert sorted(r1.json()["models"]) == ["p/m1", "p/m2"]
+
+            r2 = await c.get("/api/collaboration")
+            assert r2.headers["etag"] == etag and r2.content == r1.content
+
+            r3 = await c.get("/api/collaboration", headers={"If-None-Match": etag})
+            assert r3.status_code == 304 and not r3.content
+
+            d1 = await c.get("/api/collaboration/dynamic")
+            d2 = await c.get("/api/collaboration/dynamic", headers={"If-None-Match": d1.headers["etag"]})
+            assert d2.status_code == 304
+
+            cfg.write_text(json.dumps({"agents": {"list": [
+                {"id": "main", "default": True, "model": {"primary": "p/m3"}},
+            ]}}), encoding="utf-8")
+            os.utime(cfg, ns=(cfg.stat().st_mtime_ns + 10**9,) * 2)
+            r4 = await c.get("/api/collaboration", headers={"If-None-Match": etag})
+            assert r4.status_code == 200
+            assert r4.json()["models"] == ["p/m3"]
+
+    asyncio.run(_run())
+
+
+def test_conditional_get_skips_handler_when_sources_unchanged(monkeypatch, tmp_path):
+    """条件 GET：源文件未变时 304 且不执行 handler；runs.json 变化后重新计算。"""
+    import asyncio
+    import json
+    import os
+
+    import httpx
+
+    import api.chains as chains_api
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    runs = tmp_path / "subagents" / "runs.json"
+    runs.parent.mkdir(parents=True)
+    runs.write_text(json.dumps({"version": 2, "runs": {}}), encoding="utf-8")
+    calls = []
+    monkeypatch.setattr(chains_api, "build_task_chains", lambda limit=20: calls.append(limit) or [])
+    monkeypatch.setattr(chains_api, "get_active_chain", lambda: None)
+    from main import app
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            r1 = await c.get("/api/chains")
+            assert r1.status_code == 200
+            etag = r1.headers["etag"]
+            assert etag.startswith('W/"')
+
+            r2 = await c.get("/api/chains", headers={"If-None-Match": etag})
+            assert r2.status_code == 304
+            assert len(calls) == 1
+
+            r3 = await c.get("/api/chains?limit=5", headers={"If-None-Match": etag})
+            assert r3.status_code == 200
+
+            os.utime(runs, ns=(runs.stat().st_mtime_ns + 10**9,) * 2)
+            r4 = await c.get("/api/chains", headers={"If-None-Match": etag})
+            assert r4.status_code == 200 and r4.headers["etag"] != etag
+            assert len(calls) == 3
+
+    asyncio.run(_run())
+
+
+def test_session_counters_parse_only_appended_bytes(tmp_path):
+    """计数索引：追加只解析新增行，半行留待下次，截断后重算。"""
+    import json
+
+    from data.session_counters import SessionCounterIndex
+
+    def line(role, **extra):
+        return json.dumps({"type": "message", "message": {"role": role, "content": extra.pop("content", []), **extra}}) + "\n"
+
+    p = tmp_path / "s.jsonl"
+    p.write_text(line("user") + line("assistant", content=[{"type": "toolCall", "name": "read"}]), encoding="utf-8")
+    idx = SessionCounterIndex()
+    assert idx.get(p).as_dict() == {"messages": 2, "toolCalls": 1, "errors": 0}
+    parsed = idx.stats()["bytesParsed"]
+
+    partial = line("assistant", stopReason="error")
+    with open(p, "a", encoding="utf-8") as f:
+        f.write(partial[:10])
+    assert idx.get(p).messages == 2
+    with open(p, "a", encoding="utf-8") as f:
+        f.write(partial[10:])
+    c = idx.get(p)
+    assert (c.messages, c.errors) == (3, 1)
+    assert idx.stats()["bytesParsed"] == parsed + len(partial)
+
+    p.write_text(line("user"), encoding="utf-8")
+    assert idx.get(p).as_dict() == {"messages": 1, "toolCalls": 0, "errors": 0}
+
+
+def test_run_session_cache_freezes_finished_runs(monkeypatch, tmp_path):
+    """run 级缓存：运行中增量扩展；结束后冻结并落盘，重启后不再读 session 文件。"""
+    import json
+
+    import api.subagents as sa
+    from data.run_session_cache import get_run_session_cache, reset_run_session_cache_for_tests
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path / "oc"))
+    sd = tmp_path / "oc" / "agents" / "dev" / "sessions"
+    sd.mkdir(parents=True)
+    key = "agent:dev:subagent:u1"
+    (sd / "sessions.json").write_text(json.dumps({key: {"sessionId": "u1"}}), encoding="utf-8")
+    session = sd / "u1.jsonl"
+
+    def call(name, task):
+        return json.dumps({"type": "message", "timestamp": 1767268800000, "message": {
+            "role": "assistant", "content": [{"type": "toolCall", "name": name, "arguments": {"task": task}}]}}) + "\n"
+
+    session.write_text(call("subagent", "a"), encoding="utf-8")
+    persist = tmp_path / "run_cache.json"
+    reset_run_session_cache_for_tests(persist)
+    assert [t["task"] for t in sa._extract_subtasks_from_session(key)] == ["a"]
+    with open(session, "a", encoding="utf-8") as f:
+        f.write(call("spawn", "b"))
+    assert [t["task"] for t in sa._extract_subtasks_from_session(key, finished=True)] == ["a", "b"]
+    assert len(sa._extract_timeline_from_session(key)) == 2
+    assert not persist.exists()
+    cache = get_run_session_cache()
+    for _ in range(3):
+        sa._extract_subtasks_from_session(key, finished=True)
+    calls = []
+    assert cache.frozen_extra(key, "generatedFiles", lambda: calls.append(1) or []) == []
+    assert cache.frozen_extra(key, "generatedFiles", lambda: calls.append(1) or []) == []
+    assert len(calls) == 1  # 空结果短期复用，但不落盘
+    cache.flush()
+    cache.flush()
+    assert cache.stats()["saves"] == 1
+    assert "generatedFiles" not in json.loads(persist.read_text(encoding="utf-8"))["extras"].get(key, {})
+
+    session.unlink()
+    reset_run_session_cache_for_tests(persist)
+    assert [t["task"] for t in sa._extract_subtasks_from_session(key, finished=True)] == ["a", "b"]
+    assert get_run_session_cache().stats()["fileReads"] == 0
+
+
+def test_task_history_store_appends_and_imports_legacy_json(tmp_path):
+    """任务历史：旧 JSON 导入一次；已完成任务只追加不覆盖，不限条数，按 runId 查询。"""
+    import json
+
+    from data.task_history import TaskHistoryStore, merge_with_history, reset_task_history_store_for_tests
+
+    legacy = tmp_path / "task_history.json"
+    legacy.write_text(json.dumps({"tasks": [{"id": "old", "startTime": 1, "agentId": "dev"}]}), encoding="utf-8")
+    store = TaskHistoryStore(tmp_path / "history.db", legacy_json=legacy)
+    reset_task_history_store_for_tests(store)
+    assert store.get("old")["agentId"] == "dev"
+
+    runs = [{"runId": f"r{i}", "startedAt": 10 + i, "endedAt": 20 + i} for i in range(250)]
+    to_task = lambda r: {"id": r["runId"], "startTime": r["startedAt"], "status": "completed"}
+    merged = merge_with_history(runs, to_task)
+    assert len(merged) == 100 and merged[0]["id"] == "r249"
+    assert store.count() == 251
+
+    assert store.add_many([{"id": "r0", "startTime": 10, "status": "changed"}]) == 0
+    assert store.get("r0")["status"] == "completed"
+    merged = merge_with_history([], to_task)
+    assert [t["id"] for t in merged[:2]] == ["r249", "r248"]
+
+    reopened = TaskHistoryStore(tmp_path / "history.db", legacy_json=legacy)
+    assert reopened.count() == 251
+    reopened.close()
+
+
+def test_task_list_cursor_pagination_and_filters(monkeypatch):
+    """任务列表：当前 runs 与历史合并后按游标翻页不重不漏；过滤下推；非法游标 400。"""
+    import asyncio
+    import httpx
+
+    from api.pagination import encode_cursor
+    from data.task_history import merge_with_history, task_sort_key
+
+    to_task = lambda r: {"id": r["runId"], "startTime": r["startedAt"], "status": "completed", "agentId": r["agent"]}
+    done = [{"runId": f"h{i}", "startedAt": 100 + i, "endedAt": 200, "agent": "dev" if i % 2 else "qa"} for i in range(30)]
+    merge_with_history(done, to_task)
+    current = [{"runId": "c1", "startedAt": 115, "agent": "dev"}, {"runId": "c2", "startedAt": 500, "agent": "dev"}]
+
+    seen, before = [], None
+    while True:
+        page = merge_with_history(current, to_task, before=before, limit=7)
+        seen.extend(t["id"] for t in page)
+        if len(page) < 7:
+            break
+        before = task_sort_key(page[-1])
+    assert len(seen) == len(set(seen)) == 32 and seen[0] == "c2"
+
+    dev = merge_with_history(current, to_task, agent_id="dev", since=110, until=120, limit=50)
+    assert [t["id"] for t in dev] == ["h19", "h17", "h15", "c1", "h13", "h11"]
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    from main import app
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            assert (await c.get("/api/chains", params={"cursor": "!!"})).status_code == 400
+            r = await c.get("/api/errors", params={"cursor": encode_cursor([1, "x"])})
+            assert r.status_code == 400
+
+    asyncio.run(_run())
+
+
+def test_chain_graph_updates_only_changed_chains(monkeypatch, tmp_path):
+    """链路图：runs.json 变化时只重算受影响链路；按 chainId 直接查找；状态计数同步更新。"""
+    import os
+
+    from data.chain_reader import get_active_chain, get_chain_graph, get_chains_summary, get_task_chain
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    runs_path = tmp_path / "subagents" / "runs.json"
+    runs_path.parent.mkdir(parents=True)
+
+    def write(runs, mtime):
+        runs_path.write_text(json.dumps({"version": 2, "runs": runs}), encoding="utf-8")
+        os.utime(runs_path, (mtime, mtime))
+
+    runs = {
+        f"r{i}": {
+            "requesterSessionKey": f"agent:main:s{i}",
+            "childSessionKey": f"agent:dev:subagent:{i}",
+            "startedAt": 1000 + i,
+            "task": f"t{i}",
+        }
+        for i in range(3)
+    }
+    runs["r2"].update(endedAt=2000, outcome="ok")
+    write(runs, 1_000)
+
+    graph = get_chain_graph()
+    assert get_task_chain("agent:main:s1")["status"] == "running"
+    assert get_active_chain()["chainId"] == "agent:main:s1"
+    assert get_chains_summary()["running"] == 2 and graph.stats()["chainRebuilds"] == 3
+
+    runs["r1"].update(endedAt=3000, outcome="error")
+    del runs["r0"]
+    write(runs, 2_000)
+    assert get_task_chain("agent:main:s1")["status"] == "error"
+    assert get_task_chain("agent:main:s0") is None
+    summary = get_chains_summary()
+    assert (summary["total"], summary["running"], summary["error"]) == (2, 0, 1)
+    assert graph.stats()["chainRebuilds"] == 4
+    assert get_active_chain() is None
+
+
+def test_error_index_incremental_and_seek_detail(monkeypatch, tmp_path):
+    """错误索引：追加时只扫描新增行；详情与工具调用链按偏移定位；不受 session_limit 限制。"""
+    import data.error_analyzer as error_analyzer
+    from data.error_index import get_error_index
+
+    monkeypatch.setattr(error_analyzer, "get_openclaw_root", lambda: tmp_path)
+    sess = tmp_path / "agents" / "dev" / "sessions"
+    sess.mkdir(parents=True)
+
+    def msg(role, **kw):
+        return json.dumps({"type": "message", "message": {"role": role, "content": [], **kw}}) + "\n"
+
+    call = lambda name: msg("assistant", content=[{"type": "toolCall", "name": name, "id": name}])
+    fail = msg("assistant", stopReason="error", errorMessage="429 rate limit")
+    for i in range(7):
+        (sess / f"s{i}.jsonl").write_text(msg("user") + fail, encoding="utf-8")
+    target = sess / "s0.jsonl"
+    target.write_text(msg("user") + call("read") + call("exec") + fail, encoding="utf-8")
+
+    result = error_analyzer.analyze_agent_errors("dev")
+    assert result["summary"]["total"] == 7
+    index = get_error_index()
+    scanned = index.stats()["bytesScanned"]
+
+    with open(target, "a", encoding="utf-8") as f:
+        f.write(call("write") + fail)
+    detail = error_analyzer.get_error_detail("dev", "s0.jsonl", 5)
+    assert detail["errorType"] == "api_rate_limit" and detail["suggestions"]
+    assert [c["toolName"] for c in detail["toolChain"]] == ["read", "exec", "write"]
+    assert index.stats()["bytesScanned"] - scanned == len(call("write") + fail)
+    assert [e["turnIndex"] for e in index.errors(target)] == [3, 5]
+    assert error_analyzer.get_error_detail("dev", "s0.jsonl", 4) is None
+
+    (sess / "s6.jsonl").unlink()
+    syncs = []
+    real_sync = index.sync
+    monkeypatch.setattr(index, "sync", lambda *a, **kw: syncs.append(a) or real_sync(*a, **kw))
+    assert error_analyzer.analyze_all_agents_errors()["globalSummary"]["totalErrors"] == 7
+    assert len(syncs) == 1 and index.stats()["files"] == 6
+
+
+def test_rule_classifier_matches_sequential_priority():
+    """预编译分类与逐条 re.search 的优先级、跨行语义一致；重复消息命中缓存。"""
+    import re
+
+    from api.errors import classify_error as center_classify
+    from data.error_analyzer import ERROR_PATTERNS, ErrorType, _classifier, classify_error
+
+    def reference(msg):
+        for error_type, severity, patterns in ERROR_PATTERNS:
+            if any(re.search(p, msg.lower(), re.IGNORECASE) for p in patterns):
+                return error_type, severity
+        return classify_error("")
+
+    samples = [
+        "execution timeout after tool failed",
+        "tool error: 401 Unauthorized",
+        "Connection refused then rate limit hit",
+        "EACCES: permission denied",
+        "model overloaded, fetch failed",
+        "subagent failed: invalid argument",
+        "rate\nlimit reached, too many\nrequests",
+        "nothing to see",
+    ]
+    for msg in samples:
+        assert classify_error(msg) == reference(msg)
+        assert classify_error(msg) == reference(msg)
+    assert classify_error("tool error: 401 Unauthorized")[0] is ErrorType.API_AUTH
+    assert _classifier.stats()["hits"] >= len(samples)
+    assert center_classify("request timed out (context length)") == "token-limit"
+    assert center_classify("HTTP 403") == "auth"
+
+
+def test_failure_log_tail_parses_only_new_sections(monkeypatch, tmp_path):
+    """model-failures.log：只解析新增分节，末尾未写完的分节随追加更新；截断后重解析。"""
+    import status.error_detector as error_detector
+
+    log = tmp_path / "model-failures.log"
+    monkeypatch.setattr(error_detector, "_get_failure_log_paths", lambda: [log])
+
+    def section(i, model="glm-4", kind="429 rate limit"):
+        return f"## 2026-01-01 00:{i:02d}:00\n- model: {model}\n- error: {kind}\n"
+
+    def legacy():
+        text = log.read_text(encoding="utf-8")
+        parsed = [error_detector._parse_section(s) for s in text.split("## ")[1:]]
+        return sorted((e for e in parsed if e), key=lambda x: x["timestamp"], reverse=True)
+
+    def parsed():
+        # 增量解析的条目额外带唯一 id（workspace + 分节偏移）
+        entries = error_detector.parse_failure_log()
+        assert len({e["id"] for e in entries}) == len(entries)
+        return [{k: v for k, v in e.items() if k != "id"} for e in entries]
+
+    log.write_text("# Model failures\n" + "".join(section(i) for i in range(20)), encoding="utf-8")
+    assert parsed() == legacy()
+    tail = error_detector.get_failure_log_tail()
+    read = tail.stats()["bytesRead"]
+
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(section(30, "qwen-max", "timeout") + "## 2026-01-01 00:31:00\n- model: glm-5")
+    entries = parsed()
+    assert entries == legacy() and entries[0]["model"] == "glm-5"
+    assert tail.stats()["bytesRead"] - read < read // 4
+    with open(log, "a", encoding="utf-8") as f:
+        f.write("\n- error: 超时\n")
+    assert parsed() == legacy()
+    assert tail.model_summary()["glm-4"][0] == 20
+
+    log.write_text(section(1, "qwen-plus"), encoding="utf-8")
+    assert [e["model"] for e in error_detector.parse_failure_log()] == ["qwen-plus"]
+
+
+def test_framework_error_ring_query_and_hourly_buckets(monkeypatch, caplog):
+    import asyncio
+    import logging
+
+    from core import error_handler as eh
+    from core.config_fortify import refresh_fortify_config_cache
+
+    monkeypatch.setenv("OPENCLAW_ERROR_RING_SIZE", "16")
+    monkeypatch.setenv("OPENCLAW_ERROR_STORM_WINDOW_SEC", "0")
+    refresh_fortify_config_cache()
+    with caplog.at_level(logging.ERROR, logger="openclaw.fortify"):
+        for i in range(20):
+            eh.record_error("network" if i % 2 else "timeout", f"e{i}", f"agent_id:a{i % 3}")
+        eh.record_error("unknown", "boom", "api:errors:summary", exc=ValueError("bad"))
+        assert eh.flush_error_log()
+    assert sum("fortify_event" in r.getMessage() for r in caplog.records) == 21
+    assert any(r.exc_info and r.exc_info[0] is ValueError for r in caplog.records)
+
+    recent = eh.query_framework_errors(limit=100)
+    assert len(recent) == 16 and recent[0]["detail"] == "boom"
+    assert [e["seq"] for e in recent] == list(range(21, 5, -1))
+    assert [e["detail"] for e in eh.query_framework_errors(scope="agent_id:a1", error_type="network")] == [
+        "e19", "e13", "e7",
+    ]
+    assert eh.query_framework_errors(since=recent[0]["ts"] + 1) == []
+    assert eh.query_framework_errors(until=recent[-1]["ts"]) == []
+    s = eh.get_framework_error_stats()
+    assert s["total_count"] == 21
+    assert 1 <= len(s["hourly_trend"]) <= 2 and sum(r["count"] for r in s["hourly_trend"]) == 21
+
+    from api.errors import get_reliability_stats
+
+    out = asyncio.run(get_reliability_stats(scope="api:errors", type=None, since=None, until=None, limit=5))
+    assert [e["exc_type"] for e in out["recentErrors"]] == ["ValueError"]
+    assert "watcher_availability_rate" in out
+
+
+def test_record_error_collapses_storms_and_flushes_summary(caplog):
+    import logging
+    import time
+
+    from core import error_handler as eh
+
+    with caplog.at_level(logging.ERROR, logger="openclaw.fortify"):
+        for i in range(50):
+            eh.record_error("io-error", f"cannot read sessions.json at offset {i}", "agent_id:main",
+                            exc=OSError(f"errno {i}"))
+        eh.record_error("io-error", "cannot read openclaw.json", "agent_id:main")
+        assert eh.flush_error_log()
+        events = [r for r in caplog.records if r.getMessage().startswith("fortify_event ")]
+        assert len(events) == 2
+
+        s = eh.get_framework_error_stats()
+        assert s["total_count"] == 51 and s["suppressed_count"] == 49 and s["active_storms"] == 1
+        storm = eh.query_framework_errors(scope="agent_id:main")[-1]
+        assert storm["count"] == 50 and storm["detail"].endswith("offset 0")
+        assert storm["first_seen"] <= storm["last_seen"]
+
+        assert eh.flush_error_storms(time.time() + 3600) == 1
+        assert eh.flush_error_log()
+    summaries = [r.getMessage() for r in caplog.records if "fortify_event_summary" in r.getMessage()]
+    assert len(summaries) == 1 and "count=50 suppressed=49" in summaries[0]
+    assert eh.get_framework_error_stats()["active_storms"] == 0
+
+
+def test_error_rollups_feed_incrementally_and_serve_ranges(monkeypatch, tmp_path):
+    """错误时间序列：session 错误、model-failures.log 与框架错误增量计入；重写时撤回；任意区间查询。"""
+    import asyncio
+    import os
+    import time
+    from datetime import datetime
+
+    import httpx
+
+    import status.error_detector as error_detector
+    from core.error_handler import record_error
+    from data.error_index import get_error_index
+    from data.error_rollup_feed import get_error_rollup_feed, sync_error_rollups
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    log = tmp_path / "model-failures.log"
+    monkeypatch.setattr(error_detector, "_get_failure_log_paths", lambda: [log])
+    sess = tmp_path / "agents" / "dev" / "sessions"
+    sess.mkdir(parents=True)
+    now = int(time.time() * 1000)
+
+    def fail(ts, text, model="glm-5"):
+        body = {"role": "assistant", "content": [], "stopReason": "error", "errorMessage": text,
+                "model": model, "timestamp": ts}
+        return json.dumps({"type": "message", "message": body}) + "\n"
+
+    def section(ts, model):
+        stamp = datetime.fromtimestamp(ts / 1000).strftime("%Y-%m-%d %H:%M:%S")
+        return f"## {stamp}\n- model: {model}\n- error: 429 rate limit\n"
+
+    ok = json.dumps({"type": "message", "message": {"role": "user", "content": []}}) + "\n"
+    target = sess / "s1.jsonl"
+    target.write_text(ok + fail(now - 300_000, "429 rate limit") + fail(now - 7_200_000, "timed out"), encoding="utf-8")
+    log.write_text(section(now - 60_000, "qwen-max") + section(now - 30_000, "glm-4"), encoding="utf-8")
+
+    rollups = sync_error_rollups()
+    assert rollups.breakdown(None, None, "source") == {"session": 2, "model": 2}
+    assert rollups.breakdown(now - 3_600_000, None, "type", source="session") == {"rate-limit": 1}
+    scanned = get_error_index().stats()["bytesScanned"]
+    assert get_error_rollup_feed().stats()["rowsFed"] == 2
+
+    with open(target, "a", encoding="utf-8") as f:
+        f.write(fail(now - 1_000, "401 unauthorized", model="gpt-4o"))
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(section(now - 2_000, "qwen-max"))
+    record_error("io-error", "disk", "agent_id:dev")
+    sync_error_rollups()
+    assert get_error_index().stats()["bytesScanned"] - scanned < scanned
+    assert get_error_rollup_feed().stats()["rowsFed"] == 3
+    assert rollups.breakdown(None, None, "agent") == {"dev": 4, "": 3}
+    assert rollups.breakdown(None, None, "model", source="model") == {"qwen-max": 2, "glm-4": 1}
+
+    target.write_text(fail(now - 10_000, "timed out"), encoding="utf-8")
+    os.utime(target, ns=(time.time_ns(), time.time_ns() + 10**9))
+    sync_error_rollups()
+    assert rollups.breakdown(None, None, "type", source="session") == {"timeout": 1}
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    from main import app
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            r = await c.get("/api/errors/timeseries", params={"since": now - 3_600_000, "groupBy": "provider"})
+            body = r.json()
+            assert r.status_code == 200 and body["step"] == "minute" and len(body["points"]) == 61
+            assert sum(p["groups"].get("qwen", 0) for p in body["points"]) == 2
+            r = await c.get("/api/errors/breakdown", params={"by": "source"})
+            assert {i["key"]: i["count"] for i in r.json()["items"]} == {"model": 3, "session": 1, "framework": 1}
+            stats = (await c.get("/api/errors/stats")).json()
+            assert stats["totalCount"] == 4 and sum(h["count"] for h in stats["hourlyTrend"]) == 4
+            r = await c.get("/api/errors/timeseries", params={"since": 0, "until": now, "step": "minute"})
+            assert r.status_code == 400
+
+    asyncio.run(_run())
+
+
+def test_error_clusters_group_by_signature_and_page_members(monkeypatch, tmp_path):
+    """错误簇：数字 / UUID / 路径 / 时间戳不同的同类错误归为一簇；成员游标翻页；文件重写后撤回。"""
+    import asyncio
+    import uuid
+
+    import httpx
+
+    from core.error_classifier import error_signature
+
+    assert error_signature("Read /tmp/a/b.json failed at 2026-01-02T03:04:05Z (id 42)") == error_signature(
+        "read /var/x/y.json failed at 2026-03-04 05:06 (id 7)"
+    )
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    for agent in ("dev", "qa"):
+        sess = tmp_path / "agents" / agent / "sessions"
+        sess.mkdir(parents=True)
+        lines = []
+        for i in range(60):
+            text = f"429 rate limit: retry after {i}s, request {uuid.uuid4()}"
+            if i % 20 == 0:
+                text = f"request timed out after {i}ms reading /srv/{agent}/{i}.json"
+            body = {"role": "assistant", "content": [], "stopReason": "error", "errorMessage": text,
+                    "timestamp": 1_700_000_000_000 + i * 1000}
+            lines.append(json.dumps({"type": "message", "message": body}) + "\n")
+        (sess / "s.jsonl").write_text("".join(lines), encoding="utf-8")
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    from main import app
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            body = (await c.get("/api/errors/clusters")).json()
+            assert [(cl["type"], cl["count"]) for cl in body["clusters"]] == [("rate-limit", 114), ("timeout", 6)]
+            top = body["clusters"][0]
+            assert top["agents"] == {"dev": 57, "qa": 57} and top["exemplar"]["timestamp"] == top["lastSeen"]
+            assert top["firstSeen"] == 1_700_000_000_000 + 1000
+
+            seen, cursor = [], None
+            while True:
+                params = {"limit": 50, "agent": "dev", **({"cursor": cursor} if cursor else {})}
+                r = (await c.get(f"/api/errors/clusters/{top['id']}/members", params=params)).json()
+                seen.extend(m["id"] for m in r["members"])
+                cursor = r["nextCursor"]
+                if not cursor:
+                    break
+            assert len(seen) == len(set(seen)) == 57
+            assert (await c.get("/api/errors/clusters/nope/members")).status_code == 404
+
+            (tmp_path / "agents" / "qa" / "sessions" / "s.jsonl").write_text("", encoding="utf-8")
+            body = (await c.get("/api/errors/clusters", params={"type": "rate-limit"})).json()
+            assert body["total"] == 1 and body["clusters"][0]["agents"] == {"dev": 57}
+
+    asyncio.run(_run())
+
+
+def test_watcher_dependency_map_scopes_invalidation_and_push(monkeypatch, tmp_path):
+    import asyncio
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    from watchers.dependency_map import (
+        FAILURE_LOG,
+        IGNORED,
+        RUNS,
+        SESSION_INDEX,
+        SESSION_LOG,
+        classify_path,
+        plan_for_paths,
+    )
+
+    root = tmp_path
+    assert classify_path(str(root / "agents" / "dev" / "sessions" / "a.jsonl")) == (SESSION_LOG, "dev")
+    assert classify_path(str(root / "agents" / "dev" / "sessions" / "sessions.json")) == (SESSION_INDEX, "dev")
+    assert classify_path(str(root / "subagents" / "runs.json")) == (RUNS, None)
+    assert classify_path(str(root / "memory" / "model-failures.log")) == (FAILURE_LOG, None)
+    assert classify_path(str(root / "dashboard" / "watcher_state.json"))[0] == IGNORED
+
+    plan = plan_for_paths([str(root / "agents" / "dev" / "sessions" / "a.jsonl")])
+    assert plan.agent_ids == {"dev"} and not plan.all_agents
+    assert "subagents" not in plan.sections and "apiStatus" not in plan.sections
+    assert plan_for_paths([str(root / "openclaw.json")]).full
+    assert plan_for_paths([None]).full
+    assert not plan_for_paths([str(root / "dashboard" / "watcher_state.json")]).sections
+
+    from status.status_cache import get_cache
+    from watchers import file_watcher
+
+    cache = get_cache()
+    cache.set("dev", {"status": "working"})
+    cache.set("qa", {"status": "idle"})
+    file_watcher._apply_change_plan(plan)
+    assert cache.get_stale_fallback("dev") is None
+    assert cache.get_stale_fallback("qa") is not None
+    assert file_watcher.get_watcher_health()["events_by_file_class"][SESSION_LOG] == 1
+
+    import api.websocket as ws
+    import status.status_calculator as sc
+
+    sent = []
+
+    class _Conn:
+        async def send_json(self, message):
+            sent.append(message)
+
+    async def _changed(agent_ids=None):
+        return [{"id": a, "status": "working"} for a in sorted(agent_ids or [])]
+
+    async def _section(name):
+        return [name]
+
+    monkeypatch.setattr(ws, "active_connections", {_Conn()})
+    monkeypatch.setattr(sc, "get_changed_agents", _changed)
+    monkeypatch.setattr(ws, "_build_section", _section)
+    asyncio.run(ws.broadcast_sections(plan.sections, plan.agent_ids))
+
+    assert [m["type"] for m in sent] == ["state_update", "full_state"]
+    assert [a["id"] for a in sent[0]["data"]["agents"]] == ["dev"]
+    assert set(sent[1]["data"]) == {"collaboration", "tasks", "performance"}
+
+
+def test_debounced_handler_batches_paths_on_one_worker():
+    import threading
+
+    from watchers.file_watcher import DebouncedHandler
+
+    batches = []
+    release = threading.Event()
+    delivered = threading.Event()
+
+    def _callback(batch):
+        batches.append(batch)
+        delivered.set()
+        release.wait(5)
+
+    h = DebouncedHandler(_callback, debounce_sec=0.05, max_pending=3)
+    try:
+        h.trigger("/s/agents/dev/sessions/a.jsonl")
+        assert delivered.wait(2)
+        # 回调阻塞期间的变更去重累积，临时文件忽略
+        h.trigger("/s/agents/dev/sessions/b.jsonl")
+        h.trigger("/s/agents/qa/sessions/c.jsonl")
+        h.trigger("/s/agents/dev/sessions/b.jsonl")
+        h.trigger("/s/agents/dev/sessions/sessions.json.tmp")
+        h.trigger("/s/agents/dev/sessions/.#sessions.json")
+        delivered.clear()
+        release.set()
+        assert delivered.wait(2)
+        assert batches[1] == ["/s/agents/dev/sessions/b.jsonl", "/s/agents/qa/sessions/c.jsonl"]
+
+        # 超出 max_pending 收敛为一次全量同步
+        release.clear()
+        delivered.clear()
+        h.trigger("/s/x1.json")
+        assert delivered.wait(2)
+        delivered.clear()
+        for i in range(5):
+            h.trigger(f"/s/y{i}.json")
+        release.set()
+        assert delivered.wait(2)
+        assert batches[-1] == [None]
+        stats = h.stats()
+        assert stats["ignored"] == 2 and stats["coalesced"] >= 1 and stats["overflows"] == 1
+        workers = [t for t in threading.enumerate() if t.name == "file-watcher-batch"]
+        assert len(workers) == 1
+    finally:
+        release.set()
+        h.close()
+
+
+def test_polling_snapshot_diff_and_adaptive_interval(monkeypatch, tmp_path):
+    import os
+
+    from core.config_fortify import refresh_fortify_config_cache
+
+    monkeypatch.setenv("OPENCLAW_WATCHER_POLL_MIN_INTERVAL", "1")
+    monkeypatch.setenv("OPENCLAW_WATCHER_POLL_MAX_INTERVAL", "8")
+    refresh_fortify_config_cache()
+    from watchers.file_watcher import _next_poll_interval, diff_poll_snapshots, take_poll_snapshot
+
+    sessions = tmp_path / "agents" / "dev" / "sessions"
+    sessions.mkdir(parents=True)
+    a = sessions / "a.jsonl"
+    b = sessions / "b.jsonl"
+    a.write_text("{}\n", encoding="utf-8")
+    b.write_text("{}\n", encoding="utf-8")
+    (sessions / "sessions.json.tmp").write_text("{}", encoding="utf-8")
+    (sessions / "notes.txt").write_text("x", encoding="utf-8")
+    dirs = [(sessions, True)]
+
+    prev = take_poll_snapshot(dirs)
+    assert set(prev) == {str(a), str(b)}
+    assert diff_poll_snapshots(prev, take_poll_snapshot(dirs)) == ([], [])
+
+    with a.open("a", encoding="utf-8") as f:
+        f.write("{}\n")
+    st = b.stat()
+    os.utime(b, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    c = sessions / "c.jsonl"
+    c.write_text("{}\n", encoding="utf-8")
+    cur = take_poll_snapshot(dirs)
+    assert diff_poll_snapshots(prev, cur) == (sorted([str(a), str(b), str(c)]), [])
+    a.unlink()
+    assert diff_poll_snapshots(cur, take_poll_snapshot(dirs)) == ([], [str(a)])
+
+    assert _next_poll_interval(5.0, True) == 1.0
+    assert [_next_poll_interval(x, False) for x in (1.0, 2.0, 4.0, 8.0)] == [2.0, 4.0, 8.0, 8.0]
+
+
+def test_watch_registry_registers_new_agents_and_evicts_lru(tmp_path):
+    from watchers.watch_registry import AGENT, ROOT, SESSIONS, WatchRegistry
+
+    agents = tmp_path / "agents"
+    (agents / "a" / "sessions").mkdir(parents=True)
+    (agents / "b" / "sessions").mkdir(parents=True)
+    watched = {}
+    announced = []
+
+    def schedule(path, recursive, kind):
+        watched[path] = (recursive, kind)
+        return path
+
+    reg = WatchRegistry(agents, schedule, lambda h: watched.pop(h), max_watches=3, on_sessions_dir=announced.append)
+    reg.start()
+    assert watched == {
+        str(agents): (False, ROOT),
+        str(agents / "a" / "sessions"): (True, SESSIONS),
+        str(agents / "b" / "sessions"): (True, SESSIONS),
+    }
+
+    # 新 Agent 先监听目录本身，sessions 出现后切换为递归监听 sessions
+    (agents / "c").mkdir()
+    reg.on_dir_created(str(agents / "c"))
+    assert watched[str(agents / "c")] == (False, AGENT)
+    (agents / "c" / "sessions").mkdir()
+    reg.on_dir_created(str(agents / "c" / "sessions"))
+    assert str(agents / "c") not in watched
+    assert watched[str(agents / "c" / "sessions")] == (True, SESSIONS)
+    assert announced == [str(agents / "c" / "sessions")]
+
+    # a 最近有事件，超出上限时摘除最久无事件的 b
+    reg.touch(str(agents / "a" / "sessions" / "x.jsonl"))
+    (agents / "d" / "sessions").mkdir(parents=True)
+    reg.on_dir_created(str(agents / "d"))
+    assert str(agents / "b" / "sessions") not in watched
+    assert str(agents / "a" / "sessions") in watched and str(agents / "d" / "sessions") in watched
+    assert reg.stats()["evicted"] == 1 and reg.stats()["sessions_dirs"] == 3
+    assert reg.stats()["cold_dirs"] == 1
+
+    # 被摘除的 b 进入冷集合：无变化不登记，有新写入时重新登记并补发，改摘最久无事件的 c
+    assert reg.poll_cold() == []
+    (agents / "b" / "sessions" / "y.jsonl").write_text("{}\n", encoding="utf-8")
+    assert reg.poll_cold() == [str(agents / "b" / "sessions")]
+    assert str(agents / "b" / "sessions") in watched and str(agents / "c" / "sessions") not in watched
+    assert announced[-1] == str(agents / "b" / "sessions")
+    assert reg.stats()["promoted"] == 1 and reg.stats()["cold_dirs"] == 1
+
+    # 新 Agent 目录 watch 优先于 sessions watch 保留；全是 Agent 目录时才摘除最久的一个
+    for name in ("e", "f", "g", "h"):
+        (agents / name).mkdir()
+        reg.on_dir_created(str(agents / name))
+    assert [p for p in watched if p != str(agents)] == [str(agents / n) for n in ("f", "g", "h")]
+    # 冷集合中的 Agent 目录出现 sessions 后重新登记为 sessions watch
+    (agents / "e" / "sessions").mkdir()
+    assert reg.poll_cold() == [str(agents / "e")]
+    assert watched[str(agents / "e" / "sessions")] == (True, SESSIONS) and str(agents / "f") not in watched
+
+    reg.on_dir_deleted(str(agents / "d"))
+    assert str(agents / "d" / "sessions") not in watched
+    reg.stop()
+    assert watched == {}
+
+
+def test_lazy_routers_load_on_miss_and_startup_report(monkeypatch):
+    import asyncio
+    import httpx
+    from starlette.routing import Mount
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    from main import app, lazy_routers
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            r = await c.get("/api/version")
+            assert r.status_code == 200
+            assert lazy_routers.loaded
+            routes = app.router.routes
+            mounts = [i for i, route in enumerate(routes) if isinstance(route, Mount)]
+            assert all(i >= len(routes) - len(mounts) for i in mounts)
+
+            report = (await c.get("/api/health/startup")).json()
+            names = [p["name"] for p in report["phases"]]
+            assert "import:fastapi" in names and "import:api.agents" in names
+            assert report["lazyRoutersLoaded"] is True
+            assert all(p["durationMs"] >= 0 for p in report["phases"])
+
+    asyncio.run(_run())
+
+
+def test_warm_snapshot_restores_only_valid_file_checkpoints(monkeypatch, tmp_path):
+    import json
+    import time
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path / "state"))
+    sessions = tmp_path / "state" / "agents" / "dev" / "sessions"
+    sessions.mkdir(parents=True)
+    now_ms = int(time.time() * 1000)
+
+    def _line(i):
+        return json.dumps({
+            "type": "message",
+            "id": f"m{i}",
+            "message": {
+                "role": "assistant",
+                "model": "glm-4",
+                "timestamp": now_ms - 1000 * i,
+                "usage": {"totalTokens": 10, "input": 6, "output": 4},
+                "stopReason": "error",
+                "errorMessage": f"rate limit exceeded req {i}",
+                "content": [],
+            },
+        }) + "\n"
+
+    a = sessions / "a.jsonl"
+    b = sessions / "b.jsonl"
+    a.write_text(_line(1), encoding="utf-8")
+    b.write_text(_line(2), encoding="utf-8")
+
+    from core.error_handler import record_error
+    from core.error_rollups import get_error_rollups, reset_error_rollups_for_tests
+    from data.error_clusters import get_error_cluster_table, reset_error_cluster_table_for_tests
+    from data.error_rollup_feed import reset_error_rollup_feed_for_tests, sync_error_rollups
+    from data.session_counters import get_session_counter_index, get_session_counters, reset_session_counters_for_tests
+    from data.session_manifest import reset_session_manifest_for_tests
+    from data.usage_store import reset_usage_store_for_tests, sync_usage_store
+    from data.warm_snapshot import restore_warm_snapshot, write_warm_snapshot
+
+    sync_usage_store()
+    get_session_counters(a)
+    get_session_counters(b)
+    sync_error_rollups()
+    record_error("io-error", "disk", "agent_id:dev")
+    snap = tmp_path / "dash" / "warm_snapshot.json"
+    assert write_warm_snapshot(snap)["bytes"] > 0
+
+    # 重启：a 未变，b 之后有追加
+    with b.open("a", encoding="utf-8") as f:
+        f.write(_line(3))
+    for reset in (
+        reset_usage_store_for_tests,
+        reset_session_counters_for_tests,
+        reset_error_rollup_feed_for_tests,
+        reset_error_rollups_for_tests,
+        reset_error_cluster_table_for_tests,
+        reset_session_manifest_for_tests,
+    ):
+        reset()
+
+    result = restore_warm_snapshot(snap)
+    assert result["status"] == "restored"
+    assert result["sections"]["usage"] == 1
+    assert result["sections"]["sessionCounters"] == 2
+    # 只保存框架错误的分钟 / 小时桶；session 错误从（未重置的）错误索引重新计入
+    assert result["sections"]["errorRollups"] == 2
+
+    assert get_session_counters(a).messages == 1
+    assert get_session_counters(b).errors == 2
+    # a 直接命中检查点，只解析 b 的新增行
+    assert get_session_counter_index().stats()["bytesParsed"] == len(_line(3).encode())
+
+    assert len(sync_usage_store().records()) == 3
+    sync_error_rollups()
+    assert get_error_rollups().breakdown(None, None, "source") == {"session": 3, "framework": 1}
+    assert get_error_cluster_table().stats()["members"] == 3
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path / "other"))
+    assert restore_warm_snapshot(snap)["status"] == "root_changed"
+
+
+def test_usage_table_time_index_and_retention(tmp_path):
+    """usage 表：多文件乱序写入后按时间窗二分查询（时间升序）；早于保留期的行被剔除。"""
+    import json
+
+    from data import usage_store
+    from data.usage_store import UsageTable
+
+    def write(p, stamps):
+        p.write_text("".join(
+            json.dumps({"type": "message", "id": f"a{ts}", "timestamp": ts, "message": {
+                "role": "assistant", "model": "m", "usage": {"totalTokens": ts % 100}, "content": []}}) + "\n"
+            for ts in stamps
+        ), encoding="utf-8")
+
+    now = 1_800_000_000_000
+    day = 86_400_000
+    a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    write(a, [now - 5 * day, now - 2000, now - 1000])
+    write(b, [now - 3 * day, now - 1500])
+    table = UsageTable(retention_ms=day)
+    table.sync_file(a, "x")
+    table.sync_file(b, "y")
+    table.retention_ms = None
+    assert [r["timestampMs"] for r in table.records(requests_only=False)] == [
+        now - 5 * day, now - 3 * day, now - 2000, now - 1500, now - 1000]
+    assert [r["agentId"] for r in table.records(since_ms=now - 1800, until_ms=now - 1000)] == ["y"]
+
+    table.retention_ms = day
+    usage_store._EVICT_MIN_ROWS, saved = 1, usage_store._EVICT_MIN_ROWS
+    try:
+        assert table.evict_expired(now) == 2
+    finally:
+        usage_store._EVICT_MIN_ROWS = saved
+    assert len(table) == 3 and table.stats()["evicted"] == 2
+    with open(b, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "message", "id": "late", "timestamp": now - 1200, "message": {
+            "role": "assistant", "model": "m", "usage": {"totalTokens": 1}, "content": []}}) + "\n")
+    table.sync_file(b, "y")
+    table.retention_ms = None
+    assert [r["timestampMs"] for r in table.records()] == [now - 2000, now - 1500, now - 1200, now - 1000]
+
+
+def test_error_cluster_aggregates_refresh_from_index(monkeypatch, tmp_path):
+    """错误簇：内存只保留汇总；撤回文件后按错误索引重算首末时间与样例；时间窗查询只计窗口内成员。"""
+    import os
+    import time
+
+    from data.error_clusters import get_error_cluster_table
+    from data.error_index import get_error_index
+    from data.error_rollup_feed import sync_error_rollups
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+
+    def write(agent, stamps):
+        sess = tmp_path / "agents" / agent / "sessions"
+        sess.mkdir(parents=True, exist_ok=True)
+        body = lambda ts: {"role": "assistant", "content": [], "stopReason": "error",
+                           "errorMessage": "timed out", "timestamp": ts}
+        path = sess / "s.jsonl"
+        path.write_text("".join(json.dumps({"type": "message", "message": body(ts)}) + "\n" for ts in stamps),
+                        encoding="utf-8")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    write("dev", [1_700_000_000_000, 1_700_000_009_000])
+    write("qa", [1_700_000_000_000 + i * 1000 for i in range(1, 9)])
+    sync_error_rollups()
+    table = get_error_cluster_table()
+    (cluster,) = table.clusters()
+    assert (cluster["count"], cluster["firstSeen"], cluster["exemplar"]["agentId"]) == (10, 1_700_000_000_000, "dev")
+    assert not hasattr(table._clusters[cluster["id"]], "members")
+
+    window = table.clusters(since=1_700_000_002_000, until=1_700_000_005_000, index=get_error_index())
+    assert [(c["count"], c["firstSeen"], c["lastSeen"]) for c in window] == [(3, 1_700_000_002_000, 1_700_000_004_000)]
+
+    write("dev", [])
+    sync_error_rollups()
+    (cluster,) = table.clusters()
+    assert (cluster["count"], cluster["firstSeen"], cluster["lastSeen"]) == (8, 1_700_000_001_000, 1_700_000_008_000)
+    assert cluster["exemplar"]["agentId"] == "qa" and cluster["agents"] == {"qa": 8}
+    write("qa", [])
+    sync_error_rollups()
+    assert table.clusters() == []
+
+
+def test_error_lists_page_by_unique_ids_from_error_index(monkeypatch, tmp_path):
+    """错误列表：同一时间戳的多条错误有唯一 id，游标翻页不重不漏；三个列表接口都用 nextCursor。"""
+    import asyncio
+
+    import httpx
+
+    import status.error_detector as error_detector
+
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    log = tmp_path / "workspace-main" / "memory" / "model-failures.log"
+    log.parent.mkdir(parents=True)
+    monkeypatch.setattr(error_detector, "_get_failure_log_paths", lambda: [log])
+    # 同一分钟内多条 model failure：时间戳相同
+    log.write_text("".join(f"## 2026-01-01 00:0{i // 4}:00\n- model: glm-4\n- error: 429\n" for i in range(12)), encoding="utf-8")
+    sess = tmp_path / "agents" / "dev" / "sessions"
+    sess.mkdir(parents=True)
+    lines = []
+    for i in range(30):
+        body = {"role": "assistant", "content": [], "stopReason": "error", "errorMessage": f"429 rate limit {i}",
+                "timestamp": 1_700_000_000_000 + (i // 3) * 1000}
+        lines.append(json.dumps({"type": "message", "message": body}) + "\n")
+    (sess / "a.jsonl").write_text("".join(lines[:15]), encoding="utf-8")
+    (sess / "b.jsonl").write_text("".join(lines[15:]), encoding="utf-8")
+    (tmp_path / "subagents").mkdir()
+    runs = {f"r{i}": {"childSessionKey": f"agent:dev:subagent:{i}", "startedAt": 1000 + i} for i in range(5)}
+    (tmp_path / "subagents" / "runs.json").write_text(json.dumps({"version": 2, "runs": runs}), encoding="utf-8")
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    from main import app
+
+    async def drain(c, url, extract, **params):
+        seen, cursor = [], None
+        while True:
+            body = (await c.get(url, params={**params, **({"cursor": cursor} if cursor else {})})).json()
+            seen.extend(extract(body))
+            cursor = body["nextCursor"]
+            if cursor is None:
+                return seen, body
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            seen, _ = await drain(
+                c, "/api/errors", lambda b: [e["id"] for e in b["sessionErrors"] + b["modelFailures"]], limit=4
+            )
+            assert len(seen) == len(set(seen)) == 42
+
+            seen, body = await drain(
+                c, "/api/error-analysis", lambda b: [e["id"] for a in b["agents"] for e in a["errors"]],
+                limit=7, agent="dev",
+            )
+            assert len(seen) == len(set(seen)) == 30
+            assert body["globalSummary"]["totalErrors"] == 30 and body["globalSummary"]["byAgent"] == {"dev": 30}
+
+            seen, _ = await drain(c, "/api/subagents", lambda b: [r["runId"] for r in b["subagents"]], limit=2)
+            assert seen == [f"r{i}" for i in range(4, -1, -1)]
+
+    asyncio.run(_run())
+
+
+def test_collaboration_dynamic_survives_static_topology_failure(monkeypatch, tmp_path):
+    """协作动态接口：静态拓扑无法构建（如 model 为字符串）时仍返回状态与 activePath；静态缓存不被请求修改。"""
+    import asyncio
+    import json
+
+    import httpx
+
+    import api.collaboration as collaboration
+
+    _stub_file_watcher_for_testclient(monkeypatch)
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    (tmp_path / "openclaw.json").write_text(json.dumps({"agents": {"list": [
+        {"id": "main", "default": True, "model": "p/m1"},
+        {"id": "dev", "model": "p/m2"},
+    ]}}), encoding="utf-8")
+    (tmp_path / "subagents").mkdir()
+    (tmp_path / "subagents" / "runs.json").write_text(json.dumps({"version": 2, "runs": {"r1": {
+        "childSessionKey": "agent:dev:subagent:1", "requesterSessionKey": "agent:main:main",
+        "startedAt": 1, "task": "t",
+    }}}), encoding="utf-8")
+    from main import app
+
+    def broken():
+        raise AttributeError("'str' object has no attribute 'get'")
+
+    monkeypatch.setattr(collaboration, "_build_static_topology", broken)
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as c:
+            body = (await c.get("/api/collaboration/dynamic")).json()
+            assert set(body["agentStatuses"]) >= {"main", "dev"}
+            assert "dev" in body["activePath"]
+
+    asyncio.run(_run())
+
+    monkeypatch.undo()
+    monkeypatch.setenv("OPENCLAW_STATE_DIR", str(tmp_path))
+    collaboration.reset_collaboration_cache_for_tests()
+    (tmp_path / "openclaw.json").write_text(json.dumps({"agents": {"list": [
+        {"id": "main", "default": True, "model": {"primary": "p/m1"}},
+    ]}}), encoding="utf-8")
+    flow, _ = collaboration._build_collaboration_flow()
+    for node in flow.nodes:
+        node.status = "mutated"
+    assert all(n.status == "idle" for n in collaboration._get_static_topology()["model_nodes"])
+
+
+def test_error_rollups_ledger_pruned_with_hour_retention(monkeypatch):
+    """错误时间序列：origin 记账随小时桶一起过期清理，过期后撤回不影响新计数。"""
+    import core.error_rollups as er
+
+    clock = [100 * er.HOUR_MS]
+    monkeypatch.setattr(er.time, "time", lambda: clock[0] / 1000)
+    rollups = er.ErrorRollups(minute_retention=60, hour_retention=3)
+    key = ("session", "dev", "timeout", "")
+    rollups.add_events("a.jsonl", [(clock[0] - er.HOUR_MS, key), (clock[0], key)])
+    assert len(rollups._origins["a.jsonl"]) == 2
+
+    clock[0] += 2 * er.HOUR_MS
+    rollups.add_events("b.jsonl", [(clock[0], key)])
+    assert rollups._origins["a.jsonl"] == [(clock[0] - 2 * er.HOUR_MS, key)]
+    assert rollups.breakdown(None, None, "source") == {"session": 2}
+
+    rollups.retract("a.jsonl")
+    assert rollups.breakdown(None, None, "source") == {"session": 1}
+    assert rollups.origins() == ["b.jsonl"]
+
+
+def test_run_session_cache_reads_outside_global_lock(tmp_path):
+    """run 级缓存：读 session 文件时不持全局锁，其他 run 不被阻塞；运行中的结果返回快照。"""
+    import threading
+
+    from data.run_session_cache import RunSessionCache
+
+    cache = RunSessionCache()
+    path = tmp_path / "run.jsonl"
+    path.write_text("a\n", encoding="utf-8")
+    other_done = []
+
+    def feed(digest, line):
+        t = threading.Thread(target=lambda: other_done.append(cache.get("other", False, lambda: None, feed)))
+        t.start()
+        t.join(timeout=2)
+        digest.subtasks.append({"task": line.strip()})
+
+    first = cache.get("run", False, lambda: path, feed)
+    assert other_done == [None]
+    assert [t["task"] for t in first.subtasks] == ["a"]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("b\n")
+    second = cache.get("run", True, lambda: path, feed)
+    assert [t["task"] for t in second.subtasks] == ["a", "b"] and second.frozen
+    assert [t["task"] for t in first.subtasks] == ["a"]
+    assert cache.get("run", True, lambda: None, feed) is second
+    assert cache.stats()["fileReads"] == 2
+
+
+def test_usage_recent_calls_refilled_after_file_drop(tmp_path):
+    """最近调用缓冲：移除文件后沿时间索引用其余文件的最新调用补齐。"""
+    import json
+
+    from data.usage_store import RecentCallsFeed, UsageTable
+
+    def calls(*stamps):
+        return "".join(json.dumps({"type": "message", "id": f"m{ts}", "timestamp": ts, "message": {
+            "role": "assistant", "model": "glm-5", "usage": {"totalTokens": 1}, "content": []}}) + "\n"
+            for ts in stamps)
+
+    a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    a.write_text(calls(1767268800001, 1767268800002, 1767268800003), encoding="utf-8")
+    b.write_text(calls(1767268800010, 1767268800020, 1767268800030), encoding="utf-8")
+    table = UsageTable()
+    table.recent = RecentCallsFeed(capacity=3)
+    table.sync_file(a, "dev")
+    table.sync_file(b, "dev")
+    assert [c["timestampMs"] % 1000 for c in table.recent_calls()] == [10, 20, 30]
+
+    table.drop_file(b)
+    assert [c["timestampMs"] % 1000 for c in table.recent_calls()] == [1, 2, 3]
+    assert table.recent.capacity == 3
+
+
 def test_sessions_index_strict_invalid_returns_zero(monkeypatch, tmp_path):
     """sessions.json 根非 object 时，严格模式下 get_session_updated_at 返回 0。"""
     import data.session_reader as session_reader
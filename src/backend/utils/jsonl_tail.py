@@ -0,0 +1,47 @@
+"""
+JSONL 追加读取 - 按字节偏移只读取新增的完整行
+
+- 末行无换行时仅当已是完整 JSON 才消费，否则留待写入完成后下次读取
+- is_rewritten 按 (大小, mtime) 检查点判断文件是否被截断或原地重写
+"""
+from __future__ import annotations
+
+import json
+from typing import BinaryIO, Iterator, Tuple
+
+
+def is_rewritten(size: int, mtime: float, offset: int, last_size: int, last_mtime: float) -> bool:
+    """已读到 offset 的文件被截断，或大小不变而 mtime 变化（原地重写）"""
+    return size < offset or (size == last_size and mtime != last_mtime)
+
+
+class AppendedLines:
+    """
+    从 offset 起迭代新增的完整行，产出 (行偏移, 原始字节)。
+    迭代结束（或中途停止）后 end 为已消费到的偏移。
+    """
+
+    __slots__ = ('_f', 'start', 'end')
+
+    def __init__(self, f: BinaryIO, offset: int = 0) -> None:
+        self._f = f
+        self.start = offset
+        self.end = offset
+
+    @property
+    def consumed(self) -> int:
+        return self.end - self.start
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes]]:
+        self._f.seek(self.end)
+        for raw in self._f:
+            if not raw.endswith(b'\n'):
+                if not raw.strip():
+                    break
+                try:
+                    json.loads(raw)
+                except ValueError:
+                    break
+            line_offset = self.end
+            self.end += len(raw)
+            yield line_offset, raw
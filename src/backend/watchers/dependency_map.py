@@ -0,0 +1,114 @@
+"""
+文件变更依赖表 - 按变更文件的类别决定要失效的缓存与要重算的 WebSocket 分区
+
+- Agent 的 session jsonl / sessions.json 只影响该 Agent 的状态缓存，agents 分区只增量推送该 Agent
+- runs.json、model-failures.log 影响全部 Agent 的状态；openclaw.json 与无法识别的文件按全量处理
+- 其余缓存（usage、计数、错误索引、链路图等）按文件 (size, mtime) 自校验，不在此失效
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+# 文件类别
+SESSION_LOG = "session_log"
+SESSION_INDEX = "session_index"
+RUNS = "runs"
+CONFIG = "config"
+FAILURE_LOG = "failure_log"
+DASHBOARD_DATA = "dashboard_data"
+IGNORED = "ignored"
+UNKNOWN = "unknown"
+
+# WebSocket full_state 的分区
+ALL_SECTIONS: Tuple[str, ...] = ("agents", "subagents", "apiStatus", "collaboration", "tasks", "performance")
+
+# Dashboard 自身写入的文件：不触发推送，避免写入 -> 事件 -> 重算 -> 写入的循环
+SELF_WRITTEN_FILES = frozenset({"watcher_state.json", "run_session_cache.json", "warm_snapshot.json"})
+
+
+@dataclass(frozen=True)
+class Impact:
+    sections: FrozenSet[str]
+    # True：只影响路径所属 Agent 的状态缓存与 agents 分区
+    agent_scoped: bool = False
+
+
+DEPENDENCIES: Dict[str, Impact] = {
+    SESSION_LOG: Impact(frozenset({"agents", "collaboration", "tasks", "performance"}), agent_scoped=True),
+    SESSION_INDEX: Impact(frozenset({"agents", "collaboration", "tasks"}), agent_scoped=True),
+    RUNS: Impact(frozenset({"agents", "subagents", "collaboration", "tasks"})),
+    CONFIG: Impact(frozenset(ALL_SECTIONS)),
+    FAILURE_LOG: Impact(frozenset({"agents", "apiStatus", "collaboration"})),
+    DASHBOARD_DATA: Impact(frozenset({"tasks"})),
+    IGNORED: Impact(frozenset()),
+    UNKNOWN: Impact(frozenset(ALL_SECTIONS)),
+}
+
+
+def classify_path(filepath: str) -> Tuple[str, Optional[str]]:
+    """(文件类别, Agent 目录名)；只看路径形态，不访问文件系统"""
+    path = PurePath(filepath)
+    parts = path.parts
+    name = path.name
+    if name in SELF_WRITTEN_FILES:
+        return IGNORED, None
+    if "agents" in parts:
+        i = len(parts) - 1 - parts[::-1].index("agents")
+        if i + 2 < len(parts) and parts[i + 2] == "sessions":
+            agent_id = parts[i + 1]
+            if name.endswith(".jsonl"):
+                return SESSION_LOG, agent_id
+            return SESSION_INDEX, agent_id
+    if name == "openclaw.json":
+        return CONFIG, None
+    if name == "runs.json" and path.parent.name == "subagents":
+        return RUNS, None
+    if path.parent.name == "memory" and name.endswith(".log"):
+        return FAILURE_LOG, None
+    try:
+        from data.task_history import get_dashboard_data_dir
+
+        if path.parent == PurePath(get_dashboard_data_dir()):
+            return DASHBOARD_DATA, None
+    except Exception:
+        pass
+    return UNKNOWN, None
+
+
+@dataclass
+class ChangePlan:
+    """一批文件变更合并后的处理范围"""
+
+    sections: Set[str] = field(default_factory=set)
+    # 受影响的 Agent（仅 agent_scoped 变更）；all_agents 为 True 时忽略
+    agent_ids: Set[str] = field(default_factory=set)
+    all_agents: bool = False
+    kinds: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def full(self) -> bool:
+        return self.all_agents and self.sections >= set(ALL_SECTIONS)
+
+    def add(self, kind: str, agent_id: Optional[str] = None) -> None:
+        impact = DEPENDENCIES[kind]
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        self.sections |= impact.sections
+        if not impact.sections:
+            return
+        if impact.agent_scoped and agent_id:
+            self.agent_ids.add(agent_id)
+        elif "agents" in impact.sections:
+            self.all_agents = True
+
+
+def plan_for_paths(paths: Iterable[Optional[str]]) -> ChangePlan:
+    """合并多个变更路径；None 表示来源未知（轮询 / 全量同步），按全量处理"""
+    plan = ChangePlan()
+    for p in paths:
+        if p is None:
+            plan.add(UNKNOWN)
+        else:
+            plan.add(*classify_path(p))
+    return plan
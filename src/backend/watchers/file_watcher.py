@@ -6,33 +6,27 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 _LOG = logging.getLogger("openclaw.fortify.watcher")
 
 from core.config_fortify import get_fortify_config
 from core.error_handler import record_error, record_watcher_failure, record_watcher_recovery
+from watchers.dependency_map import CONFIG, ChangePlan, plan_for_paths
+from watchers.watch_registry import SESSIONS, WatchRegistry
 
 DEBOUNCE_SECONDS = 0.3
+RELEVANT_SUFFIXES = (".json", ".jsonl", ".log")
+# 轮询模式下每隔多少个基准间隔尝试恢复 watchdog
+POLL_RESUME_EVERY = 12
 
-
-def _extract_agent_id_from_path(filepath: str) -> Optional[str]:
-    try:
-        path = Path(filepath)
-        parts = path.parts
-        try:
-            agents_idx = parts.index("agents")
-        except ValueError:
-            return None
-        if agents_idx + 2 < len(parts) and parts[agents_idx + 2] == "sessions":
-            return parts[agents_idx + 1]
-        return None
-    except Exception:
-        return None
+# 轮询快照：文件路径 -> (size, mtime_ns)
+PollSnapshot = Dict[str, Tuple[int, int]]
 
 
 def _get_openclaw_dir() -> Path:
@@ -41,7 +35,8 @@ def _get_openclaw_dir() -> Path:
     return get_openclaw_root()
 
 
-def _get_watch_dirs() -> list[tuple[Path, bool]]:
+def _get_static_watch_dirs() -> list[tuple[Path, bool]]:
+    """agents/ 以外的固定监听目录（subagents、Dashboard 数据、workspace memory）"""
     dirs: list[tuple[Path, bool]] = []
     openclaw_dir = _get_openclaw_dir()
     subagents = openclaw_dir / "subagents"
@@ -66,7 +61,12 @@ def _get_watch_dirs() -> list[tuple[Path, bool]]:
         memory = openclaw_dir / "workspace-main" / "memory"
         if memory.exists():
             dirs.append((memory, False))
-    agents_dir = openclaw_dir / "agents"
+    return dirs
+
+
+def _get_watch_dirs() -> list[tuple[Path, bool]]:
+    dirs = _get_static_watch_dirs()
+    agents_dir = _get_openclaw_dir() / "agents"
     if agents_dir.exists():
         for agent_dir in agents_dir.iterdir():
             if agent_dir.is_dir():
@@ -76,47 +76,130 @@ def _get_watch_dirs() -> list[tuple[Path, bool]]:
     return dirs
 
 
-class DebouncedHandler:
-    """防抖：短时间多次变更只触发一次回调"""
+# 编辑器 / 原子写入产生的临时文件与锁文件，不计入变更
+_TRANSIENT_SUFFIXES = (".tmp", ".temp", ".lock", ".swp", ".swx", ".part", "~")
+_TRANSIENT_PREFIXES = (".#", "~$")
+
+
+def _is_transient_path(filepath: str) -> bool:
+    name = Path(filepath).name
+    if name.startswith(_TRANSIENT_PREFIXES) or name.endswith(_TRANSIENT_SUFFIXES):
+        return True
+    return ".tmp." in name
+
 
-    def __init__(self, callback: Callable[[Optional[str]], None], debounce_sec: float = DEBOUNCE_SECONDS):
+class DebouncedHandler:
+    """
+    防抖批处理：窗口内的变更路径去重累积，由单个常驻线程按批交给回调。
+
+    - 距上次交付超过 debounce_sec 的变更立即交付，否则并入下一批
+    - 回调处理慢时新路径继续合并；不同路径超过 max_pending 时整批收敛为 None（全量同步）
+    - 批内 None 表示来源未知，回调按全量处理
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[List[Optional[str]]], None],
+        debounce_sec: float = DEBOUNCE_SECONDS,
+        max_pending: Optional[int] = None,
+    ):
         self.callback = callback
         self.debounce_sec = debounce_sec
+        self.max_pending = max_pending or get_fortify_config().watcher_batch_max_paths
         self._last_trigger: float = 0
-        self._lock = threading.Lock()
-        self._timer: Optional[threading.Timer] = None
-        self._pending_path: Optional[str] = None
+        self._cond = threading.Condition()
+        self._pending: Set[str] = set()
+        self._pending_full = False
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+        self.paths_delivered = 0
+        self.coalesced = 0
+        self.ignored = 0
+        self.overflows = 0
 
     def trigger(self, filepath: Optional[str] = None) -> None:
-        with self._lock:
-            now = time.monotonic()
-            if self._timer:
-                self._timer.cancel()
-                self._timer = None
-            if filepath:
-                self._pending_path = filepath
-
-            def do_callback() -> None:
-                with self._lock:
-                    self._last_trigger = time.monotonic()
-                    self._timer = None
-                    path = self._pending_path
-                    self._pending_path = None
-                try:
-                    self.callback(path)
-                except Exception as e:
-                    record_error("unknown", str(e), "file_watcher_debounce")
-
-            if now - self._last_trigger < self.debounce_sec:
-                self._timer = threading.Timer(self.debounce_sec - (now - self._last_trigger), do_callback)
-                self._timer.daemon = True
-                self._timer.start()
+        if filepath and _is_transient_path(filepath):
+            with self._cond:
+                self.ignored += 1
+            return
+        with self._cond:
+            if self._closed:
+                return
+            if filepath is None:
+                self._pending_full = True
+            elif not self._pending_full:
+                if filepath in self._pending:
+                    self.coalesced += 1
+                else:
+                    self._pending.add(filepath)
+                    if len(self._pending) > self.max_pending:
+                        self.overflows += 1
+                        self._pending_full = True
             else:
-                do_callback()
+                self.coalesced += 1
+            if self._pending_full:
+                self._pending.clear()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="file-watcher-batch", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def _take_batch(self) -> Optional[List[Optional[str]]]:
+        """等到有待处理路径且窗口到期；关闭时返回 None"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if self._pending or self._pending_full:
+                    wait = self._last_trigger + self.debounce_sec - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            batch: List[Optional[str]] = [None] if self._pending_full else sorted(self._pending)
+            self._pending = set()
+            self._pending_full = False
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                self.callback(batch)
+            except Exception as e:
+                record_error("unknown", str(e), "file_watcher_debounce")
+            with self._cond:
+                self._last_trigger = time.monotonic()
+                self.batches += 1
+                self.paths_delivered += len(batch)
+
+    def close(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "pending": len(self._pending) + (1 if self._pending_full else 0),
+                "batches": self.batches,
+                "paths_delivered": self.paths_delivered,
+                "coalesced": self.coalesced,
+                "ignored": self.ignored,
+                "overflows": self.overflows,
+            }
 
 
 _observer = None
 _handler: Optional[DebouncedHandler] = None
+_watch_registry: Optional[WatchRegistry] = None
 _event_loop = None
 _watcher_mode = "stopped"
 _poll_timer: Optional[threading.Timer] = None
@@ -131,8 +214,12 @@ _last_error: Optional[str] = None
 _last_heartbeat = 0.0
 _watchdog_failure_since: Optional[float] = None
 _poll_ticks = 0
+_poll_snapshot: Optional[PollSnapshot] = None
+_poll_interval = 0.0
 _health_lock = threading.Lock()
 _last_full_sync_iso: Optional[str] = None
+# 按文件类别统计的已处理变更数（见 watchers.dependency_map）
+_routed_events: Dict[str, int] = {}
 
 
 def _watcher_state_path() -> Optional[Path]:
@@ -232,6 +319,13 @@ def _set_mode(mode: str) -> None:
     with _health_lock:
         _watcher_mode = mode
     _persist_watcher_state()
+    try:
+        from data.session_manifest import get_session_manifest
+
+        # 仅 watchdog 模式下信任文件事件维护 sessions 清单
+        get_session_manifest().set_trust_events(mode == "watchdog")
+    except Exception as e:
+        record_error("unknown", str(e), "file_watcher_manifest")
 
 
 def _touch_activity() -> None:
@@ -240,27 +334,50 @@ def _touch_activity() -> None:
     _last_heartbeat = time.time()
 
 
+def _apply_change_plan(plan: ChangePlan) -> None:
+    """按依赖表失效缓存：Agent 级变更只失效对应 Agent 的状态缓存"""
+    from status.status_cache import get_cache
+
+    with _health_lock:
+        for kind, n in plan.kinds.items():
+            _routed_events[kind] = _routed_events.get(kind, 0) + n
+    if not plan.sections:
+        return
+    cache = get_cache()
+    if plan.all_agents:
+        cache.invalidate()
+    else:
+        for agent_id in plan.agent_ids:
+            cache.invalidate(agent_id)
+    if plan.full or CONFIG in plan.kinds:
+        from api.collaboration import _clear_model_mapping_cache
+
+        _clear_model_mapping_cache()
+
+
 def _on_file_changed(filepath: Optional[str] = None) -> None:
+    _on_files_changed([filepath])
+
+
+def _on_files_changed(paths: Iterable[Optional[str]]) -> None:
+    """一批变更路径合并为一个 ChangePlan：失效一次缓存、推送一次"""
     global _last_error
     try:
-        _touch_activity()
-        from api.websocket import broadcast_full_state
-        from status.status_cache import get_cache
+        paths = list(paths)
+        for _ in paths:
+            _touch_activity()
+        from api.websocket import broadcast_sections
         import asyncio
 
-        cache = get_cache()
-        if filepath:
-            agent_id = _extract_agent_id_from_path(filepath)
-            if agent_id:
-                cache.invalidate(agent_id)
-            else:
-                cache.invalidate()
-        else:
-            cache.invalidate()
+        plan = plan_for_paths(paths)
+        _apply_change_plan(plan)
+        if not plan.sections:
+            return
 
         loop = _event_loop
-        if loop and broadcast_full_state:
-            future = asyncio.run_coroutine_threadsafe(broadcast_full_state(), loop)
+        if loop:
+            agent_ids = None if plan.all_agents else plan.agent_ids
+            future = asyncio.run_coroutine_threadsafe(broadcast_sections(plan.sections, agent_ids), loop)
             future.result(timeout=10)
     except Exception as e:
         _last_error = str(e)
@@ -271,38 +388,116 @@ def _build_observer() -> Any:
     from watchdog.observers import Observer
     from watchdog.events import FileSystemEventHandler
 
-    RELEVANT_SUFFIXES = (".json", ".jsonl", ".log")
+    from data.session_manifest import get_session_manifest
+
+    manifest = get_session_manifest()
 
     class Handler(FileSystemEventHandler):
         def _should_trigger(self, src_path: str) -> bool:
-            return any(src_path.endswith(s) for s in RELEVANT_SUFFIXES)
+            return src_path.endswith(RELEVANT_SUFFIXES)
+
+        def _changed(self, path: str) -> None:
+            if self._should_trigger(path) and _handler:
+                manifest.note_path(path)
+                if _watch_registry:
+                    _watch_registry.touch(path)
+                _handler.trigger(path)
 
         def on_modified(self, event):
             if event.is_directory:
                 return
-            if self._should_trigger(event.src_path) and _handler:
-                _handler.trigger(event.src_path)
+            self._changed(event.src_path)
 
         def on_created(self, event):
             if event.is_directory:
                 return
-            if self._should_trigger(event.src_path) and _handler:
-                _handler.trigger(event.src_path)
+            self._changed(event.src_path)
+
+        def on_deleted(self, event):
+            # 删除只影响清单，不触发推送
+            if not event.is_directory:
+                manifest.note_path(event.src_path)
+            elif _watch_registry:
+                _watch_registry.on_dir_deleted(event.src_path)
 
-    watch_dirs = _get_watch_dirs()
-    if not watch_dirs:
+        def on_moved(self, event):
+            # 原子写入（临时文件 rename 为目标文件）只产生 moved 事件
+            if event.is_directory:
+                return
+            manifest.note_path(event.src_path)
+            dest = getattr(event, "dest_path", "")
+            if dest:
+                self._changed(dest)
+
+    class DirHandler(FileSystemEventHandler):
+        """agents/ 与 Agent 目录的结构监听：只处理子目录创建与删除"""
+
+        def on_created(self, event):
+            if event.is_directory and _watch_registry:
+                _watch_registry.on_dir_created(event.src_path)
+
+        def on_deleted(self, event):
+            if event.is_directory and _watch_registry:
+                _watch_registry.on_dir_deleted(event.src_path)
+
+        def on_moved(self, event):
+            if event.is_directory and _watch_registry:
+                _watch_registry.on_dir_deleted(event.src_path)
+                dest = getattr(event, "dest_path", "")
+                if dest:
+                    _watch_registry.on_dir_created(dest)
+
+    static_dirs = _get_static_watch_dirs()
+    agents_root = _get_openclaw_dir() / "agents"
+    if not static_dirs and not agents_root.exists():
         raise RuntimeError("no watch dirs")
 
-    global _handler, _observer
-    _handler = DebouncedHandler(_on_file_changed)
+    global _handler, _observer, _watch_registry
+    if _handler is not None:
+        _handler.close()
+    _handler = DebouncedHandler(_on_files_changed)
     obs = Observer()
-    for watch_dir, recursive in watch_dirs:
-        obs.schedule(Handler(), str(watch_dir), recursive=recursive)
+    file_handler = Handler()
+    dir_handler = DirHandler()
+    for watch_dir, recursive in static_dirs:
+        obs.schedule(file_handler, str(watch_dir), recursive=recursive)
+
+    def schedule(path: str, recursive: bool, kind: str) -> Any:
+        return obs.schedule(file_handler if kind == SESSIONS else dir_handler, path, recursive=recursive)
+
+    registry = WatchRegistry(
+        agents_root,
+        schedule,
+        obs.unschedule,
+        get_fortify_config().watcher_max_watch_dirs,
+        on_sessions_dir=_announce_sessions_dir,
+    )
+    registry.start()
+    _watch_registry = registry
     return obs
 
 
+def _announce_sessions_dir(sessions_dir: str) -> None:
+    """新登记的 sessions 目录：登记前已写入的文件按变更计入"""
+    from data.session_manifest import get_session_manifest
+
+    handler = _handler
+    try:
+        names = [e.path for e in os.scandir(sessions_dir) if e.is_file() and e.name.endswith(RELEVANT_SUFFIXES)]
+    except OSError:
+        return
+    manifest = get_session_manifest()
+    for path in names:
+        if _is_transient_path(path):
+            continue
+        manifest.note_path(path)
+        if handler is not None:
+            handler.trigger(path)
+
+
 def _stop_watchdog_observer() -> None:
-    global _observer
+    global _observer, _watch_registry
+    _watch_registry = None
     if _observer:
         try:
             _observer.stop()
@@ -331,6 +526,12 @@ def _start_monitor_thread(loop) -> None:
                 continue
             if obs.is_alive():
                 _watchdog_failure_since = None
+                registry = _watch_registry
+                if registry is not None:
+                    try:
+                        registry.poll_cold()
+                    except Exception as e:
+                        record_error("io-error", str(e), "file_watcher_cold_dirs", exc=e)
                 continue
             now = time.time()
             if _watchdog_failure_since is None:
@@ -366,31 +567,106 @@ def _cancel_poll_timer() -> None:
         _poll_timer = None
 
 
+def _scan_watch_dir(root: Path, recursive: bool, out: PollSnapshot) -> None:
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    name = entry.name
+                    if not name.endswith(RELEVANT_SUFFIXES) or _is_transient_path(name):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                out[entry.path] = (st.st_size, st.st_mtime_ns)
+
+
+def take_poll_snapshot(watch_dirs: Optional[List[Tuple[Path, bool]]] = None) -> PollSnapshot:
+    """对监听目录做一次 scandir 快照（只含 .json / .jsonl / .log）"""
+    snapshot: PollSnapshot = {}
+    for watch_dir, recursive in _get_watch_dirs() if watch_dirs is None else watch_dirs:
+        _scan_watch_dir(watch_dir, recursive, snapshot)
+    return snapshot
+
+
+def diff_poll_snapshots(prev: PollSnapshot, cur: PollSnapshot) -> Tuple[List[str], List[str]]:
+    """(新增或修改的路径, 删除的路径)，与 watchdog 的 created/modified、deleted 事件对应"""
+    changed = [p for p, sig in cur.items() if prev.get(p) != sig]
+    deleted = [p for p in prev if p not in cur]
+    return sorted(changed), sorted(deleted)
+
+
+def _next_poll_interval(current: float, changed: bool) -> float:
+    """有变更时回到最短间隔，空闲时逐次加倍直至上限"""
+    cfg = get_fortify_config()
+    lo = cfg.watcher_poll_min_interval_sec
+    hi = max(lo, cfg.watcher_poll_max_interval_sec)
+    if changed:
+        return lo
+    return min(hi, max(lo, current * 2))
+
+
 def _start_polling_mode(loop) -> None:
-    global _watcher_mode, _poll_timer, _poll_ticks
+    global _watcher_mode, _poll_timer, _poll_ticks, _poll_snapshot, _poll_interval
     _set_mode("polling")
     cfg = get_fortify_config()
     _cancel_poll_timer()
+    resume_every = cfg.watcher_poll_interval_sec * POLL_RESUME_EVERY
+    last_resume = time.monotonic()
 
     def tick() -> None:
-        global _poll_timer, _poll_ticks
+        global _poll_timer, _poll_ticks, _poll_snapshot, _poll_interval
+        nonlocal last_resume
         if _monitor_stop.is_set():
             return
         if _watcher_mode != "polling":
             return
+        changed = False
         try:
-            _on_file_changed(None)
+            cur = take_poll_snapshot()
+            prev = _poll_snapshot
+            _poll_snapshot = cur
+            if prev is None:
+                # 进入轮询时可能已丢失事件：全量同步一次，之后只推送差异
+                _on_file_changed(None)
+            else:
+                paths, deleted = diff_poll_snapshots(prev, cur)
+                changed = bool(paths or deleted)
+                if changed:
+                    from data.session_manifest import get_session_manifest
+
+                    manifest = get_session_manifest()
+                    for p in paths + deleted:
+                        manifest.note_path(p)
+                if paths:
+                    _on_files_changed(paths)
         except Exception as e:
             record_error("unknown", str(e), "polling_tick")
         _poll_ticks += 1
-        if _poll_ticks >= 12:
+        _poll_interval = _next_poll_interval(_poll_interval, changed)
+        if time.monotonic() - last_resume >= resume_every:
+            last_resume = time.monotonic()
             _poll_ticks = 0
             _try_resume_watchdog(loop)
-        _poll_timer = threading.Timer(cfg.watcher_poll_interval_sec, tick)
+        if _watcher_mode != "polling":
+            return
+        _poll_timer = threading.Timer(_poll_interval, tick)
         _poll_timer.daemon = True
         _poll_timer.start()
 
     _poll_ticks = 0
+    _poll_snapshot = None
+    _poll_interval = cfg.watcher_poll_interval_sec
     tick()
 
 
@@ -461,10 +737,13 @@ def start_file_watcher(loop) -> None:
 
 
 def stop_file_watcher() -> None:
-    global _monitor_thread, _watcher_mode
+    global _monitor_thread, _watcher_mode, _handler
     _monitor_stop.set()
     _cancel_poll_timer()
     _stop_watchdog_observer()
+    if _handler is not None:
+        _handler.close()
+        _handler = None
     _set_mode("stopped")
     _persist_watcher_state()
     _LOG.info("file watcher stopped")
@@ -496,6 +775,11 @@ def get_watcher_health() -> Dict[str, Any]:
         rc_fail = _resume_failure_count
         sw = _switch_count
         last_sync = _last_full_sync_iso
+        routed = dict(_routed_events)
+
+    poll_interval = cfg.watcher_poll_interval_sec
+    if mode in ("polling", "import_failed") and _poll_interval:
+        poll_interval = _poll_interval
 
     fw_err = _watcher_framework_error_count()
     snapshot = _read_persisted_watcher_state()
@@ -519,9 +803,14 @@ def get_watcher_health() -> Dict[str, Any]:
         "last_full_sync": last_sync,
         "uptime_seconds": int(time.time() - _started_at) if _started_at else 0,
         "events_processed": _events_processed,
+        "events_by_file_class": routed,
+        "event_batches": _handler.stats() if _handler is not None else None,
+        "watch_registry": _watch_registry.stats() if _watch_registry is not None else None,
         "last_error": _last_error,
         "observer_alive": obs_alive,
-        "poll_interval_sec": cfg.watcher_poll_interval_sec,
+        # 轮询模式下为当前自适应间隔
+        "poll_interval_sec": poll_interval,
+        "poll_files_tracked": len(_poll_snapshot) if _poll_snapshot is not None else 0,
         "persisted_snapshot": snapshot,
         # NFR-R Reliability
         "reliability": reliability,
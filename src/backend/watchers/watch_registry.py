@@ -0,0 +1,233 @@
+"""
+动态 watch 登记 - agents/ 下运行期新建的 Agent 目录与 sessions 目录即时纳入 watchdog 监听
+
+- agents/ 根目录（不存在时为 OpenClaw 根目录）做非递归的结构监听，只关心子目录的创建与删除
+- 新 Agent 目录尚无 sessions 时先非递归监听该目录，sessions 出现后改为递归监听 sessions
+- Agent 目录与 sessions 目录的 watch 总数超过上限时，摘除最久没有事件的 sessions watch
+  （Agent 目录 watch 只在没有 sessions watch 可摘时才摘除）；被摘除的目录进入冷集合，
+  poll_cold 定期 scandir 比对签名，有变化时重新登记（再摘除其他最久无事件的 watch）
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# watch 类别：ROOT / AGENT 为只关心子目录的结构监听，SESSIONS 为递归的文件监听
+ROOT = "root"
+AGENT = "agent"
+SESSIONS = "sessions"
+
+# schedule(路径, 是否递归, 类别) -> watch 句柄；unschedule(句柄)
+Schedule = Callable[[str, bool, str], Any]
+Unschedule = Callable[[Any], None]
+
+# 冷目录签名：sessions 为 (文件数, 总大小, 最大 mtime_ns)，Agent 目录为 sessions 是否存在
+DirSignature = Tuple[int, int, int]
+
+
+def _dir_signature(path: str, kind: str) -> DirSignature:
+    if kind != SESSIONS:
+        return (int(os.path.isdir(os.path.join(path, "sessions"))), 0, 0)
+    count = total = newest = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                count += 1
+                total += st.st_size
+                newest = max(newest, st.st_mtime_ns)
+    except OSError:
+        return (-1, 0, 0)
+    return (count, total, newest)
+
+
+class WatchRegistry:
+    """Agent / sessions 目录的 watch 表（线程安全，末尾为最近有事件的目录）"""
+
+    def __init__(
+        self,
+        agents_root: Path,
+        schedule: Schedule,
+        unschedule: Unschedule,
+        max_watches: int,
+        on_sessions_dir: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.agents_root = agents_root
+        self._schedule = schedule
+        self._unschedule = unschedule
+        self.max_watches = max(1, max_watches)
+        self._on_sessions_dir = on_sessions_dir
+        self._watches: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._root_watch: Optional[Tuple[str, Any]] = None
+        # 被摘除的目录：路径 -> (类别, 摘除时的签名)
+        self._cold: "OrderedDict[str, Tuple[str, DirSignature]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.registered = 0
+        self.evicted = 0
+        self.promoted = 0
+
+    def start(self) -> None:
+        """登记结构监听并扫描现有 Agent 目录"""
+        with self._lock:
+            root = self.agents_root
+            if root.is_dir():
+                self._root_watch = (str(root), self._schedule(str(root), False, ROOT))
+                self._scan_agents()
+            elif root.parent.is_dir():
+                # agents/ 尚未创建：监听上一级，等待 agents/ 出现
+                self._root_watch = (str(root.parent), self._schedule(str(root.parent), False, ROOT))
+
+    def _scan_agents(self) -> None:
+        try:
+            agent_dirs = [p for p in self.agents_root.iterdir() if p.is_dir()]
+        except OSError:
+            return
+        for agent_dir in agent_dirs:
+            self._add_agent_dir(agent_dir, notify=False)
+
+    def _add_agent_dir(self, agent_dir: Path, notify: bool) -> None:
+        sessions = agent_dir / "sessions"
+        if sessions.is_dir():
+            self._add(str(sessions), SESSIONS, notify)
+        else:
+            self._add(str(agent_dir), AGENT, notify)
+
+    def _add(self, path: str, kind: str, notify: bool) -> None:
+        if path in self._watches:
+            self._watches.move_to_end(path)
+            return
+        self._cold.pop(path, None)
+        if kind == SESSIONS:
+            self._remove(str(Path(path).parent))
+            self._cold.pop(str(Path(path).parent), None)
+        self._watches[path] = (kind, self._schedule(path, kind == SESSIONS, kind))
+        self.registered += 1
+        while len(self._watches) > self.max_watches:
+            self._evict_one(keep=path)
+        if path not in self._watches:
+            return
+        if kind == AGENT and (Path(path) / "sessions").is_dir():
+            # watch 登记前 sessions 已创建
+            self._add(str(Path(path) / "sessions"), SESSIONS, notify)
+        elif notify and kind == SESSIONS and self._on_sessions_dir:
+            # 登记前已写入的文件不会再有事件
+            self._on_sessions_dir(path)
+
+    def _evict_one(self, keep: str) -> None:
+        """摘除最久无事件的 sessions watch（没有时才摘 Agent 目录，刚登记的 keep 最后考虑），记入冷集合"""
+        candidates = [p for p in self._watches if p != keep]
+        victim = next((p for p in candidates if self._watches[p][0] == SESSIONS), None)
+        if victim is None:
+            victim = candidates[0] if candidates else keep
+        kind = self._watches[victim][0]
+        self._remove(victim)
+        self._cold[victim] = (kind, _dir_signature(victim, kind))
+        self.evicted += 1
+
+    def poll_cold(self) -> List[str]:
+        """scandir 冷集合中的目录，签名变化的重新登记并补发变更；返回重新登记的路径"""
+        with self._lock:
+            cold = list(self._cold.items())
+        changed: List[Tuple[str, str]] = []
+        for path, (kind, sig) in cold:
+            if not os.path.isdir(path):
+                changed.append((path, ""))
+            elif _dir_signature(path, kind) != sig:
+                changed.append((path, kind))
+        promoted: List[str] = []
+        with self._lock:
+            for path, kind in changed:
+                if self._cold.pop(path, None) is None:
+                    continue
+                if not kind:
+                    continue
+                if kind == AGENT:
+                    self._add_agent_dir(Path(path), notify=True)
+                else:
+                    self._add(path, SESSIONS, notify=True)
+                self.promoted += 1
+                promoted.append(path)
+        return promoted
+
+    def _remove(self, path: str) -> None:
+        entry = self._watches.pop(path, None)
+        if entry is None:
+            return
+        try:
+            self._unschedule(entry[1])
+        except Exception:
+            pass
+
+    def on_dir_created(self, path: str) -> None:
+        """结构监听收到目录创建（或 rename 进入）事件"""
+        p = Path(path)
+        with self._lock:
+            if p == self.agents_root:
+                if self._root_watch is not None and self._root_watch[0] != str(p):
+                    self._remove_root_watch()
+                    self._root_watch = (str(p), self._schedule(str(p), False, ROOT))
+                try:
+                    agent_dirs = [c for c in p.iterdir() if c.is_dir()]
+                except OSError:
+                    agent_dirs = []
+                for agent_dir in agent_dirs:
+                    self._add_agent_dir(agent_dir, notify=True)
+            elif p.parent == self.agents_root:
+                self._add_agent_dir(p, notify=True)
+            elif p.name == "sessions" and p.parent.parent == self.agents_root:
+                self._add(str(p), SESSIONS, notify=True)
+
+    def on_dir_deleted(self, path: str) -> None:
+        p = Path(path)
+        with self._lock:
+            for watched in [w for w in self._watches if Path(w) == p or p in Path(w).parents]:
+                self._remove(watched)
+            for cold in [w for w in self._cold if Path(w) == p or p in Path(w).parents]:
+                del self._cold[cold]
+            if p.name == "sessions" and p.parent.parent == self.agents_root and p.parent.is_dir():
+                # 只删了 sessions：回到监听 Agent 目录，等待重建
+                self._add(str(p.parent), AGENT, notify=False)
+
+    def _remove_root_watch(self) -> None:
+        if self._root_watch is None:
+            return
+        try:
+            self._unschedule(self._root_watch[1])
+        except Exception:
+            pass
+        self._root_watch = None
+
+    def touch(self, filepath: str) -> None:
+        """sessions 目录内有文件事件：标记为最近活跃"""
+        parent = str(Path(filepath).parent)
+        with self._lock:
+            if parent in self._watches:
+                self._watches.move_to_end(parent)
+
+    def stop(self) -> None:
+        with self._lock:
+            for path in list(self._watches):
+                self._remove(path)
+            self._cold.clear()
+            self._remove_root_watch()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions = sum(1 for kind, _ in self._watches.values() if kind == SESSIONS)
+            return {
+                "sessions_dirs": sessions,
+                "pending_agent_dirs": len(self._watches) - sessions,
+                "max_watches": self.max_watches,
+                "registered": self.registered,
+                "evicted": self.evicted,
+                "cold_dirs": len(self._cold),
+                "promoted": self.promoted,
+            }